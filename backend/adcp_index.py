@@ -0,0 +1,291 @@
+import mmap
+import os
+
+import numpy as np
+
+from backend.collection_store import CollectionStore, compute_timestamps, empty_metadata
+from backend.tracing import span
+
+# .adcp unit dumps: each collection starts with a sentinel row, followed by
+# tab-separated depth/value rows, a 0/0 separator row, eight metadata rows of
+# two values each, one single-value row and a terminator row.
+ADCP_SENTINEL = b'111111.'
+ADCP_TERMINATOR = b'999999.'
+ADCP_METADATA_FIELDS = [
+    'latitude', 'longitude',
+    'altitude', 'month',
+    'day', 'year',
+    'hour', 'minute',
+    'second', 'n_satellites',
+    'hdop_error', 'adcp_internal_temp_f',
+    'abort_status', 'unit_number',
+    'actuator_absolute_position_error', 'position_correction_count',
+]
+ADCP_METADATA_ROWS = len(ADCP_METADATA_FIELDS) // 2
+ADCP_TRAILER_ROWS = ADCP_METADATA_ROWS + 2
+
+# Sidecar index written next to each .adcp file
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 3
+
+
+def _line_starts(buf):
+    starts = np.flatnonzero(buf == ord('\n')) + 1
+    starts = np.concatenate(([0], starts))
+    if starts[-1] >= len(buf):
+        starts = starts[:-1]
+    return starts
+
+
+def _lines_with_prefix(buf, starts, prefix):
+    matches = np.ones(len(starts), dtype=bool)
+    for offset, byte in enumerate(prefix):
+        positions = starts + offset
+        in_range = positions < len(buf)
+        matches &= in_range
+        matches[in_range] &= buf[positions[in_range]] == byte
+    return np.flatnonzero(matches)
+
+
+def _parse_rows(data, begin, end, columns):
+    # Parses every byte range in one call; each range holds whole rows. The
+    # last row of a file may have no newline, so ranges are joined with one.
+    block = b'\n'.join(data[start:stop] for start, stop in zip(begin, end))
+    numbers = np.fromstring(block, sep=' ') if block.strip() else np.empty(0)
+    if len(numbers) % columns:
+        raise ValueError("Malformed rows in .adcp file")
+    return numbers.reshape(-1, columns)
+
+
+def _adcp_layout(buf, starts):
+    # Row ranges of each collection's measurements and metadata block.
+    # A collection without a terminator (e.g. a file still being written)
+    # is all measurements and has no metadata.
+    sentinels = _lines_with_prefix(buf, starts, ADCP_SENTINEL)
+    terminators = _lines_with_prefix(buf, starts, ADCP_TERMINATOR)
+    next_sentinels = np.append(sentinels[1:], len(starts))
+    following = np.searchsorted(terminators, sentinels)
+    term = np.append(terminators, len(starts))[following]
+    complete = term < next_sentinels
+    first = sentinels + 1
+    last = np.where(complete, term - ADCP_TRAILER_ROWS, next_sentinels)
+    last = np.maximum(last, first)
+    return first, last, complete, term
+
+
+class AdcpIndex:
+    # Byte range and row count of every collection in an .adcp file, plus its
+    # decoded metadata. `size` and `mtime_ns` identify the file version;
+    # `tail` is where the last complete collection's terminator row starts,
+    # so a file that grows only needs parsing from there on. `fingerprints`
+    # (see backend.dedup) cover the first collections once computed.
+    def __init__(self, begin, end, counts, metadata, size=0, mtime_ns=0, tail=0, fingerprints=None):
+        self.begin = begin
+        self.end = end
+        self.counts = counts
+        self.metadata = metadata
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.tail = tail
+        self.fingerprints = np.empty(0, dtype='<u8') if fingerprints is None else fingerprints
+
+    @classmethod
+    def from_buffer(cls, data, mtime_ns=0):
+        buf = np.frombuffer(data, dtype=np.uint8)
+        if not len(buf):
+            empty = np.empty(0, dtype='i8')
+            return cls(empty, empty, empty, empty_metadata(0), 0, mtime_ns)
+
+        starts = _line_starts(buf)
+        bounds = np.append(starts, len(buf))
+        first, last, complete, term = _adcp_layout(buf, starts)
+        size = len(buf)
+        del buf
+
+        metadata = empty_metadata(len(first))
+        meta_first = term[complete] - ADCP_METADATA_ROWS - 1
+        values = _parse_rows(data, bounds[meta_first], bounds[meta_first + ADCP_METADATA_ROWS],
+                             len(ADCP_METADATA_FIELDS))
+        for column, name in enumerate(ADCP_METADATA_FIELDS):
+            metadata[name][complete] = values[:, column]
+        metadata['timestamp'] = compute_timestamps(metadata)
+
+        finished = term[complete]
+        tail = int(bounds[finished[-1]]) if len(finished) else 0
+        return cls(bounds[first], bounds[last], last - first, metadata, size, mtime_ns, tail)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            if int(saved['version']) != INDEX_VERSION:
+                raise ValueError("Outdated index version")
+            return cls(saved['begin'], saved['end'], saved['counts'], saved['metadata'],
+                       int(saved['size']), int(saved['mtime_ns']), int(saved['tail']), saved['fingerprints'])
+
+    def save(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            np.savez(file, version=INDEX_VERSION, begin=self.begin, end=self.end,
+                     counts=self.counts, metadata=self.metadata,
+                     size=self.size, mtime_ns=self.mtime_ns, tail=self.tail, fingerprints=self.fingerprints)
+        os.replace(temp_path, path)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def matches(self, stat):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    def head(self, limit):
+        return AdcpIndex(self.begin[:limit], self.end[:limit], self.counts[:limit],
+                         self.metadata[:limit], self.size, self.mtime_ns, self.tail, self.fingerprints[:limit])
+
+    def can_extend(self, data):
+        # True when the file only grew: everything up to the tail is unchanged
+        if len(data) <= self.size:
+            return False
+        return self.tail == 0 or data[self.tail:self.tail + len(ADCP_TERMINATOR)] == ADCP_TERMINATOR
+
+    def extended(self, data, mtime_ns=0):
+        # Keeps the complete collections and parses only the bytes after them
+        added = AdcpIndex.from_buffer(data[self.tail:], mtime_ns)
+        keep = np.searchsorted(self.begin, self.tail)
+        return AdcpIndex(
+            np.concatenate((self.begin[:keep], added.begin + self.tail)),
+            np.concatenate((self.end[:keep], added.end + self.tail)),
+            np.concatenate((self.counts[:keep], added.counts)),
+            np.concatenate((self.metadata[:keep], added.metadata)),
+            len(data), mtime_ns, self.tail + added.tail, self.fingerprints[:keep]
+        )
+
+    def decode(self, data, indices):
+        rows = _parse_rows(data, self.begin[indices], self.end[indices], 2)
+        if len(rows) != self.counts[indices].sum():
+            raise ValueError("Malformed measurement rows in .adcp file")
+        return rows
+
+
+def _read_index(filepath, previous=None):
+    with open(filepath, 'rb') as file:
+        mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+        if os.fstat(file.fileno()).st_size == 0:
+            return AdcpIndex.from_buffer(b'', mtime_ns)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if previous is not None and previous.can_extend(data):
+                return previous.extended(data, mtime_ns)
+            return AdcpIndex.from_buffer(data, mtime_ns)
+
+
+def get_index(filepath, previous=None):
+    # Reuses the sidecar index unless the file's size or mtime has changed;
+    # a file that was appended to is only parsed from the old index's tail
+    stat = os.stat(filepath)
+    index_path = filepath + INDEX_SUFFIX
+    if previous is not None and previous.matches(stat):
+        return previous
+    try:
+        saved = AdcpIndex.load(index_path)
+        if saved.matches(stat):
+            return saved
+        if previous is None:
+            previous = saved
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = _read_index(filepath, previous)
+    try:
+        index.save(index_path)
+    except OSError as e:
+        print(f"Could not write index {index_path}: {e}")
+    return index
+
+
+def save_fingerprints(filepath, fingerprints):
+    # Keeps fingerprints of the file's first collections in its sidecar
+    # index, as long as that still describes the file
+    index_path = filepath + INDEX_SUFFIX
+    try:
+        saved = AdcpIndex.load(index_path)
+        if not saved.matches(os.stat(filepath)) or len(saved.fingerprints) >= len(fingerprints):
+            return
+        saved.fingerprints = fingerprints[:len(saved)]
+        saved.save(index_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not update index {index_path}: {e}")
+
+
+def parse_adcp_buffer(data, limit=None):
+    with span('parse.adcp.index'):
+        index = AdcpIndex.from_buffer(data)
+    if limit is not None:
+        index = index.head(limit)
+    with span('parse.adcp.decode', collections=len(index)):
+        rows = index.decode(data, np.arange(len(index)))
+    offsets = np.concatenate(([0], np.cumsum(index.counts))).astype('i8')
+    return CollectionStore(rows[:, 0].copy(), rows[:, 1].copy(), offsets, index.metadata)
+
+
+class AdcpStore(CollectionStore):
+    # Collections of an indexed .adcp file. Measurements are decoded from the
+    # file's byte ranges when asked for instead of being held in memory.
+    def __init__(self, filepath, index):
+        self.filepath = filepath
+        self.index = index
+        self.offsets = np.concatenate(([0], np.cumsum(index.counts))).astype('i8')
+        self.metadata = index.metadata
+        self.extras = None
+        self._rows = None
+
+    def _decode(self, indices):
+        # Raises OSError if the file is gone and ValueError if it was
+        # rewritten since it was indexed, as the byte ranges no longer apply
+        if len(indices) == 0 or self.index.counts[indices].sum() == 0:
+            return np.empty((0, 2))
+        with open(self.filepath, 'rb') as file:
+            if not self.index.matches(os.fstat(file.fileno())):
+                raise ValueError(f"{self.filepath} has changed since it was loaded")
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return self.index.decode(data, indices)
+
+    def _all_rows(self):
+        if self._rows is None:
+            self._rows = self._decode(np.arange(len(self.index)))
+        return self._rows
+
+    @property
+    def depths(self):
+        return self._all_rows()[:, 0]
+
+    @property
+    def values(self):
+        return self._all_rows()[:, 1]
+
+    @property
+    def nbytes(self):
+        resident = self.offsets.nbytes + self.metadata.nbytes
+        resident += self.index.begin.nbytes + self.index.end.nbytes + self.index.counts.nbytes
+        if self._rows is not None:
+            resident += self._rows.nbytes
+        return resident
+
+    @property
+    def measurement_nbytes(self):
+        return 0 if self._rows is None else self._rows.nbytes
+
+    def release_measurements(self, directory):
+        # Decoded rows are dropped; reads decode from the file again
+        released = self.measurement_nbytes
+        self._rows = None
+        return released
+
+    def measurements(self, index):
+        if self._rows is not None:
+            return super().measurements(index)
+        rows = self._decode([index])
+        return rows[:, 0], rows[:, 1]
+
+    def take(self, indices):
+        if self._rows is not None:
+            return super().take(indices)
+        rows = self._decode(np.asarray(indices))
+        return rows[:, 0], rows[:, 1]
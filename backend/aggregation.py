@@ -0,0 +1,105 @@
+import warnings
+
+import numpy as np
+
+# Distribution summaries of many profiles: every profile is resampled onto
+# one shared depth grid so statistics are plain column reductions.
+
+GRID_STEP = 0.25
+MAX_GRID_POINTS = 1000
+PERCENTILES = (10, 90)
+AGGREGATE_GROUPS = ('file', 'unit_number', 'day')
+
+
+def depth_grid(depths, step=GRID_STEP):
+    finite = depths[np.isfinite(depths)]
+    if not len(finite):
+        return np.empty(0)
+    start, stop = np.floor(finite.min() / step) * step, np.ceil(finite.max() / step) * step
+    step = max(step, (stop - start) / MAX_GRID_POINTS)
+    return np.arange(start, stop + step / 2, step)
+
+
+def resample_profiles(depths, values, offsets, grid):
+    # Linear interpolation of every profile at every grid depth in one pass.
+    # Rows are profiles; depths outside a profile's own range are NaN.
+    counts = np.diff(offsets)
+    n_profiles, n_grid = len(counts), len(grid)
+    if not len(depths) or not n_grid:
+        return np.full((n_profiles, n_grid), np.nan)
+    profile = np.repeat(np.arange(n_profiles), counts)
+
+    x, y = depths, values
+    valid = np.isfinite(depths) & np.isfinite(values)
+    if not valid.all():
+        if not valid.any():
+            return np.full((n_profiles, n_grid), np.nan)
+        x, y, profile = depths[valid], values[valid], profile[valid]
+        counts = np.bincount(profile, minlength=n_profiles)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    # Shifting each profile into its own band of the depth axis turns all
+    # lookups into one searchsorted over one sorted array
+    base = min(x.min(), grid[0])
+    span = max(x.max(), grid[-1]) - base + 1.0
+    shifted = (x - base) + profile * span
+    if np.any(np.diff(shifted) < 0):
+        # Some profile isn't recorded in depth order
+        order = np.argsort(shifted, kind='stable')
+        shifted, x, y = shifted[order], x[order], y[order]
+    targets = (grid[None, :] - base) + np.arange(n_profiles)[:, None] * span
+
+    # right is each grid depth's first sample at or beyond it
+    right = np.searchsorted(shifted, targets.ravel(), side='left').reshape(n_profiles, n_grid)
+    first, last = offsets[:-1, None], offsets[1:, None] - 1
+    inside = (right > first) & (right <= last)
+    on_first = (right == first) & (right <= last)
+    on_first &= shifted[np.minimum(right, len(x) - 1)] == targets
+
+    safe = np.clip(right, 1, len(x) - 1)
+    x0, x1, y0, y1 = x[safe - 1], x[safe], y[safe - 1], y[safe]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        interpolated = y0 + (grid[None, :] - x0) / (x1 - x0) * (y1 - y0)
+    result = np.where(inside, interpolated, np.nan)
+    result = np.where(on_first, y[np.minimum(right, len(x) - 1)], result)
+    return result
+
+
+def group_profiles(keys, metadata, by):
+    # Group number per profile and the group labels, in first-seen order
+    if by == 'file':
+        names = np.array([file_name for file_name, _ in keys], dtype=object)
+    elif by == 'unit_number':
+        units = metadata['unit_number']
+        numbers = np.nan_to_num(units).astype(np.int64).astype(str)
+        names = np.where(np.isnan(units), "Unknown unit", np.char.add("Unit ", numbers)).astype(object)
+    elif by == 'day':
+        days = metadata['timestamp'].astype('M8[D]')
+        names = np.where(np.isnat(days), "Unknown day", days.astype(str)).astype(object)
+    else:
+        raise ValueError(f"Unknown grouping '{by}'")
+    labels, first, groups = np.unique(names, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[groups], [str(label) for label in labels[order]]
+
+
+def summarize(matrix, groups, group_count, percentiles=PERCENTILES):
+    # Per group and grid depth: mean, median, lower and upper percentile, and
+    # how many profiles the group holds
+    summary = []
+    with warnings.catch_warnings():
+        # Grid depths no profile of a group reaches are NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for group in range(group_count):
+            rows = matrix[groups == group]
+            low, median, high = np.nanpercentile(rows, [percentiles[0], 50, percentiles[1]], axis=0)
+            summary.append({
+                'mean': np.nanmean(rows, axis=0),
+                'median': median,
+                'low': low,
+                'high': high,
+                'count': len(rows),
+            })
+    return summary
@@ -0,0 +1,162 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backend.data_parsing import load_file
+from backend.export_engine import EXPORT_DPI, build_pages, export_pdf, export_png
+from backend.figures import METADATA_TABS, cycle_color
+from backend.metadata_query import MetadataIndex, parse_filter
+from backend.metrics import compute_metrics, metric_specs, parse_metric, write_metrics_csv
+from backend.worker_pools import MAX_WORKERS
+
+# Headless counterpart of plot_data + export_selected for scheduled jobs:
+#   python -m backend.batch_render data/2024-06 -o reports --where "abort_status == 0"
+# Each input file becomes one report, rendered in its own worker process.
+
+DATA_EXTENSIONS = ('.json', '.adcp')
+
+
+def collect_files(inputs):
+    files = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                files.extend(os.path.join(root, name) for name in names)
+        else:
+            files.extend(glob.glob(pattern, recursive=True))
+    files = [path for path in files if path.lower().endswith(DATA_EXTENSIONS) and os.path.isfile(path)]
+    return sorted(set(os.path.abspath(path) for path in files))
+
+
+def report_paths(file_path, output, options):
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    if options['format'] in ('pdf', 'csv'):
+        return [os.path.join(output, f"{name}.{options['format']}")]
+    pages = ['profile'] + options['metadata_fields'] + (['legend'] if options['include_legend'] else [])
+    return [os.path.join(output, f"{name}_{page}.png") for page in pages]
+
+
+def is_up_to_date(file_path, output, options):
+    source_mtime = os.path.getmtime(file_path)
+    paths = report_paths(file_path, output, options)
+    return all(os.path.exists(path) and os.path.getmtime(path) >= source_mtime for path in paths)
+
+
+def render_file(file_path, output, options):
+    # Runs in a worker process: load, filter, render and write one report
+    store = load_file(file_path, options['limit'])
+    if store is None:
+        return None, "could not be loaded"
+    indices = MetadataIndex(store.metadata).query(options['filters'])
+    if not len(indices):
+        return [], "no collections matched"
+
+    file_name = os.path.basename(file_path)
+    if options['format'] == 'csv':
+        path = report_paths(file_path, output, options)[0]
+        metrics = compute_metrics(store.depths, store.values, store.offsets, options['metrics'])
+        write_metrics_csv(path, [(file_name, int(index)) for index in indices], store.metadata[indices],
+                          {spec: values[indices] for spec, values in metrics.items()})
+        return [path], f"{len(indices)} collections"
+    entries = [(file_name, int(index), store, cycle_color(number)) for number, index in enumerate(indices)]
+    pages = build_pages(entries, options['metadata_fields'], options['include_legend'])
+    if options['format'] == 'pdf':
+        paths = export_pdf(pages, report_paths(file_path, output, options)[0], options['dpi'], parallel=False)
+    else:
+        name = os.path.splitext(file_name)[0]
+        paths = export_png(pages, output, name, options['dpi'], parallel=False)
+    return paths, f"{len(indices)} collections"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="batch_render", description="Render ADCP reports without the GUI.")
+    parser.add_argument('inputs', nargs='+', help="data files, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='plots', help="output directory (default: plots)")
+    parser.add_argument('-f', '--format', choices=['pdf', 'png', 'csv'], default='pdf',
+                        help="csv writes the derived metrics of each collection instead of plots")
+    parser.add_argument('--fields', default=','.join(METADATA_TABS),
+                        help="comma-separated metadata plots to include, or 'none'")
+    parser.add_argument('--metrics', help="comma-separated metrics for csv output (default: ADCP_METRICS or all)")
+    parser.add_argument('--no-legend', action='store_true', help="leave out the legend page")
+    parser.add_argument('--where', action='append', default=[], metavar='FILTER',
+                        help="metadata filter such as 'abort_status == 0'; may be repeated")
+    parser.add_argument('--limit', type=int, help="only read the first LIMIT collections of each file")
+    parser.add_argument('--dpi', type=int, default=EXPORT_DPI)
+    parser.add_argument('-j', '--jobs', type=int, default=MAX_WORKERS, help="files rendered at once")
+    parser.add_argument('--force', action='store_true', help="re-render reports that are newer than their data")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fields = [] if args.fields == 'none' else [field.strip() for field in args.fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in METADATA_TABS]
+    if unknown:
+        print(f"Unknown metadata plots: {', '.join(unknown)}")
+        return 2
+    metrics = metric_specs() if not args.metrics else [spec.strip() for spec in args.metrics.split(',') if spec.strip()]
+    try:
+        filters = [parse_filter(text) for text in args.where]
+        for spec in metrics:
+            parse_metric(spec)
+    except ValueError as e:
+        print(e)
+        return 2
+
+    options = {
+        'format': args.format,
+        'metadata_fields': fields,
+        'include_legend': not args.no_legend,
+        'filters': filters,
+        'metrics': metrics,
+        'limit': args.limit,
+        'dpi': args.dpi,
+    }
+    files = collect_files(args.inputs)
+    if not args.force:
+        files = [path for path in files if not is_up_to_date(path, args.output, options)]
+    if not files:
+        print("No files to render.")
+        return 0
+    os.makedirs(args.output, exist_ok=True)
+
+    failed = 0
+    if args.jobs <= 1:
+        results = ((path, _run(render_file, path, args.output, options)) for path in files)
+        for file_path, (paths, message) in results:
+            failed += _report(file_path, paths, message)
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.jobs, mp_context=context) as pool:
+            futures = {pool.submit(_run, render_file, path, args.output, options): path for path in files}
+            # Reported as each report lands on disk, not in input order
+            for future in as_completed(futures):
+                paths, message = future.result()
+                failed += _report(futures[future], paths, message)
+    print(f"Rendered {len(files) - failed} of {len(files)} files.")
+    return 1 if failed else 0
+
+
+def _run(function, *args):
+    try:
+        return function(*args)
+    except Exception as e:
+        return None, str(e)
+
+
+def _report(file_path, paths, message):
+    if paths is None:
+        print(f"Failed {file_path}: {message}")
+        return 1
+    if not paths:
+        print(f"Skipped {file_path}: {message}")
+        return 0
+    print(f"Rendered {file_path} ({message}) -> {', '.join(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+from array import array
+import json
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+from backend.worker_pools import SHARED_DIR
+
+# Known per-collection metadata, stored column-wise. Numeric fields are float64
+# with NaN marking a missing value; anything else ends up in `extras`.
+METADATA_FIELDS = [
+    ('latitude', 'f8'),
+    ('longitude', 'f8'),
+    ('altitude', 'f8'),
+    ('month', 'f8'),
+    ('day', 'f8'),
+    ('year', 'f8'),
+    ('hour', 'f8'),
+    ('minute', 'f8'),
+    ('second', 'f8'),
+    ('n_satellites', 'f8'),
+    ('hdop_error', 'f8'),
+    ('adcp_internal_temp_f', 'f8'),
+    ('internal_temp', 'f8'),
+    ('abort_status', 'f8'),
+    ('unit_number', 'f8'),
+    ('actuator_absolute_position_error', 'f8'),
+    ('position_correction_count', 'f8'),
+    ('measurement_units', 'U16'),
+    ('vwc', 'f8'),
+    ('b_horizon', 'f8'),
+    ('b_horizon_transition', 'f8'),
+]
+METADATA_DTYPE = np.dtype(METADATA_FIELDS + [('timestamp', 'M8[s]')])
+
+NUMERIC_FIELDS = [name for name, kind in METADATA_FIELDS if kind == 'f8']
+STRING_FIELDS = [name for name, kind in METADATA_FIELDS if kind != 'f8']
+
+STORE_ARRAYS = ('depths', 'values', 'offsets', 'metadata')
+MEASUREMENT_ARRAYS = ('depths', 'values')
+
+
+def empty_metadata(count):
+    metadata = np.empty(count, dtype=METADATA_DTYPE)
+    for name in NUMERIC_FIELDS:
+        metadata[name] = np.nan
+    for name in STRING_FIELDS:
+        metadata[name] = ''
+    metadata['timestamp'] = np.datetime64('NaT')
+    return metadata
+
+
+def compute_timestamps(metadata):
+    year, month, day = metadata['year'], metadata['month'], metadata['day']
+    valid = ((year > 0) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31))
+    timestamps = np.full(len(metadata), np.datetime64('NaT'), dtype='M8[s]')
+    if valid.any():
+        dates = ((year[valid].astype('i8') - 1970).astype('M8[Y]')
+                 + (month[valid].astype('i8') - 1).astype('m8[M]')).astype('M8[D]')
+        dates = dates + (day[valid].astype('i8') - 1).astype('m8[D]')
+        seconds = (np.nan_to_num(metadata['hour'][valid]) * 3600
+                   + np.nan_to_num(metadata['minute'][valid]) * 60
+                   + np.nan_to_num(metadata['second'][valid]))
+        timestamps[valid] = dates.astype('M8[s]') + seconds.astype('i8').astype('m8[s]')
+    return timestamps
+
+
+class StoreBuilder:
+    # Accumulates collections into flat buffers so the per-point dicts can be
+    # dropped as soon as each collection has been read.
+    def __init__(self):
+        self.depths = array('d')
+        self.values = array('d')
+        self.offsets = array('q', [0])
+        self.columns = {name: [] for name, _ in METADATA_FIELDS}
+        self.extras = []
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, collection):
+        measurements = collection.get('measurements') or []
+        self.depths.extend(point.get('depth', np.nan) for point in measurements)
+        self.values.extend(point.get('value', np.nan) for point in measurements)
+        self.offsets.append(len(self.depths))
+
+        metadata = dict(collection.get('metadata') or {})
+        for name in NUMERIC_FIELDS:
+            value = metadata.pop(name, None)
+            try:
+                self.columns[name].append(np.nan if value is None else float(value))
+            except (TypeError, ValueError):
+                self.columns[name].append(np.nan)
+                metadata[name] = value
+        for name in STRING_FIELDS:
+            value = metadata.pop(name, None)
+            self.columns[name].append('' if value is None else str(value))
+        self.extras.append(metadata or None)
+
+    def build(self):
+        metadata = np.empty(len(self), dtype=METADATA_DTYPE)
+        for name, values in self.columns.items():
+            metadata[name] = values
+        metadata['timestamp'] = compute_timestamps(metadata)
+        extras = self.extras if any(self.extras) else None
+        return CollectionStore(
+            np.frombuffer(self.depths, dtype='f8').copy(),
+            np.frombuffer(self.values, dtype='f8').copy(),
+            np.frombuffer(self.offsets, dtype='i8').copy(),
+            metadata,
+            extras
+        )
+
+
+class CollectionStore:
+    # All collections of one file: contiguous depth/value arrays split by
+    # `offsets`, plus one structured metadata row per collection.
+    def __init__(self, depths, values, offsets, metadata, extras=None):
+        self.depths = depths
+        self.values = values
+        self.offsets = offsets
+        self.metadata = metadata
+        self.extras = extras
+
+    @classmethod
+    def from_collections(cls, collections):
+        builder = StoreBuilder()
+        for collection in collections:
+            builder.append(collection)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def __getitem__(self, index):
+        depths, values = self.measurements(index)
+        return {
+            'depths': depths,
+            'values': values,
+            'metadata': self.metadata_dict(index)
+        }
+
+    @property
+    def nbytes(self):
+        return self.depths.nbytes + self.values.nbytes + self.offsets.nbytes + self.metadata.nbytes
+
+    @property
+    def measurement_nbytes(self):
+        # Measurement bytes held in process memory. Arrays mapped from disk
+        # are paged in and out by the OS; mapped shared memory still counts.
+        return sum(getattr(self, name).nbytes for name in MEASUREMENT_ARRAYS
+                   if not _file_backed(getattr(self, name)))
+
+    def release_measurements(self, directory):
+        # Moves the measurement arrays to .npy files under directory and maps
+        # them back, so reads page them in again. Returns the bytes released.
+        released = self.measurement_nbytes
+        if not released:
+            return 0
+        os.makedirs(directory, exist_ok=True)
+        spill_dir = tempfile.mkdtemp(prefix='adcp-spill-', dir=directory)
+        for name in MEASUREMENT_ARRAYS:
+            path = os.path.join(spill_dir, f"{name}.npy")
+            np.save(path, getattr(self, name))
+            setattr(self, name, np.load(path, mmap_mode='r'))
+        # Mapped files stay readable after unlinking on POSIX; Windows keeps
+        # them locked until the arrays are gone.
+        if os.name != 'nt':
+            shutil.rmtree(spill_dir, ignore_errors=True)
+        else:
+            weakref.finalize(self, shutil.rmtree, spill_dir, True)
+        return released
+
+    def measurements(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.depths[start:end], self.values[start:end]
+
+    def take(self, indices):
+        # Measurements of the given collections, concatenated in that order
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        positions = segment_positions(starts, self.offsets[indices + 1] - starts)
+        return self.depths[positions], self.values[positions]
+
+    def metadata_dict(self, index):
+        row = self.metadata[index]
+        metadata = {}
+        for name, kind in METADATA_FIELDS:
+            value = row[name].item()
+            if (kind == 'f8' and not np.isnan(value)) or (kind != 'f8' and value):
+                metadata[name] = value
+        if self.extras and self.extras[index]:
+            metadata.update(self.extras[index])
+        return metadata
+
+
+def segment_positions(starts, counts):
+    # The ranges [start, start + count), concatenated
+    counts = np.asarray(counts, dtype=np.int64)
+    return np.arange(counts.sum()) + np.repeat(np.asarray(starts, dtype=np.int64) - (np.cumsum(counts) - counts), counts)
+
+
+def readable_measurements(pairs):
+    # Measurements of the (store, index) pairs that can still be read, and
+    # the positions of those pairs. Lazily decoded stores read their source
+    # file, which may have been moved, deleted or rewritten since; such
+    # collections are skipped with a message instead of failing the caller.
+    measurements, readable, failures = [], [], {}
+    for position, (store, index) in enumerate(pairs):
+        try:
+            measurements.append(store.measurements(index))
+        except (OSError, ValueError) as e:
+            failures[str(e)] = failures.get(str(e), 0) + 1
+            continue
+        readable.append(position)
+    for message, count in failures.items():
+        print(f"Skipped {count} collection{'s' if count > 1 else ''}: {message}")
+    return measurements, readable
+
+
+def _file_backed(array):
+    if not isinstance(array, np.memmap) or array.filename is None:
+        return False
+    return SHARED_DIR is None or not os.path.abspath(array.filename).startswith(SHARED_DIR + os.sep)
+
+
+def save_store(store, directory):
+    # One .npy file per array so they can be memory-mapped back individually
+    os.makedirs(directory, exist_ok=True)
+    for name in STORE_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), getattr(store, name))
+    if store.extras:
+        with open(os.path.join(directory, 'extras.json'), 'w') as file:
+            json.dump(store.extras, file)
+
+
+def load_store(directory, mmap_mode='r'):
+    arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in STORE_ARRAYS]
+    extras = None
+    extras_path = os.path.join(directory, 'extras.json')
+    if os.path.exists(extras_path):
+        with open(extras_path, 'r') as file:
+            extras = json.load(file)
+    return CollectionStore(*arrays, extras)
@@ -1,25 +1,166 @@
 import json
+import mmap
+import os
 
-def load_json(filepath):
+from backend.adcp_index import AdcpStore, get_index, parse_adcp_buffer
+from backend.collection_store import StoreBuilder
+from backend.tracing import span
+
+CHUNK_SIZE = 1 << 20
+
+
+class _JsonStream:
+    # Minimal pull reader over a text file: decodes one JSON value at a time
+    # so large top-level arrays never have to be held in memory at once.
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def _skip_ws(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return
+            self._fill()
+
+    def accept(self, char):
+        self._skip_ws()
+        if self.buf[self.pos:self.pos + 1] == char:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, char):
+        if not self.accept(char):
+            found = self.buf[self.pos:self.pos + 1] or 'end of file'
+            raise ValueError(f"Expected '{char}' but found '{found}'")
+
+    def decode(self):
+        self._skip_ws()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number ending exactly at the buffer edge may be truncated
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            self._fill(size)
+            size *= 2
+
+
+def _wrap(entry):
+    measurements = entry.pop('measurements', [])
+    return {
+        'measurements': measurements,
+        'metadata': entry
+    }
+
+
+def iter_json(filepath, limit=None):
+    # Yields collections one at a time as the 'data' array is decoded.
+    # Stops reading once `limit` collections have been produced.
+    with open(filepath, 'r') as file:
+        stream = _JsonStream(file)
+        stream.expect('{')
+        found = False
+        if stream.accept('}'):
+            raise ValueError("No 'data' key found in JSON file.")
+        while True:
+            key = stream.decode()
+            stream.expect(':')
+            if key == 'data':
+                found = True
+                stream.expect('[')
+                count = 0
+                if not stream.accept(']'):
+                    while True:
+                        if limit is not None and count >= limit:
+                            return
+                        yield _wrap(stream.decode())
+                        count += 1
+                        if stream.accept(']'):
+                            break
+                        stream.expect(',')
+            else:
+                stream.decode()
+            if not stream.accept(','):
+                stream.expect('}')
+                break
+        if not found:
+            raise ValueError("No 'data' key found in JSON file.")
+
+
+def load_json(filepath, limit=None, cancelled=None):
     try:
-        with open(filepath, 'r') as file:
-            data = json.load(file)
+        with span('parse.json', file=os.path.basename(filepath), bytes=os.path.getsize(filepath)) as timing:
+            builder = StoreBuilder()
+            # Reading, decoding and wrapping are interleaved per collection
+            with span('parse.json.decode'):
+                for collection in iter_json(filepath, limit):
+                    if cancelled is not None and cancelled.is_set():
+                        print(f"Cancelled loading JSON file: {filepath}")
+                        return None
+                    builder.append(collection)
+            with span('parse.json.build'):
+                store = builder.build()
+            timing.set(collections=len(store))
         print(f"Loaded JSON file: {filepath}")
-        if 'data' in data:
-            # Extract metadata and wrap measurements separately
-            wrapped = []
-            for entry in data['data']:
-                measurements = entry.get('measurements', [])
-                metadata = {k: v for k, v in entry.items() if k != 'measurements'}
-                wrapped.append({
-                    'measurements': measurements,
-                    'metadata': metadata
-                })
-            return wrapped
-        else:
-            print("No 'data' key found in JSON file.")
-            return None
+        return store
     except Exception as e:
         print(f"Error loading JSON file {filepath}: {e}")
         return None
-# This is where I will put the .adcp file handling and metadata parsing when/if I get to it
\ No newline at end of file
+
+
+def load_adcp(filepath, limit=None):
+    try:
+        with open(filepath, 'rb') as file, span('parse.adcp', file=os.path.basename(filepath)) as timing:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                store = parse_adcp_buffer(b'', limit)
+            else:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    store = parse_adcp_buffer(data, limit)
+            timing.set(bytes=size, collections=len(store))
+        print(f"Loaded ADCP file: {filepath}")
+        return store
+    except Exception as e:
+        print(f"Error loading ADCP file {filepath}: {e}")
+        return None
+
+
+def open_adcp(filepath, limit=None):
+    # Lists collections from the offset index without decoding measurements
+    try:
+        with span('parse.adcp.index', file=os.path.basename(filepath), bytes=os.path.getsize(filepath)) as timing:
+            index = get_index(filepath)
+            timing.set(collections=len(index))
+        if limit is not None:
+            index = index.head(limit)
+        print(f"Indexed ADCP file: {filepath}")
+        return AdcpStore(filepath, index)
+    except Exception as e:
+        print(f"Error indexing ADCP file {filepath}: {e}")
+        return None
+
+
+def load_file(filepath, limit=None):
+    if filepath.lower().endswith('.adcp'):
+        return load_adcp(filepath, limit)
+    return load_json(filepath, limit)
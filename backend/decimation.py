@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def m4_decimate(x, y, offsets, x_range, columns):
+    # M4 aggregation: for every run of consecutive points of a profile that
+    # fall into the same pixel column, keep the first, last, lowest and
+    # highest point. Lines drawn from the kept points are pixel-identical to
+    # the full data at that resolution. Points outside x_range share one
+    # column on either side. Returns indices into x/y and the offsets of the
+    # kept points per profile.
+    n = len(x)
+    if n == 0:
+        return np.arange(0), np.zeros_like(offsets)
+    counts = np.diff(offsets)
+    profile = np.repeat(np.arange(len(counts)), counts)
+
+    x0, x1 = x_range
+    scale = columns / ((x1 - x0) or 1.0)
+    column = np.clip(np.floor(np.nan_to_num((x - x0) * scale, nan=-1.0)), -1, columns).astype(np.int64)
+    group = profile * (columns + 2) + column + 1
+
+    run_starts = np.concatenate(([0], np.flatnonzero(np.diff(group)) + 1))
+    run_lengths = np.diff(np.append(run_starts, n))
+    run_id = np.repeat(np.arange(len(run_starts)), run_lengths)
+    lows = np.fmin.reduceat(y, run_starts)
+    highs = np.fmax.reduceat(y, run_starts)
+
+    # One lowest and one highest point per run (the first of equal ones), so
+    # flat or quantized runs still shrink to at most four points
+    index = np.arange(n)
+    lowest = np.minimum.reduceat(np.where(y == lows[run_id], index, n), run_starts)
+    highest = np.minimum.reduceat(np.where(y == highs[run_id], index, n), run_starts)
+    keep = np.zeros(n + 1, dtype=bool)
+    keep[lowest] = True
+    keep[highest] = True
+    keep = keep[:n]
+    keep[run_starts] = True
+    keep[run_starts + run_lengths - 1] = True
+    kept = np.flatnonzero(keep)
+    return kept, np.searchsorted(kept, offsets)
@@ -0,0 +1,252 @@
+import hashlib
+import threading
+import weakref
+
+import numpy as np
+
+from backend.adcp_index import AdcpStore, save_fingerprints
+from backend.collection_store import CollectionStore, segment_positions
+from backend.tracing import span
+
+# The same collection often comes in through several files (a unit's daily
+# dump and the weekly export that merges it). Each collection gets a 64-bit
+# fingerprint: a SHA-256 of its depths, values and key metadata, truncated.
+# Fingerprints are computed in the background once a file is listed; .adcp
+# files keep theirs in the sidecar index. The first loaded copy of a
+# collection holds its measurements and later copies read from it.
+
+# Metadata that has to match as well, besides the measurements
+KEY_FIELDS = ['unit_number', 'year', 'month', 'day', 'hour', 'minute', 'second']
+
+# store -> fingerprints; a reloaded file is a new store
+_cache = weakref.WeakKeyDictionary()
+# Stores are fingerprinted on several worker threads at once
+_lock = threading.Lock()
+
+
+def fingerprints(store):
+    with _lock:
+        cached = _cache.get(store)
+    if cached is not None:
+        return cached
+    with span('load.fingerprint', collections=len(store)):
+        if isinstance(store, AdcpStore):
+            result = _adcp_fingerprints(store)
+        else:
+            result = collection_fingerprints(store.depths, store.values, store.offsets, store.metadata)
+    with _lock:
+        _cache[store] = result
+    return result
+
+
+def cached_fingerprints(store):
+    # The store's fingerprints if they have been computed, else None
+    with _lock:
+        return _cache.get(store)
+
+
+def _adcp_fingerprints(store):
+    # Only collections the sidecar has no fingerprints for are decoded, e.g.
+    # the ones an appended file gained; decoded rows are not kept
+    index = store.index
+    known = index.fingerprints[:len(store)]
+    if len(known) < len(store):
+        added = np.arange(len(known), len(store))
+        depths, values = store.take(added)
+        offsets = np.concatenate(([0], np.cumsum(index.counts[added])))
+        known = np.concatenate((known, collection_fingerprints(depths, values, offsets, store.metadata[added])))
+        index.fingerprints = known
+        save_fingerprints(store.filepath, known)
+    return known
+
+
+def collection_fingerprints(depths, values, offsets, metadata):
+    depth_bytes = memoryview(np.ascontiguousarray(depths, dtype='<f8')).cast('B')
+    value_bytes = memoryview(np.ascontiguousarray(values, dtype='<f8')).cast('B')
+    keys = np.column_stack([metadata[field] for field in KEY_FIELDS]) if len(metadata) else np.empty((0, len(KEY_FIELDS)))
+    # -0.0 and every NaN hash like 0.0 and NaN
+    keys = np.where(np.isnan(keys), np.nan, keys + 0.0).astype('<f8')
+    key_bytes = memoryview(np.ascontiguousarray(keys)).cast('B')
+    key_size = 8 * len(KEY_FIELDS)
+
+    bounds = (np.asarray(offsets, dtype=np.int64) * 8).tolist()
+    digests = bytearray()
+    sha256 = hashlib.sha256
+    for index in range(len(bounds) - 1):
+        start, end = bounds[index], bounds[index + 1]
+        digest = sha256(depth_bytes[start:end])
+        digest.update(value_bytes[start:end])
+        digest.update(key_bytes[index * key_size:(index + 1) * key_size])
+        digests += digest.digest()[:8]
+    return np.frombuffer(bytes(digests), dtype='<u8')
+
+
+class DuplicateIndex:
+    # Fingerprints of every loaded file, in the order the files were added
+    def __init__(self):
+        self.files = {}
+
+    def add(self, file_name, prints):
+        self.files[file_name] = prints
+
+    def remove(self, file_name):
+        self.files.pop(file_name, None)
+
+    def clear(self):
+        self.files = {}
+
+    def unique_mask(self, file_names, counts):
+        # Over the concatenated collections of file_names (the first counts
+        # of each), True for the first copy of every collection. Collections
+        # not fingerprinted yet count as unique.
+        starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        mask = np.ones(starts[-1], dtype=bool)
+        parts = [(start, self.files[name][:count]) for name, start, count in zip(file_names, starts, counts)
+                 if name in self.files]
+        if not parts:
+            return mask
+        combined = np.concatenate([prints for _, prints in parts])
+        positions = np.concatenate([start + np.arange(len(prints)) for start, prints in parts])
+        _, first = np.unique(combined, return_index=True)
+        copies = np.ones(len(combined), dtype=bool)
+        copies[first] = False
+        mask[positions[copies]] = False
+        return mask
+
+    def sources(self, file_name, index):
+        # Every (file name, collection index) holding the same collection;
+        # none while the file's current fingerprints are not in yet
+        prints = self.files.get(file_name)
+        if prints is None or index >= len(prints):
+            return []
+        fingerprint = prints[index]
+        return [(name, int(match)) for name, prints in self.files.items()
+                for match in np.flatnonzero(prints == fingerprint)]
+
+    def links(self):
+        # Per file, the collections whose first copy (in the order the files
+        # were added) is in another file: {file name: (indices, [(source
+        # file name, source index)])}. Files without such collections are left out.
+        names = list(self.files)
+        if not names:
+            return {}
+        sizes = [len(self.files[name]) for name in names]
+        starts = np.concatenate(([0], np.cumsum(sizes)))
+        owners = np.repeat(np.arange(len(names)), sizes)
+        unique, first = np.unique(np.concatenate([self.files[name] for name in names]), return_index=True)
+        links = {}
+        for number, name in enumerate(names):
+            firsts = first[np.searchsorted(unique, self.files[name])]
+            linked = np.flatnonzero(owners[firsts] != number)
+            if len(linked):
+                sources = firsts[linked]
+                links[name] = (linked, [(names[owner], int(position - starts[owner]))
+                                        for owner, position in zip(owners[sources], sources)])
+        return links
+
+    def covered(self, file_name):
+        # True if the first copy of every collection of the file is in another file
+        prints = self.files[file_name]
+        linked = self.links().get(file_name)
+        return bool(len(prints)) and linked is not None and len(linked[0]) == len(prints)
+
+
+class SharedStore(CollectionStore):
+    # A file's collections where the copies of collections held by other
+    # stores are read from those instead of being stored twice. Collection i
+    # is collection source_index[i] of stores[source[i]]; stores[0] holds the
+    # file's own measurements. The full depth/value arrays are only built
+    # when asked for, and count as resident until released.
+    def __init__(self, offsets, metadata, extras, stores, source, source_index):
+        self.offsets = offsets
+        self.metadata = metadata
+        self.extras = extras
+        self.stores = stores
+        self.source = source
+        self.source_index = source_index
+        self._depths = self._values = None
+
+    def _full(self):
+        if self._depths is None:
+            self._depths, self._values = self.take(np.arange(len(self)))
+        return self._depths, self._values
+
+    @property
+    def depths(self):
+        return self._full()[0]
+
+    @property
+    def values(self):
+        return self._full()[1]
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.metadata.nbytes + self.measurement_nbytes
+
+    @property
+    def measurement_nbytes(self):
+        built = 0 if self._depths is None else self._depths.nbytes + self._values.nbytes
+        return self.stores[0].measurement_nbytes + built
+
+    def release_measurements(self, directory):
+        released = 0 if self._depths is None else self._depths.nbytes + self._values.nbytes
+        self._depths = self._values = None
+        return released + self.stores[0].release_measurements(directory)
+
+    def measurements(self, index):
+        return self.stores[self.source[index]].measurements(self.source_index[index])
+
+    def take(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = self.offsets[indices + 1] - self.offsets[indices]
+        starts = np.cumsum(counts) - counts
+        depths, values = np.empty(counts.sum()), np.empty(counts.sum())
+        sources = self.source[indices]
+        for source in np.unique(sources):
+            group = np.flatnonzero(sources == source)
+            positions = segment_positions(starts[group], counts[group])
+            depths[positions], values[positions] = self.stores[source].take(self.source_index[indices[group]])
+        return depths, values
+
+
+def share_measurements(store, linked, sources):
+    # store with the collections `linked` read from sources, one (store,
+    # index) each, instead of its own copies. Returns store itself when
+    # nothing changes, or when its measurements are not held in memory.
+    if not isinstance(store, SharedStore) and not store.measurement_nbytes:
+        return store
+    stores = [None]
+    store_ids = {}
+    source = np.zeros(len(store), dtype=np.int64)
+    source_index = np.arange(len(store), dtype=np.int64)
+    for index, (source_store, position) in zip(linked, sources):
+        if id(source_store) not in store_ids:
+            store_ids[id(source_store)] = len(stores)
+            stores.append(source_store)
+        source[index] = store_ids[id(source_store)]
+        source_index[index] = position
+    if isinstance(store, SharedStore) and _same_links(store, stores, source, source_index):
+        return store
+    if not len(linked) and not isinstance(store, SharedStore):
+        return store
+
+    own = np.flatnonzero(source == 0)
+    counts = store.offsets[own + 1] - store.offsets[own]
+    # Only the offsets are needed to read the own measurements back
+    stores[0] = CollectionStore(*store.take(own), np.concatenate(([0], np.cumsum(counts))).astype('i8'), None)
+    source_index[own] = np.arange(len(own))
+    shared = SharedStore(store.offsets, store.metadata, store.extras, stores, source, source_index)
+    with _lock:
+        if store in _cache:
+            _cache[shared] = _cache[store]
+    return shared
+
+
+def _same_links(store, stores, source, source_index):
+    linked = source != 0
+    if not np.array_equal(linked, store.source != 0):
+        return False
+    current = [store.stores[number] for number in store.source[linked]]
+    wanted = [stores[number] for number in source[linked]]
+    return (all(a is b for a, b in zip(current, wanted))
+            and np.array_equal(store.source_index[linked], source_index[linked]))
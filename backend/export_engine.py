@@ -0,0 +1,203 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import as_completed
+
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+import numpy as np
+
+from backend.collection_store import empty_metadata, readable_measurements
+from backend.figures import (
+    add_aggregate_bands, add_profile_collection, aggregate_legend, collection_label, concat_profiles, create_metadata_axes, create_profile_axes,
+    draw_legend, legend_height, update_metadata_axes
+)
+from backend.tracing import is_enabled, record, span
+from backend.worker_pools import SHARED_DIR, get_process_pool
+
+# PNG and raster PDF pages are rendered with Agg in worker processes;
+# nothing here touches Qt
+EXPORT_DPI = 150
+PAGE_SIZE = (11, 8.5)
+
+
+class _PagePixels(Artist):
+    # A pre-rendered page handed to the renderer as-is. figimage would
+    # resample it through float RGBA buffers, and the PDF backend holds every
+    # page image until the file closes; this keeps it a memory-mapped file.
+    def __init__(self, pixels):
+        super().__init__()
+        self.pixels = pixels
+
+    def draw(self, renderer):
+        gc = renderer.new_gc()
+        # Renderers take image rows bottom-up
+        renderer.draw_image(gc, 0, 0, self.pixels[::-1])
+        gc.restore()
+
+
+def build_pages(entries, metadata_fields, include_legend, aggregate=None):
+    # entries: [(file name, collection index, store, color)] in plot order.
+    # Each page is a plain dict of arrays so it pickles cheaply to a worker.
+    # Collections that can no longer be read are left out. aggregate (grid,
+    # labels, group_colors and summary of plot_aggregate) draws the group
+    # bands instead of the profiles.
+    if aggregate is None:
+        measurements, readable = readable_measurements([(store, index) for _, index, store, _ in entries])
+        entries = [entries[position] for position in readable]
+        depths, values, offsets = concat_profiles(measurements)
+        pages = [{'name': 'profile', 'kind': 'profile', 'depths': depths, 'values': values,
+                  'offsets': offsets, 'colors': [color for _, _, _, color in entries]}]
+    else:
+        pages = [{'name': 'profile', 'kind': 'aggregate', 'grid': aggregate['grid'],
+                  'summary': aggregate['summary'], 'colors': aggregate['group_colors']}]
+    labels = [collection_label(file_name, index) for file_name, index, _, _ in entries]
+    colors = [color for _, _, _, color in entries]
+
+    if metadata_fields:
+        metadata = empty_metadata(len(entries))
+        for position, (_, index, store, _) in enumerate(entries):
+            metadata[position] = store.metadata[index]
+        for key in metadata_fields:
+            pages.append({'name': key, 'kind': 'metadata', 'key': key, 'metadata': metadata,
+                          'labels': labels, 'colors': colors})
+
+    if include_legend and aggregate is not None:
+        header, texts = aggregate_legend(aggregate['labels'], aggregate['summary'])
+        pages.append({'name': 'legend', 'kind': 'legend', 'grouped': {header: list(zip(texts, aggregate['group_colors']))}})
+    elif include_legend:
+        grouped = {}
+        for (file_name, index, _, color) in entries:
+            grouped.setdefault(file_name, []).append((f"Collection {index + 1}", color))
+        pages.append({'name': 'legend', 'kind': 'legend', 'grouped': grouped})
+    return pages
+
+
+def build_figure(page, dpi=EXPORT_DPI):
+    if page['kind'] == 'legend':
+        fig = Figure(figsize=(6, legend_height(page['grouped'])), dpi=dpi)
+    else:
+        fig = Figure(figsize=PAGE_SIZE, dpi=dpi, constrained_layout=True)
+    FigureCanvasAgg(fig)
+
+    if page['kind'] == 'profile':
+        ax = create_profile_axes(fig)
+        # Decimated to the page's pixel width, which renders identically
+        add_profile_collection(ax, page['depths'], page['values'], page['offsets'], page['colors'],
+                               int(PAGE_SIZE[0] * dpi))
+    elif page['kind'] == 'aggregate':
+        add_aggregate_bands(create_profile_axes(fig), page['grid'], page['summary'], page['colors'])
+    elif page['kind'] == 'metadata':
+        artists = create_metadata_axes(fig, page['key'])
+        update_metadata_axes(artists, page['key'], page['metadata'], page['labels'], page['colors'])
+    else:
+        draw_legend(fig, page['grouped'])
+    return fig
+
+
+def render_page(page, path, dpi=EXPORT_DPI):
+    fig = build_figure(page, dpi)
+    if path.endswith('.npy'):
+        # Raw pixels for PDF assembly; skips a PNG encode/decode round trip
+        fig.canvas.draw()
+        np.save(path, np.asarray(fig.canvas.buffer_rgba())[:, :, :3])
+    else:
+        fig.savefig(path, dpi=dpi)
+    return path
+
+
+def _timed_render(page, path, dpi):
+    # Worker side of a traced export; the timing is recorded by the caller
+    start = time.perf_counter_ns()
+    render_page(page, path, dpi)
+    return os.getpid(), start, time.perf_counter_ns() - start
+
+
+def _render_all(pages, paths, dpi, progress, cancelled, parallel):
+    if not parallel:
+        for done, (page, path) in enumerate(zip(pages, paths), 1):
+            if cancelled is not None and cancelled.is_set():
+                return False
+            with span('export.page', page=page['name']):
+                render_page(page, path, dpi)
+            if progress is not None:
+                progress(done, len(pages), page['name'])
+        return True
+
+    pool = get_process_pool()
+    render = _timed_render if is_enabled() else render_page
+    futures = {pool.submit(render, page, path, dpi): page['name'] for page, path in zip(pages, paths)}
+    done = 0
+    try:
+        for future in as_completed(futures):
+            result = future.result()
+            if render is _timed_render:
+                pid, start, duration = result
+                record('export.page', start, duration, pid=pid, thread='export worker', page=futures[future])
+            done += 1
+            if progress is not None:
+                progress(done, len(pages), futures[future])
+            if cancelled is not None and cancelled.is_set():
+                return False
+    finally:
+        for future in futures:
+            future.cancel()
+    return True
+
+
+def export_png(pages, folder, name, dpi=EXPORT_DPI, progress=None, cancelled=None, parallel=True):
+    os.makedirs(folder, exist_ok=True)
+    paths = [os.path.join(folder, f"{name}_{page['name']}.png") for page in pages]
+    if not _render_all(pages, paths, dpi, progress, cancelled, parallel):
+        return None
+    return paths
+
+
+def export_pdf(pages, path, dpi=EXPORT_DPI, progress=None, cancelled=None, parallel=True, raster=False):
+    # Vector pages by default, drawn one after another into the PDF (the GUI
+    # runs this on the export thread). With raster, pages are rendered in
+    # parallel at dpi and the PDF holds their pixels; not inside a worker.
+    if not (parallel and raster):
+        with PdfPages(path) as pdf:
+            for done, page in enumerate(pages, 1):
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                with span('export.page', page=page['name']):
+                    pdf.savefig(build_figure(page, dpi))
+                if progress is not None:
+                    progress(done, len(pages), page['name'])
+        return [path]
+
+    # Pages render in parallel; the PDF is then assembled from their pixels in order
+    scratch = tempfile.mkdtemp(prefix='adcp-export-', dir=SHARED_DIR)
+    try:
+        rendered = [os.path.join(scratch, f"{number:05d}.npy") for number in range(len(pages))]
+        if not _render_all(pages, rendered, dpi, progress, cancelled, True):
+            return None
+
+        with span('export.assemble', pages=len(pages)), PdfPages(path) as pdf:
+            for image_path in rendered:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                image = np.load(image_path, mmap_mode='r')
+                fig = Figure(figsize=(image.shape[1] / dpi, image.shape[0] / dpi), dpi=dpi)
+                fig.add_artist(_PagePixels(image))
+                pdf.savefig(fig, dpi=dpi)
+        return [path]
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_export(pages, options, target, progress=None, cancelled=None):
+    # target is the PDF path, or (folder, base filename) for PNGs
+    cancelled = cancelled or threading.Event()
+    with span('export', format=options['format'], pages=len(pages)):
+        if options['format'] == 'pdf':
+            return export_pdf(pages, target, progress=progress, cancelled=cancelled,
+                              raster=options.get('raster_pdf', False))
+        folder, name = target
+        return export_png(pages, folder, name, progress=progress, cancelled=cancelled)
@@ -0,0 +1,38 @@
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from backend.export_engine import run_export
+from backend.worker_pools import get_thread_pool
+
+
+class ExportJob(QObject):
+    # Runs an export off the GUI thread. Signals are delivered to GUI-thread
+    # slots as queued calls; finished carries the written paths, or None.
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+
+    def __init__(self, pages, options, target, parent=None):
+        super().__init__(parent)
+        self.pages = pages
+        self.options = options
+        self.target = target
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def start(self):
+        self.future = get_thread_pool().submit(self._run)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_running(self):
+        return self.future is not None and not self.future.done()
+
+    def _run(self):
+        paths = None
+        try:
+            paths = run_export(self.pages, self.options, self.target, self.progress.emit, self.cancelled)
+        except Exception as e:
+            print(f"Export failed: {e}")
+        self.finished.emit(None if self.cancelled.is_set() else paths)
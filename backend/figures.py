@@ -0,0 +1,214 @@
+from matplotlib import rcParams
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_hex, to_rgba_array
+from matplotlib.ticker import AutoLocator, ScalarFormatter
+import numpy as np
+import os
+
+from backend.aggregation import PERCENTILES
+from backend.decimation import m4_decimate
+
+# Figure builders shared by the GUI canvases and headless exports. They only
+# touch matplotlib Figure objects, so they run under any backend.
+
+ABORT_STATUS_LABELS = ["No Issue", "Manual Abort", "Auto Abort"]
+METADATA_TABS = ['latlong', 'timestamp', 'abort_status', 'actuator_error', 'temperature']
+SCATTER_TABS = ('latlong', 'abort_status')
+# GUI-only tab plotting one derived metric (see backend.metrics)
+METRICS_TAB = 'metrics'
+
+
+def collection_label(file_name, collection_number):
+    base_name = os.path.splitext(file_name)[0]
+    short_name = base_name[:12].rstrip('_') + "_..." if len(base_name) > 20 else base_name
+    return f"{short_name} #{collection_number + 1}"
+
+
+def cycle_color(number):
+    colors = rcParams['axes.prop_cycle'].by_key()['color']
+    return to_hex(colors[number % len(colors)])
+
+
+def create_profile_axes(fig):
+    ax = fig.add_subplot(111)
+    ax.grid(True, which='major', linestyle='--', linewidth=0.5, alpha=0.3)
+    ax.set_title("ADCP Profile Data")
+    ax.set_xlabel("Depth (in)")
+    ax.set_xlim(-2, 25)
+    ax.set_ylabel("Pressure (psi)")
+    ax.set_ylim(-100, 1100)
+    return ax
+
+
+def concat_profiles(measurements):
+    # [(depths, values), ...] -> flat depths, values and per-profile offsets
+    counts = [len(depths) for depths, _ in measurements]
+    return (
+        np.concatenate([depths for depths, _ in measurements]) if measurements else np.empty(0),
+        np.concatenate([values for _, values in measurements]) if measurements else np.empty(0),
+        np.concatenate(([0], np.cumsum(counts))).astype('i8'),
+    )
+
+
+def decimated_segments(depths, values, offsets, x_range, columns):
+    kept, kept_offsets = m4_decimate(depths, values, offsets, x_range, columns)
+    points = np.column_stack((depths[kept], values[kept]))
+    return np.split(points, kept_offsets[1:-1])
+
+
+def add_profile_collection(ax, depths, values, offsets, colors, columns):
+    collection = LineCollection(decimated_segments(depths, values, offsets, ax.get_xlim(), columns),
+                                colors=colors, linewidths=1.0)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+
+def add_aggregate_bands(ax, grid, summary, colors):
+    # Per group: median line, dashed mean and a percentile band
+    artists = []
+    for color, stats in zip(colors, summary):
+        artists += [
+            ax.fill_between(grid, stats['low'], stats['high'], color=color, alpha=0.25, linewidth=0),
+            ax.plot(grid, stats['median'], color=color, linewidth=2.0)[0],
+            ax.plot(grid, stats['mean'], color=color, linewidth=1.0, linestyle='--')[0],
+        ]
+    return artists
+
+
+def aggregate_legend(labels, summary):
+    low, high = PERCENTILES
+    header = f"Median, mean (dashed), {low}th-{high}th percentile band"
+    return header, [f"{label} ({stats['count']} profiles)" for label, stats in zip(labels, summary)]
+
+
+def create_metadata_axes(fig, key):
+    fig.clear()
+    ax = fig.add_subplot(111)
+    ax.grid(True, which='major', linestyle='--', linewidth=0.5, alpha=0.3)
+
+    if key == 'latlong':
+        artist = ax.scatter([], [])
+        ax.set_title("Latitude vs Longitude")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+
+    elif key == 'timestamp':
+        artist = ax.plot([], [], label="Timestamps")[0]
+        ax.set_title("Timestamp Progression")
+        ax.set_ylabel("Epoch Time")
+
+    elif key == 'abort_status':
+        artist = ax.scatter([], [])
+        ax.set_title("Abort Status")
+        ax.set_ylabel("Status Code")
+        ax.set_yticks([0, 1, 2])
+        ax.set_yticklabels(ABORT_STATUS_LABELS)
+
+    elif key == 'actuator_error':
+        artist = ax.plot([], [], label="Actuator Error")[0]
+        ax.set_title("Actuator Error")
+
+    elif key == METRICS_TAB:
+        artist = ax.scatter([], [], linewidths=0)
+        ax.set_title("Derived Metrics")
+
+    else:
+        artist = ax.plot([], [], label="Temperature")[0]
+        ax.set_title("Internal Temperature")
+
+    return {'ax': ax, 'artist': artist}
+
+
+def metadata_series(metadata, key):
+    # x/y points for one metadata tab, plus which selected collections they
+    # belong to
+    positions = np.arange(len(metadata), dtype=float)
+    if key == 'latlong':
+        latlong = np.column_stack([metadata['longitude'], metadata['latitude']])
+        has_position = ~np.isnan(latlong).any(axis=1)
+        return latlong[has_position], np.flatnonzero(has_position)
+    if key == 'timestamp':
+        timestamps = metadata['timestamp']
+        has_time = ~np.isnat(timestamps)
+        return np.column_stack([np.arange(has_time.sum(), dtype=float),
+                                timestamps[has_time].astype('i8').astype(float)]), np.flatnonzero(has_time)
+    if key == 'abort_status':
+        has_status = ~np.isnan(metadata['abort_status'])
+        return np.column_stack([positions[has_status], metadata['abort_status'][has_status]]), np.flatnonzero(has_status)
+    if key == 'actuator_error':
+        return np.column_stack([positions, metadata['actuator_absolute_position_error']]), np.arange(len(metadata))
+    temperatures = np.where(np.isnan(metadata['adcp_internal_temp_f']),
+                            metadata['internal_temp'], metadata['adcp_internal_temp_f'])
+    return np.column_stack([positions, temperatures]), np.arange(len(metadata))
+
+
+def update_metadata_axes(artists, key, metadata, labels, colors):
+    ax, artist = artists['ax'], artists['artist']
+    points, owners = metadata_series(metadata, key)
+
+    if key in SCATTER_TABS:
+        artist.set_offsets(points)
+        artist.set_facecolor(to_rgba_array(colors)[owners])
+    else:
+        artist.set_data(points[:, 0], points[:, 1])
+
+    if key != 'latlong':
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+
+    ax.relim()
+    finite = points[np.isfinite(points).all(axis=1)]
+    if key in SCATTER_TABS and len(finite):
+        ax.update_datalim(finite)
+    ax.autoscale_view()
+
+
+def update_metric_axes(artists, points, colors, labels, x_label, y_label):
+    # points are (x, metric) per collection; without an x_label x is the
+    # collection's position and gets its label as a tick
+    ax, artist = artists['ax'], artists['artist']
+    artist.set_offsets(points)
+    artist.set_facecolor(to_rgba_array(colors) if len(colors) else np.empty((0, 4)))
+    if x_label is None:
+        ax.set_xticks(range(len(labels)))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+        ax.set_xlabel("")
+    else:
+        ax.xaxis.set_major_locator(AutoLocator())
+        ax.xaxis.set_major_formatter(ScalarFormatter())
+        ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+
+    ax.relim()
+    ax.ignore_existing_data_limits = True
+    finite = points[np.isfinite(points).all(axis=1)]
+    if len(finite):
+        ax.update_datalim(finite)
+    ax.autoscale_view()
+
+
+def _legend_lines(grouped):
+    return sum(len(entries) + 1 for entries in grouped.values())  # +1 for each group header
+
+
+def legend_height(grouped):
+    return max(2, _legend_lines(grouped) * 0.25)
+
+
+def draw_legend(fig, grouped):
+    # grouped maps file name -> [(collection label, color)]
+    ax = fig.add_subplot(111)
+    ax.axis('off')
+
+    y = 1.0
+    spacing = 1.0 / max(_legend_lines(grouped), 8)
+
+    for group, entries in grouped.items():
+        ax.text(0.01, y, group, fontsize=11, fontweight='bold', verticalalignment='top')
+        y -= spacing
+        for entry, color in entries:
+            ax.text(0.05, y, entry, color=color, fontsize=10, verticalalignment='top')
+            y -= spacing
+
+    fig.tight_layout()
+    return ax
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from concurrent.futures import TimeoutError
+from functools import partial
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from backend.collection_store import load_store, save_store
+from backend.data_parsing import load_json, open_adcp
+from backend.dedup import fingerprints
+from backend.tracing import span
+from backend.worker_pools import SHARED_DIR, get_process_pool, get_thread_pool
+
+# JSON files at least this large are decoded in a worker process
+PROCESS_THRESHOLD = 16 * 1024 * 1024
+
+
+# Worker processes hand decoded arrays back as .npy files that are memory-mapped
+# rather than pickled
+def _decode_in_process(file_path, limit, out_dir):
+    store = load_json(file_path, limit)
+    if store is None:
+        return False
+    save_store(store, out_dir)
+    return True
+
+
+def _wait_for(future, cancelled):
+    while True:
+        try:
+            return future.result(timeout=0.1)
+        except TimeoutError:
+            if cancelled.is_set():
+                future.cancel()
+                return None
+
+
+def _load_in_process(file_path, limit, cancelled):
+    out_dir = tempfile.mkdtemp(prefix='adcp-load-', dir=SHARED_DIR)
+    store = None
+    try:
+        with span('parse.json.worker_process'):
+            future = get_process_pool().submit(_decode_in_process, file_path, limit, out_dir)
+            decoded = _wait_for(future, cancelled)
+        if decoded and not cancelled.is_set():
+            store = load_store(out_dir)
+    except Exception as e:
+        print(f"Error loading JSON file {file_path}: {e}")
+
+    # Mapped arrays stay valid after unlinking on POSIX; Windows keeps the
+    # files locked until the store is gone.
+    if store is None or os.name != 'nt':
+        shutil.rmtree(out_dir, ignore_errors=True)
+    else:
+        weakref.finalize(store, shutil.rmtree, out_dir, True)
+    return store
+
+
+def _load_uncached(file_path, limit, cancelled):
+    if file_path.lower().endswith('.adcp'):
+        return open_adcp(file_path, limit)
+    if os.path.getsize(file_path) >= PROCESS_THRESHOLD:
+        return _load_in_process(file_path, limit, cancelled)
+    return load_json(file_path, limit, cancelled)
+
+
+def load_file_task(file_path, limit=None, cancelled=None, cache=None):
+    cancelled = cancelled or threading.Event()
+    with span('load.file', file=os.path.basename(file_path)) as timing:
+        if cache is not None:
+            with span('load.cache_get'):
+                store = cache.get(file_path, limit)
+            if store is not None:
+                print(f"Loaded cached file: {file_path}")
+                timing.set(cached=True, collections=len(store))
+                return store
+        store = _load_uncached(file_path, limit, cancelled)
+        if store is not None and cache is not None and not cancelled.is_set():
+            with span('load.cache_put'):
+                cache.put(file_path, store, limit)
+        if store is not None:
+            timing.set(cached=False, collections=len(store))
+        return store
+
+
+class FileLoader(QObject):
+    # Loads a batch of files on worker pools. Signals are emitted from worker
+    # threads and delivered to GUI-thread slots as queued calls.
+    file_loaded = pyqtSignal(str, object)
+    file_failed = pyqtSignal(str)
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal()
+
+    def __init__(self, files, limit=None, cache=None, parent=None):
+        super().__init__(parent)
+        self.files = list(files)
+        self.limit = limit
+        self.cache = cache
+        self.cancelled = threading.Event()
+        self.futures = []
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        if not self.files:
+            self.finished.emit()
+            return
+        pool = get_thread_pool()
+        for file_name, file_path in self.files:
+            future = pool.submit(load_file_task, file_path, self.limit, self.cancelled, self.cache)
+            future.add_done_callback(partial(self._on_done, file_name))
+            self.futures.append(future)
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self.futures:
+            future.cancel()
+
+    def is_running(self):
+        return any(not future.done() for future in self.futures)
+
+    def _on_done(self, file_name, future):
+        store = None
+        if not future.cancelled():
+            try:
+                store = future.result()
+            except Exception as e:
+                print(f"Error loading file {file_name}: {e}")
+        with self.lock:
+            self.done += 1
+            done = self.done
+        if not self.cancelled.is_set():
+            if store is not None:
+                self.file_loaded.emit(file_name, store)
+            else:
+                self.file_failed.emit(file_name)
+            self.progress.emit(done, len(self.files), file_name)
+        if done == len(self.files):
+            self.finished.emit()
+
+
+class FingerprintJobs(QObject):
+    # Fingerprints listed files on the thread pool, after any loads already
+    # queued there, so files are listed without waiting for them
+    fingerprinted = pyqtSignal(str, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.futures = []
+
+    def submit(self, file_name, store):
+        self.futures = [future for future in self.futures if not future.done()]
+        future = get_thread_pool().submit(fingerprints, store)
+        future.add_done_callback(partial(self._on_done, file_name, store))
+        self.futures.append(future)
+
+    def is_running(self):
+        return any(not future.done() for future in self.futures)
+
+    def _on_done(self, file_name, store, future):
+        if future.cancelled():
+            return
+        try:
+            prints = future.result()
+        except (OSError, ValueError) as e:
+            print(f"Could not fingerprint {file_name}: {e}")
+            return
+        self.fingerprinted.emit(file_name, store, prints)
@@ -1,12 +1,21 @@
 import os
 import sys
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QFileDialog, QInputDialog
-from matplotlib.backends.backend_pdf import PdfPages
-from matplotlib.backends.backend_agg import FigureCanvasAgg
-import matplotlib.pyplot as plt
 
-from backend.data_parsing import load_json
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QFileDialog, QInputDialog, QProgressDialog
+
+from backend.collection_store import empty_metadata
+from backend.dedup import cached_fingerprints, share_measurements
+from backend.file_loader import FileLoader, FingerprintJobs
+from backend.list_models import select_rows, selected_rows
+from backend.metadata_query import MetadataIndex, parse_query
+from backend.parse_cache import ParseCache
+from backend.plot_operations import pick_collection, plot_data, reset_plot_state, selected_keys
+from backend.session_snapshot import SNAPSHOT_EXTENSION, read_snapshot, write_snapshot
+from backend.tracing import annotate, traced
+
+_parse_cache = None
 
 def get_base_dir():
     if getattr(sys, 'frozen', False):
@@ -16,26 +25,39 @@ def get_base_dir():
         # Running from source
         return os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-def load_files(gui):
-    base_dir = get_base_dir()
-    data_folder = os.path.join(base_dir, 'data')
-
+def get_parse_cache():
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache(os.path.join(get_base_dir(), 'cache'))
+    return _parse_cache
 
+def get_data_folder():
+    data_folder = os.path.join(get_base_dir(), 'data')
     os.makedirs(data_folder, exist_ok=True)
+    return data_folder
+
+def load_files(gui):
+    data_folder = get_data_folder()
 
-    files, _ = QFileDialog.getOpenFileNames(gui, "Select Files", data_folder, "JSON Files (*.json)")
-    if files:
-        for file in files:
-            file_name = os.path.basename(file)
-            if file_name not in gui.file_paths:
-                gui.file_paths[file_name] = file
-                gui.file_list.addItem(file_name)
+    files, _ = QFileDialog.getOpenFileNames(gui, "Select Files", data_folder, "ADCP Data Files (*.json *.adcp);;JSON Files (*.json);;ADCP Files (*.adcp)")
+    add_files(gui, files)
+
+def add_files(gui, files):
+    for file in files:
+        file_name = os.path.basename(file)
+        if file_name not in gui.file_paths:
+            gui.file_paths[file_name] = file
+            gui.file_model.add_file(file_name)
 
 def clear_selection(gui):
+    cancel_loading(gui)
     gui.file_paths.clear()
     gui.parsed_data.clear()
-    gui.file_list.clear()
-    gui.collection_list.clear()
+    gui.file_model.clear()
+    gui.collection_model.clear()
+    gui.metadata_index = None
+    gui.duplicates.clear()
+    update_unique_label(gui, None)
 
     if hasattr(gui, 'legend_list'):
         gui.legend_list.clear()
@@ -53,160 +75,405 @@ def clear_selection(gui):
             canvas.figure.clear()
             canvas.draw()
 
-    gui.profile_lines = []
-    gui.highlighted_label = None
+    reset_plot_state(gui)
 
 def select_all(gui):
-    for index in range(gui.file_list.count()):
-        item = gui.file_list.item(index)
-        item.setSelected(True)
+    gui.file_list.selectAll()
 
 def select_none(gui):
-    for index in range(gui.file_list.count()):
-        item = gui.file_list.item(index)
-        item.setSelected(False)
-
-def confirm_selection(gui):
-    selected_files = [gui.file_list.item(i).text() for i in range(gui.file_list.count()) if gui.file_list.item(i).isSelected()]
-    gui.collection_list.clear()
-    for file_name in selected_files:
-        file_path = gui.file_paths[file_name]
-        data = load_json(file_path)
-        if data:
-            gui.parsed_data[file_name] = data
-            for i, collection in enumerate(data):
-                gui.collection_list.addItem(f"{file_name} - Collection {i+1}")
+    gui.file_list.clearSelection()
+
+def get_metadata_index(gui):
+    # Metadata of every listed collection, row-aligned with collection_model
+    if gui.metadata_index is None:
+        model = gui.collection_model
+        parts = [gui.parsed_data[file_name].metadata[:count] for file_name, count in zip(model.files, model.counts)]
+        gui.metadata_index = MetadataIndex(np.concatenate(parts) if parts else empty_metadata(0))
+    return gui.metadata_index
+
+@traced('query')
+def select_matching(gui):
+    try:
+        filters = parse_query(gui.query_edit.text())
+    except ValueError as e:
+        print(f"Invalid filter: {e}")
+        gui.query_status.setText(str(e))
+        return
+    index = get_metadata_index(gui)
+    rows = index.query(filters)
+    annotate(collections=len(index), matches=len(rows))
+    # The index covers every listed collection, shown or not
+    shown = gui.collection_model.view_rows(rows)
+    select_rows(gui.collection_list, shown)
+    if len(shown) == len(rows):
+        gui.query_status.setText(f"{len(rows)} of {len(index)} collections match")
+    else:
+        gui.query_status.setText(f"{len(rows)} of {len(index)} collections match, {len(shown)} unique")
+
+def cancel_loading(gui):
+    if getattr(gui, 'loader', None) is not None:
+        gui.loader.cancel()
+        gui.loader = None
+    if getattr(gui, 'load_progress', None) is not None:
+        gui.load_progress.close()
+        gui.load_progress = None
+
+@traced('load.add_file')
+def add_loaded_file(gui, file_name, store):
+    annotate(file=file_name, collections=len(store))
+    gui.parsed_data[file_name] = store
+    # A reloaded file's old fingerprints no longer describe it
+    gui.duplicates.remove(file_name)
+    gui.collection_model.set_count(file_name, len(store))
+    gui.metadata_index = None
+    add_fingerprints(gui, file_name, store)
+
+def add_fingerprints(gui, file_name, store):
+    # Fingerprints are computed in the background; until they are in, the
+    # file's collections count as unique
+    if gui.fingerprint_jobs is None:
+        gui.fingerprint_jobs = FingerprintJobs()
+        gui.fingerprint_jobs.fingerprinted.connect(lambda name, store, prints: fingerprints_ready(gui, name, store, prints))
+    gui.fingerprint_jobs.submit(file_name, store)
+
+def fingerprints_ready(gui, file_name, store, prints):
+    # Stale if the file was reloaded or cleared since
+    if gui.parsed_data.get(file_name) is not store:
+        return
+    gui.duplicates.add(file_name, prints)
+    share_duplicates(gui)
+    schedule_unique_view(gui)
+
+@traced('load.share')
+def share_duplicates(gui):
+    # Copies of a collection loaded earlier from another file read from that
+    # file's store instead of holding their own measurements. Every file is
+    # checked again, as a reloaded file can change which copy came first;
+    # files are visited in the order they were added, so the stores linked
+    # to are already up to date.
+    # Fingerprints of stores replaced since are dropped until the new ones are in
+    for file_name in list(gui.duplicates.files):
+        store = gui.parsed_data.get(file_name)
+        if store is None or cached_fingerprints(store) is not gui.duplicates.files[file_name]:
+            gui.duplicates.remove(file_name)
+    links = gui.duplicates.links()
+    changed = []
+    for file_name in gui.duplicates.files:
+        store = gui.parsed_data.get(file_name)
+        if store is None:
+            continue
+        linked, sources = links.get(file_name, ([], []))
+        pairs = [(index, (gui.parsed_data[name], position))
+                 for index, (name, position) in zip(linked, sources) if name in gui.parsed_data]
+        shared = share_measurements(store, [index for index, _ in pairs], [source for _, source in pairs])
+        if shared is store:
+            continue
+        gui.parsed_data[file_name] = shared
+        if _parse_cache is not None:
+            _parse_cache.replace(store, shared)
+        changed.append(file_name)
+        if len(pairs) == len(store):
+            print(f"Every collection of {file_name} is also in another loaded file")
+    annotate(files=len(changed))
+    if any(file_name in changed for file_name, _ in gui.plotted):
+        plot_data(gui)
+
+def set_unique_only(gui, enabled):
+    gui.unique_only = enabled
+    refresh_unique_view(gui)
+
+def schedule_unique_view(gui):
+    # Files loaded in one go update the view once
+    if not gui.unique_view_pending:
+        gui.unique_view_pending = True
+        QTimer.singleShot(0, lambda: refresh_unique_view(gui))
+
+@traced('load.unique_view')
+def refresh_unique_view(gui):
+    # Shows the first copy of every collection only, or every row again.
+    # The duplicate count is kept up to date either way.
+    gui.unique_view_pending = False
+    model = gui.collection_model
+    selected = model.full_rows(selected_rows(gui.collection_list))
+    mask = gui.duplicates.unique_mask(model.files, model.counts)
+    annotate(collections=len(mask), duplicates=int(len(mask) - mask.sum()))
+    update_unique_label(gui, mask)
+    shown = np.flatnonzero(mask) if gui.unique_only else None
+    if shown is not None or model.shown is not None:
+        model.set_shown(shown)
+        select_rows(gui.collection_list, model.view_rows(selected))
+
+def update_unique_label(gui, mask):
+    duplicates = 0 if mask is None else int(len(mask) - mask.sum())
+    gui.unique_checkbox.setText(f"Show Unique Only ({duplicates} duplicates)" if duplicates else "Show Unique Only")
+
+@traced('load.update_file')
+def update_loaded_file(gui, file_name, store):
+    # Swaps in a re-parsed file, listing only the collections it gained
+    if file_name not in gui.file_paths:
+        return
+    previous = gui.parsed_data.get(file_name)
+    gui.parsed_data[file_name] = store
+    gui.duplicates.remove(file_name)
+    if previous is None or file_name in gui.collection_model.files:
+        gui.collection_model.set_count(file_name, len(store))
+        gui.metadata_index = None
+    add_fingerprints(gui, file_name, store)
+
+    if any(key[0] == file_name for key in gui.plotted):
+        plot_data(gui)
+
+def update_load_progress(gui, done, total, file_name):
+    if gui.load_progress is not None:
+        gui.load_progress.setLabelText(f"Loaded {file_name} ({done} of {total} files)")
+        gui.load_progress.setValue(done)
+
+def finish_loading(gui, loader, on_finished=None):
+    # on_finished only runs if the load was not cancelled or replaced
+    if gui.loader is loader:
+        gui.loader = None
+        if gui.load_progress is not None:
+            gui.load_progress.close()
+            gui.load_progress = None
+        if on_finished is not None:
+            on_finished()
+
+@traced('load.confirm_selection')
+def confirm_selection(gui, limit=None):
+    selected_files = [gui.file_model.names[row] for row in selected_rows(gui.file_list)]
+    annotate(files=len(selected_files))
+    cancel_loading(gui)
+    gui.collection_model.clear()
+    gui.metadata_index = None
+    if not selected_files:
+        return
+    start_loading(gui, selected_files, limit)
+
+def start_loading(gui, file_names, limit=None, on_finished=None):
+    loader = FileLoader([(name, gui.file_paths[name]) for name in file_names], limit, get_parse_cache())
+    progress = QProgressDialog(f"Loading {len(file_names)} files...", "Cancel", 0, len(file_names), gui)
+    progress.setWindowTitle("Loading")
+    progress.setMinimumDuration(500)
+    progress.setValue(0)
+    progress.canceled.connect(lambda: cancel_loading(gui))
+
+    loader.file_loaded.connect(lambda name, store: add_loaded_file(gui, name, store))
+    loader.progress.connect(lambda done, total, name: update_load_progress(gui, done, total, name))
+    loader.finished.connect(lambda: finish_loading(gui, loader, on_finished))
+    gui.loader = loader
+    gui.load_progress = progress
+    loader.start()
+
+def get_sessions_folder():
+    sessions_folder = os.path.join(get_base_dir(), 'sessions')
+    os.makedirs(sessions_folder, exist_ok=True)
+    return sessions_folder
+
+def save_session(gui):
+    if gui.loader is not None:
+        print("Wait for loading to finish before saving the session.")
+        return
+    path, _ = QFileDialog.getSaveFileName(gui, "Save Session", os.path.join(get_sessions_folder(), f"session{SNAPSHOT_EXTENSION}"),
+                                          f"ADCP Sessions (*{SNAPSHOT_EXTENSION})")
+    if path:
+        write_session(gui, path)
+
+def write_session(gui, path):
+    # The selection is kept as (file, start, stop) runs of collection indices
+    runs = []
+    for file_name, index in selected_keys(gui):
+        if runs and runs[-1][0] == file_name and runs[-1][2] == index:
+            runs[-1][2] = index + 1
+        else:
+            runs.append([file_name, index, index + 1])
+    state = {
+        'listed': list(gui.collection_model.files),
+        'selected_files': [gui.file_model.names[row] for row in selected_rows(gui.file_list)],
+        'selected': runs,
+        'highlighted': list(gui.highlighted_key) if gui.highlighted_key else None,
+        'active_tab': gui.active_metadata_tab,
+        'aggregate_by': gui.aggregate_by,
+        'unique_only': gui.unique_only,
+    }
+    # Listed files first, so they come back in the same order
+    names = state['listed'] + [name for name in gui.parsed_data if name not in state['listed']]
+    stores = {name: gui.parsed_data[name] for name in names}
+    # Writing decodes lazily read .adcp files; they are dropped again after
+    decoded = [store for store in stores.values() if not store.measurement_nbytes]
+    try:
+        size = write_snapshot(path, dict(gui.file_paths), stores, state)
+    except (OSError, ValueError) as e:
+        print(f"Failed to save session {path}: {e}")
+        return
+    finally:
+        for store in decoded:
+            store.release_measurements(gui.parsed_data.spill_dir)
+        gui.parsed_data.enforce_budget()
+    print(f"Saved session with {len(names)} files ({size / (1024 * 1024):.1f} MB) to {path}")
+
+def open_session(gui):
+    path, _ = QFileDialog.getOpenFileName(gui, "Open Session", get_sessions_folder(), f"ADCP Sessions (*{SNAPSHOT_EXTENSION})")
+    if path:
+        restore_session(gui, path)
+
+@traced('session.restore')
+def restore_session(gui, path):
+    # Loaded files come straight from the snapshot's mapped arrays; files
+    # whose source changed since the save are loaded from the source, and
+    # the view is restored once they are in
+    try:
+        file_paths, stores, stale, state = read_snapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not open session {path}: {e}")
+        return
+    clear_selection(gui)
+    add_files(gui, file_paths.values())
+    rows = [row for row, name in enumerate(gui.file_model.names) if name in state['selected_files']]
+    select_rows(gui.file_list, np.array(rows, dtype=np.int64))
+    for file_name, store in stores.items():
+        if not os.path.exists(file_paths[file_name]):
+            print(f"Source of {file_name} is missing, using the session's copy")
+        add_loaded_file(gui, file_name, store)
+    annotate(files=len(stores), stale=len(stale))
+
+    if stale:
+        print(f"Reloading changed files: {', '.join(stale)}")
+        start_loading(gui, stale, on_finished=lambda: restore_order(gui, state))
+    else:
+        restore_order(gui, state)
+
+def restore_order(gui, state):
+    # Reloaded files come in after the snapshot's; every file goes back to
+    # its saved place, and ones that could not be loaded are skipped
+    model = gui.collection_model
+    missing = [file_name for file_name in state['listed'] if file_name not in model.files]
+    if missing:
+        print(f"Skipped files that could not be restored: {', '.join(missing)}")
+    model.order_files(state['listed'])
+    schedule_unique_view(gui)
+    restore_view(gui, state)
+
+def restore_view(gui, state):
+    model = gui.collection_model
+    rows = []
+    for file_name, start, stop in state['selected']:
+        if file_name in model.files:
+            stop = min(stop, model.counts[model.files.index(file_name)])
+            rows.append(model.row(file_name, 0) + np.arange(start, max(start, stop)))
+    rows = np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+    select_rows(gui.collection_list, model.view_rows(rows))
+
+    gui.aggregate_combo.blockSignals(True)
+    gui.aggregate_combo.setCurrentIndex(max(0, gui.aggregate_combo.findData(state['aggregate_by'])))
+    gui.aggregate_combo.blockSignals(False)
+    gui.aggregate_by = gui.aggregate_combo.currentData()
+    gui.unique_checkbox.blockSignals(True)
+    gui.unique_checkbox.setChecked(state.get('unique_only', False))
+    gui.unique_checkbox.blockSignals(False)
+    gui.unique_only = gui.unique_checkbox.isChecked()
+    gui.show_metadata_tab(state['active_tab'])
+    if not len(rows):
+        return
+    plot_data(gui)
+    if state['highlighted'] and tuple(state['highlighted']) in gui.plotted:
+        pick_collection(gui, tuple(state['highlighted']))
+
+def cancel_export(gui):
+    if getattr(gui, 'export_job', None) is not None:
+        gui.export_job.cancel()
+        gui.export_job = None
+    if getattr(gui, 'export_progress', None) is not None:
+        gui.export_progress.close()
+        gui.export_progress = None
+
+def update_export_progress(gui, done, total, page_name):
+    if gui.export_progress is not None:
+        gui.export_progress.setLabelText(f"Rendered {page_name} ({done} of {total} pages)")
+        gui.export_progress.setValue(done)
+
+def finish_export(gui, job, paths):
+    if gui.export_job is job:
+        gui.export_job = None
+        if gui.export_progress is not None:
+            gui.export_progress.close()
+            gui.export_progress = None
+    if paths:
+        print(f"Exported {len(paths)} files to {os.path.dirname(paths[0])}")
 
 def export_selected(gui, options):
     base_dir = get_base_dir()
     export_folder = os.path.join(base_dir, 'plots')
     os.makedirs(export_folder, exist_ok=True)
 
-    def export_legend_figure(filepath):
-        grouped = {}
-        for i in range(gui.legend_list.count()):
-            item = gui.legend_list.item(i)
-            info = item.data(Qt.UserRole)
-    
-            if not info or "file" not in info or "collection" not in info:
-                continue
-    
-            file_part = info["file"]
-            display_label = info["collection"]
-            color = info["color"]
-    
-            grouped.setdefault(file_part, []).append((display_label, color))
-    
-        total_lines = sum(len(v) + 1 for v in grouped.values())
-        fig_height = max(2, total_lines * 0.25)
-        fig, ax = plt.subplots(figsize=(6, fig_height))
-        ax.axis('off')
-    
-        y = 1.0
-        spacing = 0.06
-    
-        for group, entries in grouped.items():
-            ax.text(0.01, y, group, fontsize=11, fontweight='bold', verticalalignment='top')
-            y -= spacing
-            for entry, color in entries:
-                ax.text(0.05, y, entry, color=color, fontsize=10, verticalalignment='top')
-                y -= spacing
-    
-        fig.tight_layout()
-        fig.savefig(filepath)
-        plt.close(fig)
-
+    if options['format'] == 'csv':
+        # Metrics of every plotted collection, also in aggregate mode
+        if gui.metadata_plot_data is None or not len(gui.metadata_plot_data[0]):
+            print("Nothing plotted to export.")
+            return
+        path, _ = QFileDialog.getSaveFileName(gui, "Export Metrics", os.path.join(export_folder, "metrics.csv"), "CSV Files (*.csv)")
+        if path:
+            export_metrics(gui, path)
+        return
 
+    if not gui.plotted and gui.aggregate_plot is None:
+        print("Nothing plotted to export.")
+        return
 
     if options['format'] == 'pdf':
         path, _ = QFileDialog.getSaveFileName(gui, "Export PDF", os.path.join(export_folder, "export.pdf"), "PDF Files (*.pdf)")
         if not path:
             return
-    
-        with PdfPages(path) as pdf:
-            canvas = FigureCanvasAgg(gui.profile_figure)
-            canvas.draw()
-            pdf.savefig(gui.profile_figure)
-    
-            for key in options['metadata_fields']:
-                canvas = FigureCanvasAgg(gui.metadata_canvases[key].figure)
-                canvas.draw()
-                pdf.savefig(gui.metadata_canvases[key].figure)
-    
-            if options['include_legend']:
-                grouped = {}
-                for i in range(gui.legend_list.count()):
-                    item = gui.legend_list.item(i)
-                    info = item.data(Qt.UserRole)
-            
-                    if not info or "file" not in info or "collection" not in info:
-                        continue
-            
-                    file_part = info["file"]
-                    display_label = info["collection"]
-                    color = info["color"]
-            
-                    grouped.setdefault(file_part, []).append((display_label, color))
-            
-                total_lines = sum(len(v) + 1 for v in grouped.values())  # +1 for each group header
-                fig_height = max(2, total_lines * 0.25)
-                fig, ax = plt.subplots(figsize=(6, fig_height))
-                ax.axis('off')
-            
-                y = 1.0
-                spacing = 0.06
-            
-                for group, entries in grouped.items():
-                    ax.text(0.01, y, group, fontsize=11, fontweight='bold', verticalalignment='top')
-                    y -= spacing
-                    for entry, color in entries:
-                        ax.text(0.05, y, entry, color=color, fontsize=10, verticalalignment='top')
-                        y -= spacing
-            
-                fig.tight_layout()
-                pdf.savefig(fig)
-                plt.close(fig)
-
-
+        target = path
 
     elif options['format'] == 'png':
         name, ok = QInputDialog.getText(gui, "File Naming", "Base filename:", text="export")
         if not ok or not name.strip():
             name = "export"
-        gui.profile_figure.savefig(os.path.join(export_folder, f"{name}_profile.png"))
-        for key in options['metadata_fields']:
-            canvas = gui.metadata_canvases[key]
-            canvas.figure.savefig(os.path.join(export_folder, f"{name}_{key}.png"))
-        if options['include_legend']:
-            grouped = {}
-            for i in range(gui.legend_list.count()):
-                item = gui.legend_list.item(i)
-                info = item.data(Qt.UserRole)
-        
-                if not info or "file" not in info or "collection" not in info:
-                    continue  # skip any broken or non-standard items
-        
-                file_part = info["file"]
-                display_label = info["collection"]
-                color = info["color"]
-        
-                grouped.setdefault(file_part, []).append((display_label, color))
-        
-            total_lines = sum(len(v) + 1 for v in grouped.values())  # +1 for each group header
-            fig_height = max(2, total_lines * 0.25)
-            fig, ax = plt.subplots(figsize=(6, fig_height))
-            ax.axis('off')
-        
-            y = 1.0
-            spacing = 0.06
-        
-            for group, entries in grouped.items():
-                ax.text(0.01, y, group, fontsize=11, fontweight='bold', verticalalignment='top')
-                y -= spacing
-                for entry, color in entries:
-                    ax.text(0.05, y, entry, color=color, fontsize=10, verticalalignment='top')
-                    y -= spacing
-        
-            fig.tight_layout()
-            fig.savefig(os.path.join(export_folder, f"{name}_legend.png"))
-            plt.close(fig)
+        target = (export_folder, name)
+
+    else:
+        return
+    start_export(gui, options, target)
+
+@traced('export.metrics')
+def export_metrics(gui, path):
+    from backend.metrics import collection_metrics, metric_specs, write_metrics_csv
+    metadata, _, _, keys = gui.metadata_plot_data
+    metrics = collection_metrics(gui.parsed_data, keys, metric_specs())
+    gui.parsed_data.enforce_budget()
+    try:
+        count = write_metrics_csv(path, keys, metadata, metrics)
+    except OSError as e:
+        print(f"Failed to write {path}: {e}")
+        return
+    print(f"Exported metrics of {count} collections to {path}")
+
+@traced('export.start')
+def start_export(gui, options, target):
+    # target is the PDF path, or (folder, base filename) for PNGs. The export
+    # modules (and the PDF backend) are only imported on first use.
+    from backend.export_engine import build_pages
+    from backend.export_job import ExportJob
+
+    aggregate = gui.aggregate_plot
+    if aggregate is None:
+        entries = [(file_name, index, entry['store'], entry['color']) for (file_name, index), entry in gui.plotted.items()]
+    else:
+        # The group bands, with each collection's metadata in its group's color
+        entries = [(file_name, index, gui.parsed_data[file_name], color)
+                   for (file_name, index), color in zip(aggregate['keys'], aggregate['colors'])
+                   if file_name in gui.parsed_data]
+    cancel_export(gui)
+    pages = build_pages(entries, options['metadata_fields'], options['include_legend'], aggregate)
+    job = ExportJob(pages, options, target)
+    progress = QProgressDialog(f"Exporting {len(pages)} pages...", "Cancel", 0, len(pages), gui)
+    progress.setWindowTitle("Exporting")
+    progress.setMinimumDuration(500)
+    progress.setValue(0)
+    progress.canceled.connect(lambda: cancel_export(gui))
+
+    job.progress.connect(lambda done, total, name: update_export_progress(gui, done, total, name))
+    job.finished.connect(lambda paths: finish_export(gui, job, paths))
+    gui.export_job = job
+    gui.export_progress = progress
+    job.start()
@@ -0,0 +1,104 @@
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QItemSelectionModel, QTimer
+
+from backend.file_loader import FileLoader
+from backend.file_operations import get_data_folder, get_parse_cache, update_loaded_file
+
+# Writes within this window of each other are handled as one update
+WATCH_DEBOUNCE_MS = 1000
+WATCH_EXTENSIONS = ('.json', '.adcp')
+
+
+def _scan(folder):
+    snapshot = {}
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.lower().endswith(WATCH_EXTENSIONS):
+            stat = entry.stat()
+            snapshot[os.path.abspath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def start_watching(gui):
+    stop_watching(gui)
+    gui.watch_folder = get_data_folder()
+    # Files already in the folder are the baseline; only later changes load
+    gui.watch_snapshot = _scan(gui.watch_folder)
+
+    gui.watch_timer = QTimer(gui)
+    gui.watch_timer.setSingleShot(True)
+    gui.watch_timer.setInterval(WATCH_DEBOUNCE_MS)
+    gui.watch_timer.timeout.connect(lambda: refresh_watched_files(gui))
+
+    gui.folder_watcher = QFileSystemWatcher([gui.watch_folder] + list(gui.watch_snapshot), gui)
+    gui.folder_watcher.directoryChanged.connect(lambda path: gui.watch_timer.start())
+    gui.folder_watcher.fileChanged.connect(lambda path: gui.watch_timer.start())
+    print(f"Watching {gui.watch_folder}")
+
+
+def stop_watching(gui):
+    if getattr(gui, 'folder_watcher', None) is not None:
+        gui.folder_watcher.deleteLater()
+        gui.folder_watcher = None
+    if getattr(gui, 'watch_timer', None) is not None:
+        gui.watch_timer.stop()
+        gui.watch_timer.deleteLater()
+        gui.watch_timer = None
+    if getattr(gui, 'watch_loader', None) is not None:
+        gui.watch_loader.cancel()
+        gui.watch_loader = None
+    gui.watch_pending = False
+
+
+def refresh_watched_files(gui):
+    if gui.folder_watcher is None:
+        return
+    if gui.watch_loader is not None:
+        # Go again once the running refresh is done
+        gui.watch_pending = True
+        return
+
+    snapshot = _scan(gui.watch_folder)
+    changed = [path for path, state in snapshot.items() if gui.watch_snapshot.get(path) != state]
+    gui.watch_snapshot = snapshot
+
+    # Files replaced by a rename are dropped by the watcher
+    unwatched = [path for path in snapshot if path not in set(gui.folder_watcher.files())]
+    if unwatched:
+        gui.folder_watcher.addPaths(unwatched)
+
+    files = []
+    for path in changed:
+        file_name = os.path.basename(path)
+        if file_name not in gui.file_paths:
+            gui.file_paths[file_name] = path
+            row = gui.file_model.add_file(file_name)
+            gui.file_list.selectionModel().select(gui.file_model.index(row), QItemSelectionModel.Select)
+            files.append((file_name, path))
+        elif file_name in gui.parsed_data and os.path.abspath(gui.file_paths[file_name]) == path:
+            # Appended .adcp files are only parsed past their indexed tail
+            files.append((file_name, path))
+    if not files:
+        return
+
+    loader = FileLoader(files, None, get_parse_cache())
+    loader.file_loaded.connect(lambda name, store: update_loaded_file(gui, name, store))
+    loader.finished.connect(lambda: _finish_refresh(gui, loader))
+    gui.watch_loader = loader
+    loader.start()
+
+
+def _finish_refresh(gui, loader):
+    if gui.watch_loader is not loader:
+        return
+    gui.watch_loader = None
+    if gui.watch_pending:
+        gui.watch_pending = False
+        refresh_watched_files(gui)
+
+
+def toggle_watching(gui, enabled):
+    if enabled:
+        start_watching(gui)
+    else:
+        stop_watching(gui)
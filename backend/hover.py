@@ -0,0 +1,164 @@
+import numpy as np
+
+from backend.spatial_index import GridIndex
+from backend.tracing import span
+
+# Hover and click lookups for the points plotted on one axes, by name
+# ('profile', 'latlong', ...). The points are kept in a GridIndex in data
+# coordinates, built on the first lookup after they change; the pick radius
+# in pixels is converted to data units per lookup, so panning and zooming
+# never rebuild it. The marker and annotation are animated and only blitted
+# over the cached plot.
+
+HOVER_RADIUS_PX = 6
+
+
+def point_index(points, owners):
+    # (GridIndex, owners) over the finite points; owners[i] is whatever the
+    # caller's describe/on_pick take for point i
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    finite = np.isfinite(points).all(axis=1)
+    if not finite.all():
+        points, owners = points[finite], np.asarray(owners)[finite]
+    return GridIndex(points), owners
+
+
+def attach_hover(gui, name, ax, describe, on_pick, redraw=None):
+    # Called whenever the axes is (re)created. describe(owner, x, y) gives
+    # the annotation text, on_pick(owner) handles a click. A canvas that
+    # already blits its own overlays passes redraw, which has to end up in
+    # draw_hover; otherwise the hover keeps its own copy of the background.
+    canvas = ax.figure.canvas
+    state = gui.hovers.get(name)
+    if state is None or state['canvas'] is not canvas:
+        state = {'canvas': canvas}
+        handlers = [('motion_notify_event', _on_motion), ('axes_leave_event', _on_leave),
+                    ('button_press_event', _on_press)]
+        if redraw is None:
+            handlers.append(('draw_event', _on_draw))
+        for event_name, handler in handlers:
+            canvas.mpl_connect(event_name, lambda event, handler=handler: handler(state, event))
+        gui.hovers[name] = state
+
+    state.update({
+        'ax': ax, 'describe': describe, 'on_pick': on_pick, 'redraw': redraw,
+        'marker': ax.plot([], [], marker='o', markersize=10, markerfacecolor='none', markeredgecolor='black',
+                          linestyle='none', animated=True, visible=False)[0],
+        'annotation': ax.annotate("", (0, 0), xytext=(8, 8), textcoords='offset points', fontsize=8,
+                                  bbox={'boxstyle': 'round', 'facecolor': 'white', 'alpha': 0.8},
+                                  animated=True, visible=False),
+        'build': None, 'index': None, 'owners': None, 'hover': -1, 'background': None,
+    })
+
+
+def set_hover_points(gui, name, build):
+    # build() returns (GridIndex, owners), see point_index; None turns the
+    # lookups off
+    state = gui.hovers.get(name)
+    if state is None:
+        return
+    state['build'] = build
+    state['index'] = None
+    state['owners'] = None
+    _set_hover(state, -1, redraw=False)
+
+
+def lookup(gui, name, x, y):
+    # Owner of the point nearest to data position (x, y) within the hover
+    # radius, or None
+    state = gui.hovers.get(name)
+    if state is None:
+        return None
+    point = _nearest(state, x, y, *state['ax'].transData.transform((x, y)))
+    return None if point < 0 else state['owners'][point]
+
+
+def draw_hover(gui, name):
+    state = gui.hovers.get(name)
+    if state is not None:
+        _draw(state)
+
+
+def _draw(state):
+    if state['hover'] >= 0:
+        state['ax'].draw_artist(state['marker'])
+        state['ax'].draw_artist(state['annotation'])
+
+
+def _index(state):
+    if state['index'] is None and state['build'] is not None:
+        with span('plot.hover_index') as timing:
+            state['index'], state['owners'] = state['build']()
+            timing.set(points=len(state['index']))
+    return state['index']
+
+
+def _nearest(state, x, y, pixel_x, pixel_y):
+    index = _index(state)
+    if index is None or not len(index):
+        return -1
+    inverse = state['ax'].transData.inverted()
+    (x0, y0), (x1, y1) = inverse.transform([(pixel_x - HOVER_RADIUS_PX, pixel_y - HOVER_RADIUS_PX),
+                                            (pixel_x + HOVER_RADIUS_PX, pixel_y + HOVER_RADIUS_PX)])
+    return index.nearest(x, y, abs(x1 - x0) / 2, abs(y1 - y0) / 2)
+
+
+def _pick_point(state, event):
+    if event.inaxes is not state['ax'] or event.xdata is None:
+        return -1
+    return _nearest(state, event.xdata, event.ydata, event.x, event.y)
+
+
+def _on_motion(state, event):
+    # No lookups while a pan or zoom drag is in progress
+    if event.button is None:
+        _set_hover(state, _pick_point(state, event))
+
+
+def _on_leave(state, event):
+    _set_hover(state, -1)
+
+
+def _on_press(state, event):
+    toolbar = event.canvas.toolbar
+    if event.button != 1 or (toolbar is not None and toolbar.mode):
+        return
+    point = _pick_point(state, event)
+    if point >= 0:
+        state['on_pick'](state['owners'][point])
+
+
+def _set_hover(state, point, redraw=True):
+    if state['hover'] == point:
+        return
+    state['hover'] = point
+    marker, annotation = state['marker'], state['annotation']
+    if point >= 0:
+        x, y = state['index'].points[point]
+        marker.set_data([x], [y])
+        annotation.xy = (x, y)
+        annotation.set_text(state['describe'](state['owners'][point], x, y))
+    marker.set_visible(point >= 0)
+    annotation.set_visible(point >= 0)
+    if redraw:
+        _blit(state)
+
+
+def _on_draw(state, event):
+    canvas = state['canvas']
+    state['background'] = canvas.copy_from_bbox(canvas.figure.bbox)
+    # The canvas repaints from the buffer right after this event
+    _draw(state)
+
+
+def _blit(state):
+    if state['redraw'] is not None:
+        state['redraw']()
+        return
+    canvas = state['canvas']
+    if state['background'] is None:
+        canvas.draw_idle()
+        return
+    canvas.restore_region(state['background'])
+    _draw(state)
+    canvas.blit(canvas.figure.bbox)
@@ -0,0 +1,160 @@
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LogNorm, to_rgba_array
+import numpy as np
+from PyQt5.QtCore import QTimer
+
+from backend.figures import metadata_series
+from backend.hover import attach_hover, set_hover_points
+from backend.spatial_index import GridIndex
+from backend.tracing import annotate, traced
+
+# The latlong tab keeps every position in one grid index and only hands the
+# scatter the points inside the current view. With more than
+# SCATTER_POINT_LIMIT points in view it shows hexagonal bins instead, about
+# HEXBIN_GRIDSIZE across the view at any zoom. The hexagons sit on a lattice
+# fixed in data space whose size steps with the zoom, so the points are
+# binned once per zoom level and panning only picks the hexagons in view.
+# Hover and clicks look points up through the same index.
+
+SCATTER_POINT_LIMIT = 20_000
+HEXBIN_GRIDSIZE = 50
+# Zoom levels whose bins are kept
+HEXBIN_LEVELS = 8
+# Corners of a hexagon one lattice step wide and one row high, as in Axes.hexbin
+HEXAGON = np.array([[0.5, -1 / 6], [0.5, 1 / 6], [0.0, 1 / 3], [-0.5, 1 / 6], [-0.5, -1 / 6], [0.0, -1 / 3]])
+
+
+def attach_latlong(gui, artists, on_pick):
+    # Called once per latlong axes; on_pick gets the clicked collection key
+    ax = artists['ax']
+    artists['scatter'] = artists['artist']
+    artists['scatter'].set_linewidths(0)
+    artists['hexbin'] = None
+    ax.callbacks.connect('xlim_changed', lambda changed_ax: _schedule_view_update(gui))
+    ax.callbacks.connect('ylim_changed', lambda changed_ax: _schedule_view_update(gui))
+    attach_hover(gui, 'latlong', ax, lambda owner, x, y: _describe(gui, owner, x, y),
+                 lambda owner: on_pick(gui.latlong_view['keys'][owner]))
+
+
+def _describe(gui, owner, longitude, latitude):
+    return f"{gui.latlong_view['labels'][owner]}\n{latitude:.5f}, {longitude:.5f}"
+
+
+@traced('plot.latlong')
+def update_latlong(gui, artists, metadata, labels, colors, keys):
+    ax = artists['ax']
+    points, owners = metadata_series(metadata, 'latlong')
+    annotate(points=len(points))
+    point_colors = to_rgba_array(colors)[owners] if len(owners) else np.empty((0, 4))
+    if artists['hexbin'] is not None:
+        artists['hexbin'].remove()
+        artists['hexbin'] = None
+    index = GridIndex(points)
+    gui.latlong_view = {
+        'artists': artists, 'points': points, 'colors': point_colors, 'index': index,
+        'labels': labels, 'keys': keys, 'limits': None, 'hexbins': {},
+    }
+    set_hover_points(gui, 'latlong', lambda: (index, owners))
+
+    # The scatter isn't part of the data limits, so autoscale from the points
+    ax.set_autoscale_on(True)
+    ax.ignore_existing_data_limits = True
+    if len(points):
+        ax.update_datalim(points)
+    ax.autoscale_view()
+    # Hexbins must not rescale the view behind the user's zoom
+    ax.set_autoscale_on(False)
+    _update_view(gui)
+
+
+def _schedule_view_update(gui):
+    # Panning and zooming change both limits; update once, before the redraw
+    if getattr(gui, 'latlong_update_pending', False):
+        return
+    gui.latlong_update_pending = True
+    QTimer.singleShot(0, lambda: _run_view_update(gui))
+
+
+def _run_view_update(gui):
+    gui.latlong_update_pending = False
+    if _update_view(gui):
+        gui.latlong_view['artists']['ax'].figure.canvas.draw_idle()
+
+
+@traced('plot.latlong.view')
+def _update_view(gui):
+    view = getattr(gui, 'latlong_view', None)
+    if view is None:
+        return False
+    artists = view['artists']
+    ax, scatter = artists['ax'], artists['scatter']
+    (x0, x1), (y0, y1) = sorted(ax.get_xlim()), sorted(ax.get_ylim())
+    if view['limits'] == (x0, x1, y0, y1):
+        return False
+    view['limits'] = (x0, x1, y0, y1)
+
+    rows = view['index'].in_box(x0, x1, y0, y1)
+    annotate(in_view=len(rows))
+    if len(rows) > SCATTER_POINT_LIMIT:
+        scatter.set_visible(False)
+        _show_hexbin(view)
+    else:
+        if artists['hexbin'] is not None:
+            artists['hexbin'].set_visible(False)
+        scatter.set_offsets(view['points'][rows])
+        scatter.set_facecolor(view['colors'][rows])
+        scatter.set_visible(True)
+    return True
+
+
+def hex_bins(points, width, height):
+    # Counts per hexagon of the lattice with the given step and row height,
+    # anchored at the origin. Returns each hexagon's (column, row) in half
+    # steps, sorted by column, and its count.
+    x, y = points[:, 0] / width, points[:, 1] / height
+    near_x, near_y = np.round(x), np.round(y)
+    low_x, low_y = np.floor(x), np.floor(y)
+    # Nearer to a centre of the offset lattice, weighed as Axes.hexbin does
+    offset = (x - low_x - 0.5) ** 2 + 3 * (y - low_y - 0.5) ** 2 < (x - near_x) ** 2 + 3 * (y - near_y) ** 2
+    cells = np.column_stack((np.where(offset, 2 * low_x + 1, 2 * near_x),
+                             np.where(offset, 2 * low_y + 1, 2 * near_y))).astype(np.int64)
+    if not len(cells):
+        return cells, np.empty(0, dtype=np.int64)
+    return np.unique(cells, axis=0, return_counts=True)
+
+
+def _lattice_step(length):
+    # Steps of a factor sqrt(2), so the zoom levels repeat while zooming
+    return 2.0 ** (np.ceil(np.log2(length) * 2) / 2)
+
+
+@traced('plot.hexbin')
+def _show_hexbin(view):
+    artists = view['artists']
+    x0, x1, y0, y1 = view['limits']
+    size = (_lattice_step((x1 - x0) / HEXBIN_GRIDSIZE), _lattice_step((y1 - y0) * np.sqrt(3) / HEXBIN_GRIDSIZE))
+    levels = view['hexbins']
+    if size not in levels:
+        if len(levels) >= HEXBIN_LEVELS:
+            levels.pop(next(iter(levels)))
+        levels[size] = hex_bins(view['points'], *size)
+    cells, counts = levels[size]
+    annotate(hexagons=len(cells))
+
+    # Hexagons whose centre is within one hexagon of the view
+    width, height = size
+    begin = np.searchsorted(cells[:, 0], 2 * (x0 / width - 1), side='left')
+    end = np.searchsorted(cells[:, 0], 2 * (x1 / width + 1), side='right')
+    columns = cells[begin:end]
+    visible = np.flatnonzero((columns[:, 1] >= 2 * (y0 / height - 1)) & (columns[:, 1] <= 2 * (y1 / height + 1)))
+    centres = columns[visible] * (np.array(size) / 2)
+    polygons = centres[:, None, :] + HEXAGON * size
+
+    hexbin = artists['hexbin']
+    if hexbin is None:
+        hexbin = artists['hexbin'] = PolyCollection([], norm=LogNorm(), linewidths=0, edgecolors='face', zorder=1)
+        artists['ax'].add_collection(hexbin, autolim=False)
+    hexbin.set_verts(polygons)
+    hexbin.set_array(counts[begin:end][visible])
+    hexbin.autoscale()
+    hexbin.set_visible(True)
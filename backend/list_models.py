@@ -0,0 +1,180 @@
+import numpy as np
+from PyQt5.QtCore import QAbstractListModel, QItemSelection, QItemSelectionModel, QModelIndex, Qt
+
+
+def selected_rows(view):
+    # Selected rows straight from the selection ranges; selecting everything
+    # is a single range, so this never builds one QModelIndex per row
+    ranges = [np.arange(selection.top(), selection.bottom() + 1)
+              for selection in view.selectionModel().selection()]
+    if not ranges:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(ranges))
+
+
+def select_rows(view, rows):
+    # Replaces the selection with the given ascending rows, one range per run
+    model = view.model()
+    selection = QItemSelection()
+    if len(rows):
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        starts = rows[np.concatenate(([0], breaks))]
+        ends = rows[np.concatenate((breaks - 1, [len(rows) - 1]))]
+        for start, end in zip(starts, ends):
+            selection.select(model.index(int(start)), model.index(int(end)))
+    view.selectionModel().select(selection, QItemSelectionModel.ClearAndSelect)
+
+
+class FileListModel(QAbstractListModel):
+    # Names of the files the user has added, in the order they were added
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.names = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.names)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.UserRole):
+            return None
+        return self.names[index.row()]
+
+    def add_file(self, file_name):
+        row = len(self.names)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.names.append(file_name)
+        self.endInsertRows()
+        return row
+
+    def clear(self):
+        self.beginResetModel()
+        self.names = []
+        self.endResetModel()
+
+
+class CollectionListModel(QAbstractListModel):
+    # One row per collection of every loaded file, each file's collections in
+    # a contiguous block. Rows map to (file name, collection index) through
+    # two integer arrays; labels are only built for rows the view paints.
+    # set_shown() limits the view to some of those rows: rows given to and
+    # returned by the methods below are view rows, full_rows() and
+    # view_rows() convert between the two.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.files = []
+        self.counts = []
+        self.starts = np.zeros(1, dtype=np.int64)
+        self.row_file = np.empty(0, dtype=np.int32)
+        self.shown = None
+
+    def _rebuild(self):
+        counts = np.asarray(self.counts, dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+        self.row_file = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.row_file) if self.shown is None else len(self.shown)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            file_name, collection_number = self.key(index.row())
+            return f"{file_name} - Collection {collection_number + 1}"
+        if role == Qt.UserRole:
+            return self.key(index.row())
+        return None
+
+    def key(self, row):
+        row = self.full_rows(row)
+        file_id = self.row_file[row]
+        return self.files[file_id], int(row - self.starts[file_id])
+
+    def keys(self, rows):
+        rows = self.full_rows(rows)
+        file_ids = self.row_file[rows]
+        indices = rows - self.starts[file_ids]
+        return [(self.files[file_id], int(index)) for file_id, index in zip(file_ids, indices)]
+
+    def row(self, file_name, collection_number):
+        # Full row, see view_rows()
+        return int(self.starts[self.files.index(file_name)] + collection_number)
+
+    def full_rows(self, rows):
+        return rows if self.shown is None else self.shown[rows]
+
+    def view_rows(self, full_rows):
+        # View rows of the full rows that are shown, ascending like full_rows
+        if self.shown is None:
+            return full_rows
+        positions = np.searchsorted(self.shown, full_rows)
+        found = positions < len(self.shown)
+        found[found] = self.shown[positions[found]] == full_rows[found]
+        return positions[found]
+
+    def set_shown(self, rows):
+        # Ascending full rows to show, or None for all of them
+        self.beginResetModel()
+        self.shown = rows
+        self.endResetModel()
+
+    def set_count(self, file_name, count):
+        # Adds a file, or grows/shrinks the block of one already listed. With
+        # only some rows shown, the view is reset to show every row again.
+        if self.shown is not None:
+            self.beginResetModel()
+            self.shown = None
+            if file_name not in self.files:
+                self.files.append(file_name)
+                self.counts.append(count)
+            else:
+                self.counts[self.files.index(file_name)] = count
+            self._rebuild()
+            self.endResetModel()
+            return
+        if file_name not in self.files:
+            if count == 0:
+                return
+            row = len(self.row_file)
+            self.beginInsertRows(QModelIndex(), row, row + count - 1)
+            self.files.append(file_name)
+            self.counts.append(count)
+            self._rebuild()
+            self.endInsertRows()
+            return
+
+        file_id = self.files.index(file_name)
+        old_count = self.counts[file_id]
+        end = int(self.starts[file_id + 1])
+        if count > old_count:
+            self.beginInsertRows(QModelIndex(), end, end + count - old_count - 1)
+            self.counts[file_id] = count
+            self._rebuild()
+            self.endInsertRows()
+        elif count < old_count:
+            self.beginRemoveRows(QModelIndex(), end - old_count + count, end - 1)
+            self.counts[file_id] = count
+            self._rebuild()
+            self.endRemoveRows()
+
+    def order_files(self, file_names):
+        # Moves the given files to the front, in that order; the others keep
+        # theirs after them. Shows every row again.
+        position = {file_name: number for number, file_name in enumerate(file_names)}
+        order = sorted(range(len(self.files)), key=lambda file_id: position.get(self.files[file_id], len(position)))
+        self.beginResetModel()
+        self.files = [self.files[file_id] for file_id in order]
+        self.counts = [self.counts[file_id] for file_id in order]
+        self.shown = None
+        self._rebuild()
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.files = []
+        self.counts = []
+        self.shown = None
+        self._rebuild()
+        self.endResetModel()
@@ -1,16 +1,25 @@
-def display_metadata(gui, file_name, collection_number, metadata):
+def display_metadata(gui, file_name, collection_number):
     gui.metadata_display.clear()
+    store = gui.parsed_data.get(file_name)
+    metadata = None
+    if store is not None and 0 <= collection_number < len(store):
+        metadata = store.metadata_dict(collection_number)
     if not metadata:
         gui.metadata_display.append("No metadata available.")
         return
 
     gui.metadata_display.append(f"Metadata for {file_name} - Collection {collection_number + 1}:")
 
-    if isinstance(metadata, dict) and 'metadata' in metadata:
-        metadata = metadata['metadata']
-
     for key, value in metadata.items():
         if isinstance(value, float) and value.is_integer():
             gui.metadata_display.append(f"{key}: {int(value)}")
         else:
             gui.metadata_display.append(f"{key}: {value}")
+
+    copies = [(name, index) for name, index in gui.duplicates.sources(file_name, collection_number)
+              if (name, index) != (file_name, collection_number)]
+    if copies:
+        gui.metadata_display.append("")
+        gui.metadata_display.append("Also loaded from:")
+        for name, index in copies:
+            gui.metadata_display.append(f"{name} - Collection {index + 1}")
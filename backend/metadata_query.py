@@ -0,0 +1,129 @@
+import re
+
+import numpy as np
+
+from backend.collection_store import METADATA_DTYPE, STRING_FIELDS
+
+# Filters are (field, op, value) clauses that must all hold, e.g.
+#   "timestamp >= 2024-06-01; unit_number == 3,7; hdop_error <= 2"
+# A list value with == matches any of the values. Collections missing a
+# filtered field never match.
+
+CLAUSE_PATTERN = re.compile(r'^\s*(\w+)\s*(==|!=|<=|>=|<|>)\s*(.+?)\s*$')
+CLAUSE_SEPARATOR = re.compile(r';|\band\b', re.IGNORECASE)
+COMPARISONS = {
+    '==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+}
+
+
+def _parse_value(field, text):
+    if field == 'timestamp':
+        return np.datetime64(text, 's')
+    if field in STRING_FIELDS:
+        return text
+    return float(text)
+
+
+def parse_filter(text):
+    match = CLAUSE_PATTERN.match(text)
+    if match is None:
+        raise ValueError(f"Invalid filter '{text}', expected FIELD OP VALUE")
+    field, op, value = match.groups()
+    if field not in METADATA_DTYPE.names:
+        raise ValueError(f"Unknown metadata field '{field}'")
+    try:
+        if op == '==' and ',' in value:
+            return field, op, [_parse_value(field, part.strip()) for part in value.split(',')]
+        return field, op, _parse_value(field, value)
+    except ValueError:
+        raise ValueError(f"Invalid value for {field}: '{value}'")
+
+
+def parse_query(text):
+    return [parse_filter(clause) for clause in CLAUSE_SEPARATOR.split(text) if clause.strip()]
+
+
+def _present(column):
+    if column.dtype.kind == 'M':
+        return ~np.isnat(column)
+    if column.dtype.kind == 'U':
+        return column != ''
+    return ~np.isnan(column)
+
+
+def _matches(column, op, value):
+    if isinstance(value, list):
+        return np.isin(column, value) & _present(column)
+    return COMPARISONS[op](column, value) & _present(column)
+
+
+class MetadataIndex:
+    # Query layer over a metadata array (one row per collection). Each
+    # filtered field gets a sorted index the first time it is used; a query
+    # takes the narrowest index range among its fields and checks the other
+    # clauses on those rows only.
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.sorted = {}
+
+    def __len__(self):
+        return len(self.metadata)
+
+    def _sorted(self, field):
+        entry = self.sorted.get(field)
+        if entry is None:
+            column = self.metadata[field]
+            order = np.argsort(column, kind='stable')
+            values = column[order]
+            # NaN, NaT and empty strings don't match any filter
+            present = int(_present(values).sum())
+            if column.dtype.kind == 'U':
+                order, values = order[len(values) - present:], values[len(values) - present:]
+            else:
+                order, values = order[:present], values[:present]
+            entry = self.sorted[field] = (order, values)
+        return entry
+
+    def _candidates(self, field, clauses):
+        # Rows within all range clauses on one field, as one slice of its sorted index
+        order, values = self._sorted(field)
+        begin, end = 0, len(values)
+        for _, op, value in clauses:
+            if op in ('==', '>='):
+                begin = max(begin, np.searchsorted(values, value, side='left'))
+            elif op == '>':
+                begin = max(begin, np.searchsorted(values, value, side='right'))
+            if op in ('==', '<='):
+                end = min(end, np.searchsorted(values, value, side='right'))
+            elif op == '<':
+                end = min(end, np.searchsorted(values, value, side='left'))
+        return order[begin:max(begin, end)]
+
+    def query(self, filters):
+        # Matching rows in ascending order
+        ranges = {}
+        for clause in filters:
+            field, op, value = clause
+            if op != '!=' and not isinstance(value, list):
+                ranges.setdefault(field, []).append(clause)
+
+        rows, answered = None, []
+        for field, clauses in ranges.items():
+            candidates = self._candidates(field, clauses)
+            if rows is None or len(candidates) < len(rows):
+                rows, answered = candidates, clauses
+        rows = np.arange(len(self.metadata)) if rows is None else np.sort(rows)
+
+        for clause in filters:
+            if not len(rows):
+                break
+            if any(clause is done for done in answered):
+                continue
+            field, op, value = clause
+            rows = rows[_matches(self.metadata[field][rows], op, value)]
+        return rows
+
+    def mask(self, filters):
+        mask = np.zeros(len(self.metadata), dtype=bool)
+        mask[self.query(filters)] = True
+        return mask
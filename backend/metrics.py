@@ -0,0 +1,210 @@
+import csv
+import functools
+import os
+import weakref
+
+import numpy as np
+
+from backend.tracing import annotate, traced
+
+# Per-collection values derived from the measurements, computed for every
+# collection of a store at once with segment reductions over its flat
+# depth/value arrays. A metric is named by a spec:
+#   peak_pressure         highest pressure
+#   peak_depth            depth of the highest pressure
+#   max_depth             deepest sample
+#   depth_at_psi:300      depth where pressure first reaches 300 psi (interpolated)
+#   band_mean:6-12        mean pressure between 6 and 12 inches deep
+# ADCP_METRICS (comma-separated specs) replaces the default set.
+
+DEFAULT_METRICS = ['peak_pressure', 'peak_depth', 'max_depth', 'depth_at_psi:300',
+                   'band_mean:0-6', 'band_mean:6-12', 'band_mean:12-24']
+# Metadata fields the metrics tab can plot against, besides collection order
+METRIC_AXES = {'vwc': "VWC", 'b_horizon': "B Horizon", 'b_horizon_transition': "B Horizon Transition"}
+# Metadata written next to the metrics in CSV exports
+CSV_METADATA_FIELDS = ['unit_number', 'vwc', 'b_horizon', 'b_horizon_transition', 'latitude', 'longitude']
+
+# store -> {spec: values}; a reloaded file is a new store, so changed files
+# miss and the old results go with the old store
+_cache = weakref.WeakKeyDictionary()
+
+
+def _parse_number(spec, text):
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"Invalid number '{text}' in metric '{spec}'")
+
+
+def parse_metric(spec):
+    # (label, function(profiles) -> one value per collection)
+    name, _, argument = spec.strip().partition(':')
+    if name == 'peak_pressure' and not argument:
+        return "Peak pressure (psi)", _peak_pressure
+    if name == 'peak_depth' and not argument:
+        return "Depth of peak pressure (in)", _peak_depth
+    if name == 'max_depth' and not argument:
+        return "Maximum depth (in)", _max_depth
+    if name == 'depth_at_psi' and argument:
+        threshold = _parse_number(spec, argument)
+        return f"Depth at {threshold:g} psi (in)", lambda profiles: _depth_at(profiles, threshold)
+    if name == 'band_mean' and argument:
+        low, separator, high = argument.partition('-')
+        if not separator:
+            raise ValueError(f"Invalid depth band in metric '{spec}', expected LOW-HIGH")
+        low, high = _parse_number(spec, low), _parse_number(spec, high)
+        return f"Mean pressure {low:g}-{high:g} in (psi)", lambda profiles: _band_mean(profiles, low, high)
+    raise ValueError(f"Unknown metric '{spec}'")
+
+
+def metric_specs():
+    value = os.environ.get('ADCP_METRICS')
+    if value:
+        specs = [spec.strip() for spec in value.split(',') if spec.strip()]
+        try:
+            for spec in specs:
+                parse_metric(spec)
+            return specs
+        except ValueError as e:
+            print(f"Ignoring ADCP_METRICS: {e}")
+    return list(DEFAULT_METRICS)
+
+
+def metric_label(spec):
+    return parse_metric(spec)[0]
+
+
+class _Profiles:
+    # Flat arrays of one pass, plus per-point helpers the metrics share
+    def __init__(self, depths, values, offsets):
+        self.depths = np.asarray(depths, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.count = len(self.offsets) - 1
+
+    @functools.cached_property
+    def owners(self):
+        # Collection of each point
+        return np.repeat(np.arange(self.count), np.diff(self.offsets))
+
+    @functools.cached_property
+    def valid(self):
+        return ~np.isnan(self.values)
+
+    def reduce(self, ufunc, data):
+        # reduceat over the starts of the non-empty collections covers each
+        # exactly; empty ones are NaN
+        result = np.full(self.count, np.nan)
+        nonempty = np.flatnonzero(np.diff(self.offsets))
+        if len(nonempty):
+            result[nonempty] = ufunc.reduceat(data, self.offsets[nonempty])
+        return result
+
+    def first_index(self, mask):
+        # Index of the first True point per collection, or -1. Only the
+        # starts of runs of True are candidates, which keeps dense masks cheap.
+        starts = mask.copy()
+        starts[1:] &= ~mask[:-1]
+        heads = self.offsets[:-1][np.diff(self.offsets) > 0]
+        starts[heads] = mask[heads]
+        points = np.flatnonzero(starts)
+        owners = self.owners[points]
+        first = np.ones(len(points), dtype=bool)
+        first[1:] = owners[1:] != owners[:-1]
+        result = np.full(self.count, -1, dtype=np.int64)
+        result[owners[first]] = points[first]
+        return result
+
+
+def _peak_pressure(profiles):
+    return profiles.reduce(np.fmax, profiles.values)
+
+
+def _peak_depth(profiles):
+    peaks = _peak_pressure(profiles)
+    first = profiles.first_index(profiles.values == np.repeat(peaks, np.diff(profiles.offsets)))
+    result = np.full(profiles.count, np.nan)
+    result[first >= 0] = profiles.depths[first[first >= 0]]
+    return result
+
+
+def _max_depth(profiles):
+    return profiles.reduce(np.fmax, profiles.depths)
+
+
+def _depth_at(profiles, threshold):
+    depths, values = profiles.depths, profiles.values
+    first = profiles.first_index(values >= threshold)
+    found = np.flatnonzero(first >= 0)
+    index = first[found]
+    result = np.full(profiles.count, np.nan)
+    result[found] = depths[index]
+    # Interpolate from the sample before the crossing, within the collection
+    inside = index > profiles.offsets[found]
+    before, after = index[inside] - 1, index[inside]
+    rise = values[after] - values[before]
+    fraction = np.divide(threshold - values[before], rise, out=np.ones(len(rise)), where=rise > 0)
+    interpolated = depths[before] + fraction * (depths[after] - depths[before])
+    result[found[inside]] = np.where(np.isfinite(interpolated), interpolated, depths[after])
+    return result
+
+
+def _band_mean(profiles, low, high):
+    inside = (profiles.depths >= low) & (profiles.depths < high) & profiles.valid
+    owners = profiles.owners[inside]
+    totals = np.bincount(owners, weights=profiles.values[inside], minlength=profiles.count)
+    counts = np.bincount(owners, minlength=profiles.count)
+    return np.divide(totals, counts, out=np.full(profiles.count, np.nan), where=counts > 0)
+
+
+def compute_metrics(depths, values, offsets, specs):
+    # {spec: values} over all collections described by offsets
+    profiles = _Profiles(depths, values, offsets)
+    return {spec: parse_metric(spec)[1](profiles) for spec in specs}
+
+
+@traced('metrics.store')
+def store_metrics(store, specs):
+    # Cached per store; only specs not computed before are computed now
+    cached = _cache.setdefault(store, {})
+    missing = [spec for spec in specs if spec not in cached]
+    annotate(collections=len(store), computed=len(missing))
+    if missing:
+        cached.update(compute_metrics(store.depths, store.values, store.offsets, missing))
+    return {spec: cached[spec] for spec in specs}
+
+
+def collection_metrics(stores, keys, specs):
+    # {spec: values aligned with keys}; stores maps file name -> store
+    result = {spec: np.full(len(keys), np.nan) for spec in specs}
+    by_file = {}
+    for position, (file_name, index) in enumerate(keys):
+        positions, indices = by_file.setdefault(file_name, ([], []))
+        positions.append(position)
+        indices.append(index)
+    for file_name, (positions, indices) in by_file.items():
+        store = stores.get(file_name)
+        if store is None:
+            continue
+        try:
+            computed = store_metrics(store, specs)
+        except (OSError, ValueError) as e:
+            # A lazily decoded file that was moved or rewritten; left as NaN
+            print(f"Skipped metrics of {file_name}: {e}")
+            continue
+        for spec, values in computed.items():
+            result[spec][positions] = values[indices]
+    return result
+
+
+def write_metrics_csv(path, keys, metadata, metrics):
+    # One row per collection: its file and number, some metadata, then the metrics
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['file', 'collection', 'timestamp'] + CSV_METADATA_FIELDS + list(metrics))
+        columns = [metadata[field] for field in CSV_METADATA_FIELDS] + list(metrics.values())
+        for row, (file_name, index) in enumerate(keys):
+            timestamp = metadata['timestamp'][row]
+            writer.writerow([file_name, index + 1, '' if np.isnat(timestamp) else str(timestamp)]
+                            + ['' if np.isnan(column[row]) else f"{column[row]:.6g}" for column in columns])
+    return len(keys)
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from backend.adcp_index import AdcpStore
+from backend.collection_store import load_store, save_store
+
+MEMORY_BUDGET = 512 * 1024 * 1024
+DISK_BUDGET = 2 * 1024 * 1024 * 1024
+CACHE_VERSION = 1
+
+
+def cache_key(filepath, limit=None):
+    stat = os.stat(filepath)
+    raw = f"{CACHE_VERSION}|{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}|{limit}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _entry_size(path):
+    total = 0
+    for name in os.listdir(path):
+        total += os.path.getsize(os.path.join(path, name))
+    return total
+
+
+class ParseCache:
+    # Two levels: parsed stores kept in memory (LRU by byte size), backed by
+    # .npy entries on disk that are memory-mapped back on a hit. Keys include
+    # the file's size and mtime, so edited files simply miss.
+    def __init__(self, directory, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, filepath, limit=None):
+        try:
+            key = cache_key(filepath, limit)
+        except OSError:
+            return None
+        with self.lock:
+            store = self.memory.get(key)
+            if store is not None:
+                self.memory.move_to_end(key)
+                return store
+
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            store = load_store(entry)
+            os.utime(entry)
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {entry}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        self._remember(key, store)
+        return store
+
+    def put(self, filepath, store, limit=None):
+        try:
+            key = cache_key(filepath, limit)
+        except OSError:
+            return
+        self._remember(key, store)
+
+        # Indexed .adcp files already open instantly; only decoded arrays go to disk
+        if isinstance(store, AdcpStore) or self.disk_budget <= 0:
+            return
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry):
+            return
+        temp_entry = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_entry = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+            save_store(store, temp_entry)
+            os.replace(temp_entry, entry)
+        except OSError as e:
+            print(f"Could not write cache entry for {filepath}: {e}")
+            if temp_entry is not None:
+                shutil.rmtree(temp_entry, ignore_errors=True)
+            return
+        self.evict_disk()
+
+    def replace(self, store, replacement):
+        # The memory level keeps the store the application holds, e.g. once
+        # duplicate collections are shared, so the original arrays can go
+        with self.lock:
+            for key, cached in self.memory.items():
+                if cached is store:
+                    self.memory[key] = replacement
+
+    def _remember(self, key, store):
+        with self.lock:
+            self.memory[key] = store
+            self.memory.move_to_end(key)
+            total = sum(cached.nbytes for cached in self.memory.values())
+            while total > self.memory_budget and len(self.memory) > 1:
+                _, evicted = self.memory.popitem(last=False)
+                total -= evicted.nbytes
+
+    def evict_disk(self):
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                if name.startswith('.tmp-'):
+                    # Left behind by an interrupted write
+                    if time.time() - os.path.getmtime(path) > 3600:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                entries.append((os.path.getmtime(path), _entry_size(path), path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_budget:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
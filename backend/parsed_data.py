@@ -0,0 +1,128 @@
+import os
+import shutil
+from collections import OrderedDict
+
+from backend.tracing import span
+
+# gui.parsed_data: file name -> store, used like a dict, with a memory budget
+# for the measurement arrays. Over budget, the least recently used files give
+# their arrays up (store.release_measurements): decoded arrays move to
+# memory-mapped files, .adcp files go back to decoding from the file. The
+# metadata stays in memory, and reading released measurements pages them back
+# in, so callers never see the difference. Files in the current plot are
+# marked with use() and are never released.
+
+DEFAULT_BUDGET_MB = 1024
+
+
+def memory_budget():
+    # Bytes; ADCP_MEMORY_BUDGET_MB overrides the default
+    value = os.environ.get('ADCP_MEMORY_BUDGET_MB')
+    if value:
+        try:
+            return int(float(value) * 1024 * 1024)
+        except ValueError:
+            print(f"Ignoring invalid ADCP_MEMORY_BUDGET_MB={value!r}")
+    return DEFAULT_BUDGET_MB * 1024 * 1024
+
+
+class ParsedData:
+    def __init__(self, spill_dir, budget=None):
+        # Spill files left by an earlier session; on Windows ones still mapped
+        # by a running session can't be removed and are skipped
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        self.spill_dir = spill_dir
+        self.budget = memory_budget() if budget is None else budget
+        self.stores = OrderedDict()  # least recently used first
+        self.in_use = set()
+        self.evictions = 0
+        self.evicted_bytes = 0
+        # Called with no arguments whenever the resident size may have changed
+        self.on_change = None
+
+    def __len__(self):
+        return len(self.stores)
+
+    def __iter__(self):
+        return iter(self.stores)
+
+    def __contains__(self, file_name):
+        return file_name in self.stores
+
+    def __getitem__(self, file_name):
+        return self.stores[file_name]
+
+    def get(self, file_name, default=None):
+        return self.stores.get(file_name, default)
+
+    def keys(self):
+        return self.stores.keys()
+
+    def values(self):
+        return self.stores.values()
+
+    def items(self):
+        return self.stores.items()
+
+    def __setitem__(self, file_name, store):
+        self.stores[file_name] = store
+        self.stores.move_to_end(file_name)
+        self.enforce_budget()
+
+    def __delitem__(self, file_name):
+        del self.stores[file_name]
+        self.in_use.discard(file_name)
+        self._changed()
+
+    def pop(self, file_name, default=None):
+        store = self.stores.pop(file_name, default)
+        self.in_use.discard(file_name)
+        self._changed()
+        return store
+
+    def clear(self):
+        self.stores.clear()
+        self.in_use = set()
+        self._changed()
+
+    def use(self, file_names):
+        # The files the current plot reads from: most recently used, and kept
+        # in memory until the next use()
+        self.in_use = {file_name for file_name in file_names if file_name in self.stores}
+        for file_name in self.in_use:
+            self.stores.move_to_end(file_name)
+        self.enforce_budget()
+
+    def resident_bytes(self):
+        return sum(store.measurement_nbytes for store in self.stores.values())
+
+    def metadata_bytes(self):
+        return sum(store.offsets.nbytes + store.metadata.nbytes for store in self.stores.values())
+
+    def enforce_budget(self):
+        resident = self.resident_bytes()
+        for file_name in list(self.stores):
+            if resident <= self.budget:
+                break
+            resident -= self._release(file_name)
+        self._changed()
+
+    def _release(self, file_name):
+        store = self.stores[file_name]
+        if file_name in self.in_use or not store.measurement_nbytes:
+            return 0
+        with span('data.release', file=file_name) as timing:
+            released = store.release_measurements(self.spill_dir)
+            timing.set(bytes=released)
+        self.evictions += 1
+        self.evicted_bytes += released
+        return released
+
+    def summary(self):
+        megabyte = 1024 * 1024
+        return (f"Measurements: {self.resident_bytes() / megabyte:.1f} of {self.budget / megabyte:.0f} MB "
+                f"in memory, {self.evictions} released; metadata {self.metadata_bytes() / megabyte:.1f} MB")
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
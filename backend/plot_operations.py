@@ -1,189 +1,589 @@
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from datetime import datetime
-import matplotlib.dates as mdates
 import os
+
+from matplotlib.collections import LineCollection
+from matplotlib.patches import Rectangle
+import numpy as np
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QColor, QBrush, QFont
 from PyQt5.QtWidgets import QListWidgetItem
 
-def plot_data(gui):
-    selected_items = gui.collection_list.selectedItems()
-    if not selected_items:
-        return
+from backend.aggregation import depth_grid, group_profiles, resample_profiles, summarize
+from backend.collection_store import empty_metadata, readable_measurements
+from backend.figures import (
+    ABORT_STATUS_LABELS, METADATA_TABS, METRICS_TAB, add_aggregate_bands, aggregate_legend, collection_label,
+    concat_profiles, create_metadata_axes, create_profile_axes, cycle_color, decimated_segments, metadata_series, update_metadata_axes, update_metric_axes
+)
+from backend.hover import attach_hover, draw_hover, point_index, set_hover_points
+from backend.latlong_view import attach_latlong, update_latlong
+from backend.list_models import selected_rows
+from backend.metadata_display import display_metadata
+from backend.metrics import METRIC_AXES, collection_metrics, metric_label
+from backend.tracing import annotate, span, traced
+
+# Above either count the profile axis draws all collections as one decimated
+# LineCollection instead of one line each. ADCP_LOD_LINES and ADCP_LOD_POINTS
+# override the defaults; the Performance panel changes them while running.
+DEFAULT_LOD_LINES = 300
+DEFAULT_LOD_POINTS = 300_000
+
+
+def _threshold(variable, default):
+    value = os.environ.get(variable)
+    if value:
+        try:
+            return max(0, int(value))
+        except ValueError:
+            print(f"Ignoring invalid {variable}={value!r}")
+    return default
 
-    # Clear profile plot
-    gui.profile_figure.clear()
-    ax1 = gui.profile_figure.add_subplot(111)
-    ax1.grid(True, which='major', linestyle='--', linewidth=0.5, alpha=0.3)
 
-    gui.legend_list.clear()
+LOD_LINE_THRESHOLD = _threshold('ADCP_LOD_LINES', DEFAULT_LOD_LINES)
+LOD_POINT_THRESHOLD = _threshold('ADCP_LOD_POINTS', DEFAULT_LOD_POINTS)
 
-    # Shared metadata info
-    timestamps, latitudes, longitudes = [], [], []
-    abort_statuses, actuator_errors, temperatures = [], [], []
-    colors, labels = [], []
 
-    for item in selected_items:
-        selected_collection = item.text()
-        try:
-            file_name, collection_number = selected_collection.split(" - Collection ")
-            collection_number = int(collection_number.split()[0]) - 1
-
-            data = gui.parsed_data.get(file_name)
-            if not data or collection_number >= len(data):
-                continue
-
-            collection = data[collection_number]
-            collection_data = collection.get('measurements') or collection.get('data') or []
-            metadata = collection.get('metadata') or {k: v for k, v in collection.items() if k != 'data'}
-
-            depths = [point['depth'] for point in collection_data]
-            values = [point['value'] for point in collection_data]
-
-            base_name = os.path.splitext(file_name)[0]
-            short_name = base_name[:12].rstrip('_') + "_..." if len(base_name) > 20 else base_name
-            label = f"{short_name} #{collection_number + 1}"
-            line = ax1.plot(depths, values, label=label)
-            color = line[0].get_color()
-
-            labels.append(label)
-            colors.append(color)
-
-            legend_item = QListWidgetItem(label)
-            legend_item.setForeground(QBrush(QColor(color)))
-            legend_item.setFont(QFont("Courier", 9))
-            legend_item.setData(Qt.UserRole, {
-                "file": file_name,
-                "collection": f"Collection {collection_number + 1}",
-                "color": color
-            })
-            gui.legend_list.addItem(legend_item)
-
-            try:
-                dt = datetime(
-                    int(metadata['year']), int(metadata['month']), int(metadata['day']),
-                    int(metadata.get('hour', 0)), int(metadata.get('minute', 0)), int(metadata.get('second', 0))
-                )
-                timestamps.append(dt)
-            except Exception:
-                timestamps.append(None)
-
-            latitudes.append(metadata.get('latitude'))
-            longitudes.append(metadata.get('longitude'))
-            abort_statuses.append(metadata.get('abort_status'))
-            actuator_errors.append(metadata.get('actuator_absolute_position_error'))
-            val = metadata.get('adcp_internal_temp_f') or metadata.get('internal_temp')
-            temperatures.append(val)
-
-        except Exception:
-            continue
+def lod_thresholds():
+    return LOD_LINE_THRESHOLD, LOD_POINT_THRESHOLD
 
-    # Finalize profile plot
-    ax1.set_title("ADCP Profile Data")
-    ax1.set_xlabel("Depth (in)")
-    ax1.set_xlim(-2, 25)
-    ax1.set_ylabel("Pressure (psi)")
-    ax1.set_ylim(-100, 1100)
-
-    gui.profile_lines = ax1.get_lines()
-    gui.highlighted_label = None
-
-    def handle_legend_click(item):
-        clicked_label = item.text()
-        is_same = (gui.highlighted_label == clicked_label)
-
-        # Adjust plot line styles
-        for line in gui.profile_lines:
-            if line.get_label() == clicked_label:
-                line.set_linewidth(1.5 if is_same else 3.0)
-                line.set_alpha(1.0)
-            else:
-                line.set_linewidth(1.0)
-                line.set_alpha(1.0 if is_same else 0.3)
 
-        gui.highlighted_label = None if is_same else clicked_label
-        gui.profile_canvas.draw()
+def set_lod_thresholds(gui, lines, points):
+    # Redraws the current plot, switching between lines and the decimated view
+    global LOD_LINE_THRESHOLD, LOD_POINT_THRESHOLD
+    if (lines, points) == lod_thresholds():
+        return
+    LOD_LINE_THRESHOLD, LOD_POINT_THRESHOLD = lines, points
+    if gui.plotted:
+        plot_data(gui)
+
+
+def reset_plot_state(gui):
+    # Per-collection artists keyed by (file name, collection index)
+    gui.plotted = {}
+    gui.profile_ax = None
+    gui.profile_background = None
+    gui.dimmed_background = None
+    gui.highlight_line = None
+    gui.highlight_overlay = None
+    gui.lod_collection = None
+    gui.lod_data = None
+    gui.color_index = 0
+    gui.aggregate_artists = []
+    gui.aggregate_plot = None
+    gui.metadata_artists = {}
+    gui.metadata_plot_data = None
+    gui.latlong_view = None
+    gui.dirty_metadata_tabs = set()
+    gui.profile_keys = []
+    gui.profile_lines = []
+    gui.highlighted_key = None
+
+
+def selected_keys(gui):
+    return gui.collection_model.keys(selected_rows(gui.collection_list))
+
+
+@traced('plot.gather_metadata')
+def gather_metadata(gui, keys):
+    # Metadata rows of the given collections, fetched with one take per file
+    metadata = empty_metadata(len(keys))
+    by_file = {}
+    for position, (file_name, index) in enumerate(keys):
+        positions, indices = by_file.setdefault(file_name, ([], []))
+        positions.append(position)
+        indices.append(index)
+    for file_name, (positions, indices) in by_file.items():
+        metadata[positions] = gui.parsed_data[file_name].metadata[indices]
+    return metadata
+
+
+def _on_profile_draw(gui):
+    # Every full draw renders the plain plot; re-apply any highlight on top
+    gui.profile_background = gui.profile_canvas.copy_from_bbox(gui.profile_figure.bbox)
+    gui.dimmed_background = None
+    # The canvas repaints from the buffer right after this event
+    if gui.highlighted_key is not None:
+        _render_highlight(gui)
+    else:
+        draw_hover(gui, 'profile')
+
+
+def _render_highlight(gui):
+    # Dimming is one translucent overlay over the cached plot; only the
+    # highlighted line (and the hover annotation) is drawn on top of it
+    canvas = gui.profile_canvas
+    ax = gui.profile_ax
+    if gui.highlighted_key is None:
+        canvas.restore_region(gui.profile_background)
+    else:
+        if gui.dimmed_background is None:
+            canvas.restore_region(gui.profile_background)
+            ax.draw_artist(gui.highlight_overlay)
+            gui.dimmed_background = canvas.copy_from_bbox(gui.profile_figure.bbox)
+        else:
+            canvas.restore_region(gui.dimmed_background)
+        ax.draw_artist(gui.highlight_line)
+    draw_hover(gui, 'profile')
 
-        # Update metadata panel
-        if is_same:
-            gui.metadata_display.clear()
-            return
 
-        info = item.data(Qt.UserRole)
-        if not info:
-            gui.metadata_display.setText("No metadata available.")
-            return
+def _blit_highlight(gui):
+    _render_highlight(gui)
+    gui.profile_canvas.blit(gui.profile_figure.bbox)
 
-        file = info.get("file")
-        try:
-            index = int(info.get("collection").split()[-1]) - 1
-            metadata = gui.parsed_data[file][index].get("metadata", {})
-        except Exception:
-            gui.metadata_display.setText("Metadata not found.")
-            return
-
-        if not metadata:
-            gui.metadata_display.setText("No metadata found.")
+
+def _redraw_profile_overlays(gui):
+    if gui.profile_background is None:
+        gui.profile_canvas.draw_idle()
+    else:
+        _blit_highlight(gui)
+
+
+def _set_highlight(gui, key):
+    entry = gui.plotted.get(key)
+    if entry is not None:
+        measurements, readable = readable_measurements([(entry['store'], key[1])])
+        if readable:
+            gui.highlight_line.set_data(*measurements[0])
+            gui.highlight_line.set_color(entry['color'])
         else:
-            lines = [f"{key}: {value}" for key, value in metadata.items()]
-            gui.metadata_display.setText("\n".join(lines))
+            entry = None
+    gui.highlighted_key = key if entry is not None else None
+    gui.highlight_line.set_visible(entry is not None)
+    gui.highlight_overlay.set_visible(entry is not None)
+
 
+def _profile_axes(gui):
+    ax = gui.profile_ax
+    if ax is not None and ax in gui.profile_figure.axes:
+        return ax
+
+    gui.profile_figure.clear()
+    gui.legend_list.clear()
+    gui.plotted = {}
+    gui.lod_collection = None
+    gui.lod_data = None
+    gui.color_index = 0
+    gui.aggregate_artists = []
+    gui.aggregate_plot = None
+    ax = create_profile_axes(gui.profile_figure)
+    gui.profile_ax = ax
+
+    # Animated artists are skipped by normal draws and only blitted
+    gui.highlight_overlay = Rectangle((0, 0), 1, 1, transform=ax.transAxes, facecolor=ax.get_facecolor(),
+                                      alpha=0.7, animated=True, visible=False)
+    ax.add_patch(gui.highlight_overlay)
+    gui.highlight_line = ax.plot([], [], linewidth=3.0, label='_highlight', animated=True, visible=False)[0]
+    gui.profile_background = None
+    gui.dimmed_background = None
+    ax.callbacks.connect('xlim_changed', lambda changed_ax: _decimate_view(gui))
+    attach_hover(gui, 'profile', ax, lambda owner, depth, value: _describe_profile_point(gui, owner, depth, value),
+                 lambda owner: pick_collection(gui, gui.profile_keys[owner]),
+                 redraw=lambda: _redraw_profile_overlays(gui))
+
+    if getattr(gui, 'profile_draw_cid', None) is None:
+        gui.profile_draw_cid = gui.profile_canvas.mpl_connect('draw_event', lambda event: _on_profile_draw(gui))
+        gui.profile_canvas.mpl_connect('resize_event', lambda event: _decimate_view(gui))
+    return ax
+
+
+def _profile_point_index(profiles):
+    # Every measured point of the plotted profiles, owned by its position in
+    # gui.profile_keys
+    measurements, readable = readable_measurements(profiles)
+    depths, values, offsets = concat_profiles(measurements)
+    owners = np.repeat(np.array(readable, dtype=np.int64), np.diff(offsets))
+    return point_index(np.column_stack((depths, values)), owners)
+
+
+def _collection_summary(row):
+    # Timestamp, unit and abort status of one metadata row, where known
+    parts = []
+    if not np.isnat(row['timestamp']):
+        parts.append(str(row['timestamp']).replace('T', ' '))
+    if not np.isnan(row['unit_number']):
+        parts.append(f"unit {row['unit_number']:g}")
+    parts.append(_abort_status_text(row['abort_status']))
+    return ", ".join(part for part in parts if part)
+
+
+def _abort_status_text(status):
+    if np.isnan(status):
+        return ""
+    return ABORT_STATUS_LABELS[int(status)] if 0 <= status < len(ABORT_STATUS_LABELS) else f"status {status:g}"
+
+
+def _describe_profile_point(gui, owner, depth, value):
+    key = gui.profile_keys[owner]
+    entry = gui.plotted[key]
+    row = entry['store'].metadata[key[1]]
+    return f"{entry['label']}\n{depth:.2f} in, {value:.1f} psi\n{_collection_summary(row)}"
+
+
+def _describe_metadata_point(gui, tab, owner, x, y):
+    metadata, labels, _, _ = gui.metadata_plot_data
+    if tab == METRICS_TAB:
+        value = f"{metric_label(gui.metric_spec)}: {y:g}"
+    elif tab == 'timestamp':
+        value = _collection_summary(metadata[owner])
+    elif tab == 'abort_status':
+        value = _abort_status_text(y)
+    elif tab == 'actuator_error':
+        value = f"actuator error {y:g}"
+    else:
+        value = f"{y:g} \N{DEGREE SIGN}F"
+    return f"{labels[owner]}\n{value}"
+
+
+def _next_color(gui):
+    color = cycle_color(gui.color_index)
+    gui.color_index += 1
+    return color
+
+
+def _use_lod(gui, keys):
+    if len(keys) > LOD_LINE_THRESHOLD:
+        return True
+    points = 0
+    for file_name, index in keys:
+        store = gui.plotted[(file_name, index)]['store']
+        points += store.offsets[index + 1] - store.offsets[index]
+    return points > LOD_POINT_THRESHOLD
+
+
+@traced('plot.lod')
+def _update_lod(gui, keys):
+    # Concatenate the selected profiles once; zooming only re-decimates them.
+    # Returns the keys that could not be read.
+    measurements, readable = readable_measurements([(gui.plotted[key]['store'], key[1]) for key in keys])
+    gui.lod_data = concat_profiles(measurements)
+    if gui.lod_collection is None:
+        gui.lod_collection = LineCollection([], linewidths=1.0)
+        gui.profile_ax.add_collection(gui.lod_collection, autolim=False)
+    gui.lod_collection.set_color([gui.plotted[keys[position]]['color'] for position in readable])
+    _decimate_view(gui)
+    return set(keys) - {keys[position] for position in readable}
+
+
+@traced('plot.decimate')
+def _decimate_view(gui):
+    if gui.lod_collection is None or gui.lod_data is None:
+        return
+    ax = gui.profile_ax
+    depths, values, offsets = gui.lod_data
+    columns = max(int(ax.bbox.width), 1)
+    gui.lod_collection.set_segments(decimated_segments(depths, values, offsets, ax.get_xlim(), columns))
+
+
+def _remove_lod(gui):
+    if gui.lod_collection is not None:
+        gui.lod_collection.remove()
+    gui.lod_collection = None
+    gui.lod_data = None
+
+
+def _add_legend_item(gui, file_name, collection_number, label, color):
+    legend_item = QListWidgetItem(label)
+    legend_item.setForeground(QBrush(QColor(color)))
+    legend_item.setFont(QFont("Courier", 9))
+    legend_item.setData(Qt.UserRole, {
+        "file": file_name,
+        "collection": f"Collection {collection_number + 1}",
+        "index": collection_number,
+        "color": color
+    })
+    gui.legend_list.addItem(legend_item)
+    return legend_item
+
+
+@traced('plot.draw')
+def _draw_profile(gui, added, full):
+    # New lines are drawn on top of the last plain frame; anything else needs a full draw
+    canvas = gui.profile_canvas
+    if full or gui.profile_background is None:
+        canvas.draw()
+        return
+    if not added:
+        return
+    canvas.restore_region(gui.profile_background)
+    for line in added:
+        gui.profile_ax.draw_artist(line)
+    gui.profile_background = canvas.copy_from_bbox(gui.profile_figure.bbox)
+    gui.dimmed_background = None
+    _blit_highlight(gui)
+
+
+@traced('plot')
+def plot_data(gui):
+    keys = selected_keys(gui)
+    annotate(collections=len(keys))
+    if not keys:
+        return
+
+    had_axes = gui.profile_ax is not None and gui.profile_ax in gui.profile_figure.axes
+    ax1 = _profile_axes(gui)
+    if gui.aggregate_by is not None:
+        plot_aggregate(gui, keys)
+        return
+    full_redraw = not had_axes
+    selection_changed = not had_axes
+    if gui.aggregate_artists:
+        _clear_aggregate(gui)
+        full_redraw = True
+
+    # Remove collections that are no longer selected
+    wanted = set(keys)
+    for key in [key for key in gui.plotted if key not in wanted]:
+        entry = gui.plotted.pop(key)
+        if entry['line'] is not None:
+            entry['line'].remove()
+        gui.legend_list.takeItem(gui.legend_list.row(entry['legend_item']))
+        full_redraw = selection_changed = True
+
+    # Register newly selected collections and note ones whose file was reloaded
+    for key in keys:
+        file_name, collection_number = key
+        store = gui.parsed_data.get(file_name)
+        if store is None or not 0 <= collection_number < len(store):
+            continue
+
+        entry = gui.plotted.get(key)
+        if entry is None:
+            label = collection_label(file_name, collection_number)
+            color = _next_color(gui)
+            gui.plotted[key] = {
+                'line': None,
+                'label': label,
+                'color': color,
+                'store': store,
+                'legend_item': _add_legend_item(gui, file_name, collection_number, label, color)
+            }
+            selection_changed = True
+        elif entry['store'] is not store:
+            entry['store'] = store
+            if entry['line'] is not None:
+                entry['line'].remove()
+                entry['line'] = None
+            full_redraw = selection_changed = True
+
+    plotted_keys = [key for key in keys if key in gui.plotted]
+    gui.parsed_data.use(file_name for file_name, _ in plotted_keys)
+    lod = _use_lod(gui, plotted_keys)
+
+    # One line per collection, or a single decimated collection above the thresholds
+    with span('plot.artists', lod=lod) as timing:
+        added = []
+        unreadable = set()
+        if lod:
+            for key in plotted_keys:
+                entry = gui.plotted[key]
+                if entry['line'] is not None:
+                    entry['line'].remove()
+                    entry['line'] = None
+                    full_redraw = True
+            if selection_changed or gui.lod_collection is None:
+                unreadable = _update_lod(gui, plotted_keys)
+                full_redraw = True
+        else:
+            if gui.lod_collection is not None:
+                _remove_lod(gui)
+                full_redraw = True
+            new_keys = [key for key in plotted_keys if gui.plotted[key]['line'] is None]
+            measurements, readable = readable_measurements([(gui.plotted[key]['store'], key[1]) for key in new_keys])
+            for position, (depths, values) in zip(readable, measurements):
+                entry = gui.plotted[new_keys[position]]
+                entry['line'] = ax1.plot(depths, values, label=entry['label'], color=entry['color'])[0]
+                added.append(entry['line'])
+            unreadable = set(new_keys) - {new_keys[position] for position in readable}
+        timing.set(lines=len(added))
+
+    # Collections whose file can no longer be read are dropped from the plot
+    if unreadable:
+        for key in unreadable:
+            entry = gui.plotted.pop(key)
+            gui.legend_list.takeItem(gui.legend_list.row(entry['legend_item']))
+        plotted_keys = [key for key in plotted_keys if key not in unreadable]
+        selection_changed = True
+
+    if gui.highlighted_key is not None:
+        _set_highlight(gui, gui.highlighted_key)
+
+    gui.profile_lines = [gui.plotted[key]['line'] for key in plotted_keys if gui.plotted[key]['line'] is not None]
+    if selection_changed:
+        gui.profile_keys = plotted_keys
+        profiles = [(gui.plotted[key]['store'], key[1]) for key in plotted_keys]
+        set_hover_points(gui, 'profile', lambda: _profile_point_index(profiles))
 
     try:
         gui.legend_list.itemClicked.disconnect()
     except TypeError:
         pass
-    gui.legend_list.itemClicked.connect(handle_legend_click)
+    gui.legend_list.itemClicked.connect(lambda item: handle_legend_click(gui, item))
 
     #ax1.legend(loc='center left', bbox_to_anchor=(1.2, 0.5), borderaxespad=0., frameon=True, fontsize='small')
+    _draw_profile(gui, added, full_redraw)
+
+    metadata = gather_metadata(gui, plotted_keys)
+    labels = [gui.plotted[key]['label'] for key in plotted_keys]
+    colors = [gui.plotted[key]['color'] for key in plotted_keys]
+    update_metadata_plots(gui, metadata, labels, colors, plotted_keys)
+
+
+def _clear_profiles(gui):
+    # Drops every per-collection artist and legend row
+    for entry in gui.plotted.values():
+        if entry['line'] is not None:
+            entry['line'].remove()
+    gui.plotted = {}
+    _remove_lod(gui)
+    gui.legend_list.clear()
+    gui.profile_lines = []
+    gui.color_index = 0
+    _set_highlight(gui, None)
+
+
+def _clear_aggregate(gui):
+    for artist in gui.aggregate_artists:
+        artist.remove()
+    gui.aggregate_artists = []
+    gui.aggregate_plot = None
+    gui.legend_list.clear()
+
+
+@traced('plot.aggregate')
+def plot_aggregate(gui, keys):
+    # Per group: median line, dashed mean and a percentile band, instead of
+    # one line per collection
+    ax = gui.profile_ax
+    _clear_profiles(gui)
+    _clear_aggregate(gui)
+    # Hover and picks cover individual profiles only
+    gui.profile_keys = []
+    set_hover_points(gui, 'profile', None)
+    keys = [(file_name, index) for file_name, index in keys
+            if file_name in gui.parsed_data and 0 <= index < len(gui.parsed_data[file_name])]
+    gui.parsed_data.use(file_name for file_name, _ in keys)
+    if not keys:
+        gui.profile_canvas.draw()
+        return
+
+    measurements, readable = readable_measurements([(gui.parsed_data[file_name], index) for file_name, index in keys])
+    keys = [keys[position] for position in readable]
+    if not keys:
+        gui.profile_canvas.draw()
+        return
+    depths, values, offsets = concat_profiles(measurements)
+    with span('plot.resample', collections=len(keys), points=len(depths)):
+        grid = depth_grid(depths)
+        matrix = resample_profiles(depths, values, offsets, grid)
+    metadata = gather_metadata(gui, keys)
+    groups, group_labels = group_profiles(keys, metadata, gui.aggregate_by)
+    summary = summarize(matrix, groups, len(group_labels))
+
+    group_colors = [cycle_color(number) for number in range(len(group_labels))]
+    gui.aggregate_artists = add_aggregate_bands(ax, grid, summary, group_colors)
+    header, entries = aggregate_legend(group_labels, summary)
+    header = QListWidgetItem(header)
+    header.setFont(QFont("Courier", 9))
+    gui.legend_list.addItem(header)
+    for text, color in zip(entries, group_colors):
+        legend_item = QListWidgetItem(text)
+        legend_item.setForeground(QBrush(QColor(color)))
+        legend_item.setFont(QFont("Courier", 9))
+        gui.legend_list.addItem(legend_item)
     gui.profile_canvas.draw()
 
-    # Plot all metadata tabs 
-    for key, canvas in gui.metadata_canvases.items():
-        fig = canvas.figure
-        fig.clear()
-        ax2 = fig.add_subplot(111)
-        ax2.grid(True, which='major', linestyle='--', linewidth=0.5, alpha=0.3)
+    # Kept for export, which draws the same bands
+    key_colors = [group_colors[group] for group in groups]
+    gui.aggregate_plot = {'keys': keys, 'colors': key_colors, 'grid': grid, 'labels': group_labels,
+                          'group_colors': group_colors, 'summary': summary}
+    labels = [collection_label(file_name, index) for file_name, index in keys]
+    update_metadata_plots(gui, metadata, labels, key_colors, keys)
 
+
+@traced('plot.highlight')
+def handle_legend_click(gui, item):
+    info = item.data(Qt.UserRole)
+    key = (info.get("file"), info.get("index")) if info else None
+    is_same = (gui.highlighted_key == key)
+
+    if gui.profile_ax is None:
+        return
+    _set_highlight(gui, None if is_same else key)
+    if gui.profile_background is None:
+        gui.profile_canvas.draw()
+    else:
+        _blit_highlight(gui)
+
+    # Update metadata panel
+    if is_same:
+        gui.metadata_display.clear()
+        return
+
+    if not info:
+        gui.metadata_display.setText("No metadata available.")
+        return
+
+    display_metadata(gui, info.get("file"), info.get("index"))
+
+
+def pick_collection(gui, key):
+    # A click on a plotted point acts like clicking its legend row; also
+    # used to restore a session's highlight
+    entry = gui.plotted.get(key)
+    if entry is None:
+        display_metadata(gui, *key)
+        return
+    gui.legend_list.setCurrentItem(entry['legend_item'])
+    handle_legend_click(gui, entry['legend_item'])
+
+
+def update_metadata_plots(gui, metadata, labels, colors, keys):
+    # Only the visible tab is drawn now; the rest render when first shown
+    gui.metadata_plot_data = (metadata, labels, colors, keys)
+    gui.dirty_metadata_tabs = set(METADATA_TABS + [METRICS_TAB])
+    render_metadata_tab(gui, gui.active_metadata_tab)
+
+
+def render_metadata_tab(gui, key):
+    if key not in gui.dirty_metadata_tabs or gui.metadata_plot_data is None:
+        return
+    gui.dirty_metadata_tabs.discard(key)
+    metadata, labels, colors, keys = gui.metadata_plot_data
+
+    with span('plot.metadata_tab', tab=key, collections=len(metadata)):
+        canvas = gui.metadata_canvas(key)
+        artists = gui.metadata_artists.get(key)
+        if artists is None or artists['ax'] not in canvas.figure.axes:
+            artists = create_metadata_axes(canvas.figure, key)
+            gui.metadata_artists[key] = artists
+            if key == 'latlong':
+                attach_latlong(gui, artists, lambda picked: pick_collection(gui, picked))
+            else:
+                attach_hover(gui, key, artists['ax'],
+                             lambda owner, x, y, tab=key: _describe_metadata_point(gui, tab, owner, x, y),
+                             lambda owner: pick_collection(gui, gui.metadata_plot_data[3][owner]))
         if key == 'latlong':
-            for i in range(len(latitudes)):
-                if latitudes[i] is not None and longitudes[i] is not None:
-                    ax2.scatter(longitudes[i], latitudes[i], label=labels[i], color=colors[i])
-            ax2.set_title("Latitude vs Longitude")
-            ax2.set_xlabel("Longitude")
-            ax2.set_ylabel("Latitude")
-
-        elif key == 'timestamp':
-            clean_times = [ts for ts in timestamps if ts is not None]
-            if clean_times:
-                ax2.plot(range(len(clean_times)), [dt.timestamp() for dt in clean_times], label="Timestamps")
-                ax2.set_title("Timestamp Progression")
-                ax2.set_ylabel("Epoch Time")
-                ax2.set_xticks(range(len(labels)))
-                ax2.set_xticklabels(labels, rotation=45, ha='right')
-
-        elif key == 'abort_status':
-            for i, val in enumerate(abort_statuses):
-                if val is not None:
-                    ax2.scatter(i, val, label=labels[i], color=colors[i])
-            ax2.set_title("Abort Status")
-            ax2.set_ylabel("Status Code")
-            ax2.set_yticks([0, 1, 2])
-            ax2.set_yticklabels(["No Issue", "Manual Abort", "Auto Abort"])
-            ax2.set_xticks(range(len(labels)))
-            ax2.set_xticklabels(labels, rotation=45, ha='right')
-
-        elif key == 'actuator_error':
-            ax2.plot(range(len(actuator_errors)), actuator_errors, label="Actuator Error")
-            ax2.set_title("Actuator Error")
-            ax2.set_xticks(range(len(labels)))
-            ax2.set_xticklabels(labels, rotation=45, ha='right')
-
-        elif key == 'temperature':
-            ax2.plot(range(len(temperatures)), temperatures, label="Temperature")
-            ax2.set_title("Internal Temperature")
-            ax2.set_xticks(range(len(labels)))
-            ax2.set_xticklabels(labels, rotation=45, ha='right')
-        
-        canvas.draw()
+            update_latlong(gui, artists, metadata, labels, colors, keys)
+        elif key == METRICS_TAB:
+            points = _metric_points(gui, metadata, keys)
+            update_metric_axes(artists, points, colors, labels, METRIC_AXES.get(gui.metric_axis), metric_label(gui.metric_spec))
+            set_hover_points(gui, key, lambda: point_index(points, np.arange(len(points))))
+        else:
+            update_metadata_axes(artists, key, metadata, labels, colors)
+            set_hover_points(gui, key, lambda: point_index(*metadata_series(metadata, key)))
+        canvas.draw_idle()
+
+
+def _metric_points(gui, metadata, keys):
+    # (x, metric) per plotted collection; x is its position or the metadata
+    # field picked in the metrics tab
+    values = collection_metrics(gui.parsed_data, keys, [gui.metric_spec])[gui.metric_spec]
+    # Computing may have paged released measurements back in
+    gui.parsed_data.enforce_budget()
+    x = np.arange(len(keys), dtype=float) if gui.metric_axis is None else metadata[gui.metric_axis]
+    return np.column_stack([x, values])
+
+
+def rerender_metrics(gui):
+    # The metric or its x axis changed in the metrics tab
+    gui.dirty_metadata_tabs.add(METRICS_TAB)
+    if gui.active_metadata_tab == METRICS_TAB:
+        render_metadata_tab(gui, METRICS_TAB)
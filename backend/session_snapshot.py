@@ -0,0 +1,117 @@
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from backend.collection_store import STORE_ARRAYS, CollectionStore
+from backend.tracing import annotate, traced
+
+# A whole session in one file: the loaded stores' arrays plus the view state,
+# laid out so the arrays are memory-mapped straight out of the file.
+#   magic (8 bytes) | header length (8 bytes, little endian) | JSON header
+#   | arrays, each starting on an ALIGNMENT boundary
+# Array offsets in the header are relative to the first array. Each file
+# records the size and mtime its source had when saved; a source that has
+# changed since is loaded from the source again instead.
+
+MAGIC = b'ADCPSES1'
+ALIGNMENT = 64
+SNAPSHOT_EXTENSION = '.adcpsession'
+
+
+def _aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def _source_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+@traced('session.write')
+def write_snapshot(path, file_paths, stores, state):
+    # file_paths: file name -> source path of every listed file; stores: file
+    # name -> store of the loaded ones, in list order; state: JSON-able view
+    # state. Written to a temporary file first, so a failed save never
+    # leaves a broken snapshot behind.
+    files, arrays, position = [], [], 0
+    for file_name, store in stores.items():
+        layout = {}
+        for name in STORE_ARRAYS:
+            array = np.ascontiguousarray(getattr(store, name))
+            layout[name] = {'offset': position, 'dtype': np.lib.format.dtype_to_descr(array.dtype),
+                            'shape': list(array.shape)}
+            arrays.append((position, array))
+            position = _aligned(position + array.nbytes)
+        files.append({'name': file_name, 'source': _source_stat(file_paths[file_name]),
+                      'arrays': layout, 'extras': store.extras or None})
+    header = json.dumps({'file_paths': file_paths, 'files': files, 'state': state}).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+    annotate(files=len(files), bytes=data_start + position)
+
+    folder = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(prefix='.tmp-', suffix=SNAPSHOT_EXTENSION, dir=folder)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(MAGIC + struct.pack('<Q', len(header)) + header)
+            for offset, array in arrays:
+                file.seek(data_start + offset)
+                array.tofile(file)
+            file.truncate(data_start + position)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return data_start + position
+
+
+@traced('session.read')
+def read_snapshot(path):
+    # (file_paths, stores, stale, state). stores maps the file names whose
+    # source is unchanged (or gone) to stores over the mapped file, in list
+    # order; stale lists the loaded files to read from their source again.
+    # Raises ValueError for files that are not snapshots.
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session snapshot")
+        (length,) = struct.unpack('<Q', file.read(8))
+        try:
+            header = json.loads(file.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Corrupt session snapshot {path}: {e}")
+    data_start = _aligned(len(MAGIC) + 8 + length)
+    size = os.path.getsize(path)
+
+    file_paths = header['file_paths']
+    stores, stale = {}, []
+    for entry in header['files']:
+        file_name = entry['name']
+        source = _source_stat(file_paths[file_name])
+        if source is not None and source != entry['source']:
+            stale.append(file_name)
+            continue
+        arrays = []
+        for name in STORE_ARRAYS:
+            layout = entry['arrays'][name]
+            dtype = np.lib.format.descr_to_dtype(_descr(layout['dtype']))
+            shape = tuple(layout['shape'])
+            offset = data_start + layout['offset']
+            if offset + dtype.itemsize * int(np.prod(shape)) > size:
+                raise ValueError(f"Session snapshot {path} is truncated")
+            if not np.prod(shape):
+                arrays.append(np.empty(shape, dtype=dtype))
+                continue
+            arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape))
+        stores[file_name] = CollectionStore(*arrays, entry['extras'])
+    annotate(files=len(stores), stale=len(stale))
+    return file_paths, stores, stale, header['state']
+
+
+def _descr(value):
+    # JSON turns the (name, type) pairs of a structured dtype into lists
+    return [tuple(field) for field in value] if isinstance(value, list) else value
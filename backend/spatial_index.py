@@ -0,0 +1,67 @@
+import numpy as np
+
+# Uniform grid over 2-D points for box and nearest-point lookups. Points are
+# sorted by cell, column-major, so the cells of one grid column inside a y
+# range form one contiguous slice of the sorted order.
+
+POINTS_PER_CELL = 16
+MAX_CELLS_PER_SIDE = 1024
+
+
+class GridIndex:
+    def __init__(self, points, cells_per_side=None):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        count = len(self.points)
+        self.side = cells_per_side or int(np.clip(np.sqrt(count / POINTS_PER_CELL), 1, MAX_CELLS_PER_SIDE))
+        if count:
+            self.low, self.high = self.points.min(axis=0), self.points.max(axis=0)
+        else:
+            self.low, self.high = np.zeros(2), np.zeros(2)
+        extent = self.high - self.low
+        self.cell_size = np.where(extent > 0, extent / self.side, 1.0)
+
+        cells = self._cells(self.points)
+        flat = cells[:, 0] * self.side + cells[:, 1]
+        self.order = np.argsort(flat, kind='stable')
+        self.starts = np.searchsorted(flat[self.order], np.arange(self.side * self.side + 1))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cells(self, points):
+        cells = np.floor((points - self.low) / self.cell_size)
+        return np.clip(cells, 0, self.side - 1).astype(np.int64)
+
+    def in_box(self, x0, x1, y0, y1):
+        # Indices of the points inside the box, ascending
+        if not len(self.points) or x0 > x1 or y0 > y1:
+            return np.empty(0, dtype=np.int64)
+        if x0 <= self.low[0] and y0 <= self.low[1] and x1 >= self.high[0] and y1 >= self.high[1]:
+            return np.arange(len(self.points))
+        if x1 < self.low[0] or y1 < self.low[1] or x0 > self.high[0] or y0 > self.high[1]:
+            return np.empty(0, dtype=np.int64)
+
+        (c0, r0), (c1, r1) = self._cells(np.array([[x0, y0], [x1, y1]]))
+        columns = np.arange(c0, c1 + 1) * self.side
+        begins, ends = self.starts[columns + r0], self.starts[columns + r1 + 1]
+        lengths = ends - begins
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        # One gather over all the column slices
+        positions = np.arange(total) + np.repeat(begins - (np.cumsum(lengths) - lengths), lengths)
+        candidates = self.order[positions]
+        x, y = self.points[candidates, 0], self.points[candidates, 1]
+        inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+        return np.sort(candidates[inside])
+
+    def nearest(self, x, y, x_radius, y_radius):
+        # Closest point within an ellipse of the given radii (so a radius in
+        # pixels can be passed in data units per axis), or -1
+        candidates = self.in_box(x - x_radius, x + x_radius, y - y_radius, y + y_radius)
+        if not len(candidates):
+            return -1
+        points = self.points[candidates]
+        distances = ((points[:, 0] - x) / x_radius) ** 2 + ((points[:, 1] - y) / y_radius) ** 2
+        closest = int(np.argmin(distances))
+        return int(candidates[closest]) if distances[closest] <= 1.0 else -1
@@ -0,0 +1,157 @@
+import functools
+import json
+import numbers
+import os
+import threading
+import time
+from collections import deque
+
+# Nested timed spans, kept in a ring buffer and dumped in the Chrome trace
+# event format (opens in Perfetto or chrome://tracing):
+#   with span('plot.draw', lines=120):
+#       ...
+# Disabled (the default, unless ADCP_TRACE=1), span() returns one shared
+# no-op object, so instrumented code pays a global lookup and a call.
+
+MAX_SPANS = 20000
+
+_enabled = os.environ.get('ADCP_TRACE', '') not in ('', '0')
+_spans = deque(maxlen=MAX_SPANS)
+_recorded = 0
+# Spans are recorded from loader and export threads as well
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter_ns() - self.start
+        _local.stack.pop()
+        record(self.name, self.start, duration, depth=self.depth, **self.args)
+        return False
+
+    def set(self, **args):
+        # Sizes that are only known once the work is done
+        self.args.update(args)
+
+
+def span(name, **args):
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def traced(name):
+    # span() around a whole function
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def annotate(**args):
+    # Adds sizes to the innermost open span on this thread
+    stack = getattr(_local, 'stack', None) if _enabled else None
+    if stack:
+        stack[-1].args.update(args)
+
+
+def record(name, start_ns, duration_ns, pid=None, thread=None, depth=0, **args):
+    # Adds a finished span, e.g. one timed in a worker process. perf_counter
+    # is system-wide on Linux and Windows, so worker timings line up.
+    global _recorded
+    if not _enabled:
+        return
+    entry = {
+        'name': name, 'start': start_ns, 'duration': duration_ns,
+        'pid': os.getpid() if pid is None else pid,
+        'thread': threading.current_thread().name if thread is None else thread,
+        'depth': depth, 'args': args,
+    }
+    with _lock:
+        _spans.append(entry)
+        _recorded += 1
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def recorded_count():
+    # Total spans ever recorded; lets a viewer skip refreshes when unchanged
+    return _recorded
+
+
+def recent_spans(count=None):
+    with _lock:
+        spans = list(_spans)
+    return spans if count is None else spans[-count:]
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+
+
+def _json_value(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return str(value)
+
+
+def dump_trace(path):
+    threads = {}
+    events = []
+    for entry in recent_spans():
+        tid = threads.setdefault((entry['pid'], entry['thread']), len(threads) + 1)
+        events.append({
+            'name': entry['name'], 'ph': 'X', 'pid': entry['pid'], 'tid': tid,
+            'ts': entry['start'] / 1000, 'dur': entry['duration'] / 1000,
+            'args': {key: _json_value(value) for key, value in entry['args'].items()},
+        })
+    for (pid, thread), tid in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+    return len(events)
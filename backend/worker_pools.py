@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MAX_WORKERS = os.cpu_count() or 2
+
+# Scratch space for files handed between processes; shared memory (tmpfs) on Linux
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Shared by loading and exporting so the app never holds two sets of workers
+_thread_pool = None
+_process_pool = None
+
+
+def get_thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='adcp-worker')
+    return _thread_pool
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # Forking a process that runs Qt and worker threads can deadlock the child
+        _process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
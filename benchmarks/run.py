@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Timings for the load -> select -> plot -> export path on synthetic data,
+# with the GUI running on Qt's offscreen platform:
+#   python -m benchmarks.run --scale medium
+#   python -m benchmarks.run --scale medium --compare benchmarks/results/<earlier run>.json
+# Each benchmark runs --repeat times, then once more under tracemalloc for its
+# peak traced allocation (main process only; worker processes are not seen).
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from benchmarks.synthetic_data import generate_dataset
+
+# files x collections x samples per collection
+SCALES = {
+    'small': (2, 200, 100),
+    'medium': (4, 2000, 200),
+    'large': (10, 10000, 300),
+}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+HIGHLIGHT_CLICKS = 20
+HOVER_LOOKUPS = 200
+REGRESSION_THRESHOLD = 0.2
+WAIT_TIMEOUT_S = 1800
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, plotting and exporting on synthetic data.")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help="Preset dataset size (default: small)")
+    parser.add_argument('--files', type=int, help="Files per format, overrides the preset")
+    parser.add_argument('--collections', type=int, help="Collections per file, overrides the preset")
+    parser.add_argument('--samples', type=int, help="Mean samples per collection, overrides the preset")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark (default: 3)")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'adcp-bench-data'),
+                        help="Where generated files are kept and reused")
+    parser.add_argument('-o', '--output', help="Results file (default: a new file in benchmarks/results)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Slowdown ratio reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+    files, collections, samples = SCALES[args.scale]
+    args.files = args.files or files
+    args.collections = args.collections or collections
+    args.samples = args.samples or samples
+    return args
+
+
+def measure(name, run, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {'name': name, 'times': times, 'median': statistics.median(times), 'min': min(times),
+              'peak_bytes': peak}
+    print(f"{name}: median {result['median']:.3f}s, peak {peak / 2 ** 20:.1f} MiB")
+    return result
+
+
+def _wait(app, done):
+    deadline = time.monotonic() + WAIT_TIMEOUT_S
+    while not done():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Benchmark step did not finish")
+        app.processEvents()
+        time.sleep(0.001)
+    app.processEvents()
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True)
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                capture_output=True, text=True, check=True)
+        return commit.stdout.strip(), bool(status.stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def _max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_parsers(json_paths, adcp_paths, repeat):
+    from backend.adcp_index import INDEX_SUFFIX
+    from backend.data_parsing import load_adcp, load_json
+
+    def remove_indexes():
+        for path in adcp_paths:
+            if os.path.exists(path + INDEX_SUFFIX):
+                os.remove(path + INDEX_SUFFIX)
+
+    return [
+        measure('load_json', lambda: [load_json(path) for path in json_paths], repeat),
+        measure('load_adcp', lambda: [load_adcp(path) for path in adcp_paths], repeat, remove_indexes),
+    ]
+
+
+def run_startup(repeat):
+    # Whole process, interpreter start to a usable window, via the app's
+    # --startup-timing mode (which quits once startup is done)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, os.path.join(root, 'frontend', 'main_gui.py'), '--startup-timing']
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    def start():
+        subprocess.run(command, env=env, check=True, capture_output=True)
+
+    try:
+        start()
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.decode(errors='replace').strip().splitlines()
+        print(f"Skipping startup benchmark, the app failed to start: {error[-1] if error else e}")
+        return []
+    return [measure('startup', start, repeat)]
+
+
+def run_gui(json_paths, adcp_paths, repeat, scratch):
+    import numpy as np
+    from PyQt5.QtWidgets import QApplication
+
+    import backend.file_operations as file_operations
+    from backend.adcp_index import INDEX_SUFFIX, AdcpStore
+    from backend.figures import METADATA_TABS
+    from backend.hover import lookup, set_hover_points
+    import backend.dedup as dedup
+    import backend.metrics as metrics
+    from backend.parse_cache import ParseCache
+    import backend.plot_operations as plot_operations
+    from backend.plot_operations import handle_legend_click, plot_data, reset_plot_state
+    from frontend.main_gui import ADCPlotterGUI
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    gui = ADCPlotterGUI()
+    gui.resize(1400, 900)
+    gui.show()
+    app.processEvents()
+    paths = json_paths + adcp_paths
+    file_operations.add_files(gui, paths)
+
+    cache_dir = os.path.join(scratch, 'cache')
+
+    def cold_cache():
+        # Nothing parsed, cached or indexed yet
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        file_operations._parse_cache = ParseCache(cache_dir)
+        for path in adcp_paths:
+            if os.path.exists(path + INDEX_SUFFIX):
+                os.remove(path + INDEX_SUFFIX)
+
+    def load_all():
+        gui.file_list.selectAll()
+        file_operations.confirm_selection(gui)
+        _wait(app, lambda: gui.loader is None)
+        if len(gui.parsed_data) != len(paths):
+            raise RuntimeError("Not every file was loaded")
+
+    def select_collections():
+        # Background fingerprinting left over from loading is not timed
+        _wait(app, lambda: gui.fingerprint_jobs is None or not gui.fingerprint_jobs.is_running())
+        reset_plot_state(gui)
+        gui.collection_list.selectAll()
+
+    def plot():
+        plot_data(gui)
+        app.processEvents()
+
+    def highlight():
+        for row in range(min(HIGHLIGHT_CLICKS, gui.legend_list.count())):
+            handle_legend_click(gui, gui.legend_list.item(row))
+            app.processEvents()
+
+    def rebuild_hover_index():
+        profiles = [(gui.plotted[key]['store'], key[1]) for key in gui.profile_keys]
+        set_hover_points(gui, 'profile', lambda: plot_operations._profile_point_index(profiles))
+
+    def hover():
+        # Lookups at random measured points of the plotted profiles
+        rng = np.random.default_rng(0)
+        for row in rng.integers(len(gui.profile_keys), size=HOVER_LOOKUPS):
+            file_name, index = gui.profile_keys[row]
+            depths, values = gui.parsed_data[file_name].measurements(index)
+            point = rng.integers(len(depths))
+            if lookup(gui, 'profile', depths[point], values[point]) is None:
+                raise RuntimeError("Hover lookup missed a plotted point")
+
+    def clear_metrics():
+        metrics._cache.clear()
+
+    def all_metrics():
+        # Every metric of every loaded collection, uncached
+        keys = [(file_name, index) for file_name, store in gui.parsed_data.items() for index in range(len(store))]
+        metrics.collection_metrics(gui.parsed_data, keys, metrics.metric_specs())
+
+    def clear_fingerprints():
+        dedup._cache.clear()
+        # .adcp files would otherwise reuse the ones kept in their index
+        for store in gui.parsed_data.values():
+            if isinstance(store, AdcpStore):
+                store.index.fingerprints = store.index.fingerprints[:0]
+
+    def all_fingerprints():
+        for store in gui.parsed_data.values():
+            dedup.fingerprints(store)
+
+    session_path = os.path.join(scratch, 'bench.adcpsession')
+
+    def save_session():
+        file_operations.write_session(gui, session_path)
+
+    def restore_session():
+        # Back to the plotted view without parsing anything
+        file_operations.restore_session(gui, session_path)
+        _wait(app, lambda: gui.loader is None)
+        if len(gui.parsed_data) != len(paths):
+            raise RuntimeError("Not every file was restored")
+
+    def export():
+        options = {'format': 'pdf', 'metadata_fields': list(METADATA_TABS), 'include_legend': True}
+        file_operations.start_export(gui, options, os.path.join(scratch, 'export.pdf'))
+        _wait(app, lambda: gui.export_job is None)
+
+    results = [
+        measure('confirm_selection (cold)', load_all, repeat, cold_cache),
+        measure('confirm_selection (cached)', load_all, repeat),
+        measure('plot_data', plot, repeat, select_collections),
+        measure(f'legend highlight x{HIGHLIGHT_CLICKS}', highlight, repeat),
+        measure('profile hover index', lambda: lookup(gui, 'profile', 0, 0), repeat, rebuild_hover_index),
+        measure(f'profile hover x{HOVER_LOOKUPS}', hover, repeat),
+        measure('metrics (all collections)', all_metrics, repeat, clear_metrics),
+        measure('fingerprints (all collections)', all_fingerprints, repeat, clear_fingerprints),
+        measure('export_selected (pdf)', export, repeat),
+        measure('save session', save_session, repeat),
+        measure('restore session', restore_session, repeat),
+    ]
+    gui.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Prints median ratios against the baseline; returns the regressed names
+    previous = {result['name']: result for result in baseline['results']}
+    if baseline.get('scale') != results.get('scale'):
+        print(f"Warning: baseline scale {baseline.get('scale')} differs from {results.get('scale')}")
+    regressions = []
+    print(f"\n{'benchmark':32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in results['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(result['name'])
+            flag = '  REGRESSION'
+        print(f"{result['name']:32} {before['median']:>9.3f}s {result['median']:>9.3f}s {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"Generating {args.files} x {args.collections} x {args.samples} in {args.data_dir}")
+    json_paths, adcp_paths = generate_dataset(args.data_dir, args.files, args.collections, args.samples, args.seed)
+
+    scratch = tempfile.mkdtemp(prefix='adcp-bench-')
+    try:
+        measured = run_startup(args.repeat)
+        measured += run_parsers(json_paths, adcp_paths, args.repeat)
+        measured += run_gui(json_paths, adcp_paths, args.repeat, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    commit, dirty = _git_commit()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': {'files': args.files, 'collections': args.collections, 'samples': args.samples, 'seed': args.seed},
+        'repeat': args.repeat,
+        'max_rss_bytes': _max_rss_bytes(),
+        'results': measured,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(commit or 'unknown')[:8]}.json")
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
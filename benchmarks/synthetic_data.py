@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+
+from backend.adcp_index import ADCP_METADATA_FIELDS
+
+# Synthetic unit data shaped like the field files: each file is one unit's
+# run of collections a few minutes apart around one site, each collection a
+# pressure profile that rises with depth, with noise and the occasional
+# rock strike spike. Scale is files x collections x samples.
+
+DEPTH_STEP = 0.8
+COLLECTION_INTERVAL_S = 300
+START_TIME = np.datetime64('2025-03-13T08:00:00', 's')
+
+
+def generate_collections(collections, samples, seed=0, unit_number=1):
+    # Returns flat depths/values with per-collection offsets and a list of
+    # metadata dicts, the same layout the parsers produce
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(max(1, samples * 3 // 4), samples * 5 // 4 + 1, collections)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    total = int(offsets[-1])
+
+    steps = rng.normal(DEPTH_STEP, 0.1, total).clip(0.2)
+    depths = np.cumsum(steps)
+    depths -= np.repeat(depths[offsets[:-1]], counts) - rng.uniform(0.3, 0.9, collections).repeat(counts)
+
+    rates = rng.uniform(5, 40, collections).repeat(counts)
+    increments = rates * steps * rng.uniform(0.2, 1.8, total)
+    spikes = rng.random(total) < 0.01
+    increments[spikes] += rng.uniform(100, 400, spikes.sum())
+    values = np.cumsum(increments)
+    values -= np.repeat(values[offsets[:-1]], counts)
+    values += rng.normal(38, 1, collections).repeat(counts)
+
+    site = rng.uniform([30, -100], [45, -75])
+    times = START_TIME + (np.arange(collections) * COLLECTION_INTERVAL_S).astype('m8[s]')
+    metadata = []
+    for number in range(collections):
+        moment = times[number].item()
+        metadata.append({
+            'latitude': round(float(site[0] + rng.normal(0, 0.002)), 6),
+            'longitude': round(float(site[1] + rng.normal(0, 0.002)), 6),
+            'altitude': round(float(rng.normal(320, 5)), 4),
+            'month': moment.month,
+            'day': moment.day,
+            'year': moment.year,
+            'hour': moment.hour,
+            'minute': moment.minute,
+            'second': moment.second,
+            'n_satellites': int(rng.integers(4, 13)),
+            'hdop_error': int(rng.integers(50, 120)),
+            'adcp_internal_temp_f': int(rng.integers(60, 100)),
+            'abort_status': int(rng.choice(3, p=[0.9, 0.05, 0.05])),
+            'unit_number': unit_number,
+            'actuator_absolute_position_error': int(rng.integers(-80, 80)),
+            'position_correction_count': int(rng.integers(0, 30)),
+        })
+    return depths, values, offsets, metadata
+
+
+def write_json(path, depths, values, offsets, metadata):
+    data = []
+    for number, fields in enumerate(metadata):
+        begin, end = offsets[number], offsets[number + 1]
+        entry = dict(fields, measurement_units="inches", vwc=18.0, b_horizon=-1.0, b_horizon_transition=-1.0)
+        entry['measurements'] = [{'depth': depth, 'value': value}
+                                 for depth, value in zip(depths[begin:end].tolist(), values[begin:end].tolist())]
+        data.append(entry)
+    with open(path, 'w') as file:
+        json.dump({'version': "1", 'data': data}, file)
+
+
+def write_adcp(path, depths, values, offsets, metadata):
+    rows = np.char.add(np.char.add(np.char.mod('%.6f', depths), '\t'), np.char.mod('%.6f', values))
+    with open(path, 'w') as file:
+        for number, fields in enumerate(metadata):
+            file.write("111111.000000\t111111.000000\n")
+            file.write('\n'.join(rows[offsets[number]:offsets[number + 1]]))
+            file.write("\n0.000000\t0.000000\n")
+            for first, second in zip(ADCP_METADATA_FIELDS[::2], ADCP_METADATA_FIELDS[1::2]):
+                file.write(f"{fields[first]:.6f}\t{fields[second]:.6f}\n")
+            # The unit writes one more single-value row before the terminator
+            file.write(f"{fields['position_correction_count']}\n")
+            file.write("999999.000000\t999999.000000\n")
+
+
+def generate_dataset(folder, files, collections, samples, seed=0):
+    # files JSON files and files .adcp files; existing ones of the same scale
+    # are reused. Returns (json paths, adcp paths).
+    os.makedirs(folder, exist_ok=True)
+    json_paths, adcp_paths = [], []
+    for number in range(files):
+        stem = os.path.join(folder, f"unit{number + 1:02d}_{collections}x{samples}_s{seed}")
+        json_path, adcp_path = stem + '.json', stem + '.adcp'
+        if not (os.path.exists(json_path) and os.path.exists(adcp_path)):
+            generated = generate_collections(collections, samples, seed + number, unit_number=number + 1)
+            write_json(json_path, *generated)
+            write_adcp(adcp_path, *generated)
+        json_paths.append(json_path)
+        adcp_paths.append(adcp_path)
+    return json_paths, adcp_paths
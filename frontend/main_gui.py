@@ -1,3 +1,9 @@
+import time
+
+# Taken first so --startup-timing can count the module imports
+_module_started = time.perf_counter()
+
+import multiprocessing
 import sys
 import os
 
@@ -13,16 +19,22 @@ if backend_path not in sys.path:
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (
     QAbstractItemView,
-    QApplication, QWidget, QVBoxLayout, QPushButton, QListWidget, QHBoxLayout, QSplitter, QTabWidget,
-    QRadioButton, QCheckBox, QDialog, QDialogButtonBox, QLabel, QButtonGroup, QTextEdit
+    QApplication, QWidget, QVBoxLayout, QPushButton, QListView, QListWidget, QHBoxLayout, QSplitter, QTabWidget,
+    QRadioButton, QCheckBox, QDialog, QDialogButtonBox, QLabel, QButtonGroup, QTextEdit, QLineEdit, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QSpinBox
 )
-from PyQt5.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+from PyQt5.QtCore import Qt, QTimer
 
+# matplotlib and the plotting, loading and export modules are imported in
+# ADCPlotterGUI.finish_startup, after the window is on screen
+from backend.dedup import DuplicateIndex
+from backend.list_models import CollectionListModel, FileListModel
+from backend.parsed_data import ParsedData
+from backend import tracing
 
-from backend.file_operations import load_files, clear_selection, select_all, select_none, confirm_selection, export_selected
-from backend.plot_operations import plot_data
+METADATA_FIELDS = ['latlong', 'timestamp', 'abort_status', 'actuator_error', 'temperature']
+# Tabs under the profile plot: the metadata fields, then derived metrics
+PLOT_TABS = METADATA_FIELDS + ['metrics']
 
 
 def get_base_dir():
@@ -44,17 +56,19 @@ class ExportDialog(QDialog):
         self.format_group = QButtonGroup(self)
         self.png_radio = QRadioButton("Export as PNG files")
         self.pdf_radio = QRadioButton("Export as a combined PDF")
+        self.csv_radio = QRadioButton("Export metrics as CSV")
         self.format_group.addButton(self.png_radio)
         self.format_group.addButton(self.pdf_radio)
+        self.format_group.addButton(self.csv_radio)
         self.pdf_radio.setChecked(True)
         layout.addWidget(self.png_radio)
         layout.addWidget(self.pdf_radio)
+        layout.addWidget(self.csv_radio)
 
         # Metadata field checkboxes
         layout.addWidget(QLabel("Include metadata plots:"))
         self.checkboxes = {}
-        fields = ['latlong', 'timestamp', 'abort_status', 'actuator_error', 'temperature']
-        for field in fields:
+        for field in METADATA_FIELDS:
             checkbox = QCheckBox(field.replace('_', ' ').title())
             checkbox.setChecked(True)
             self.checkboxes[field] = checkbox
@@ -65,6 +79,11 @@ class ExportDialog(QDialog):
         self.include_legend_checkbox.setChecked(True)
         layout.addWidget(self.include_legend_checkbox)
 
+        # PDF pages are vector graphics unless rendered to images in parallel
+        self.raster_pdf_checkbox = QCheckBox("Render PDF pages as images (faster)")
+        self.pdf_radio.toggled.connect(self.raster_pdf_checkbox.setEnabled)
+        layout.addWidget(self.raster_pdf_checkbox)
+
         # Dialog buttons
         self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -75,14 +94,115 @@ class ExportDialog(QDialog):
 
     def get_options(self):
         return {
-            'format': 'pdf' if self.pdf_radio.isChecked() else 'png',
+            'format': 'csv' if self.csv_radio.isChecked() else 'pdf' if self.pdf_radio.isChecked() else 'png',
             'metadata_fields': [key for key, cb in self.checkboxes.items() if cb.isChecked()],
-            'include_legend': self.include_legend_checkbox.isChecked()
+            'include_legend': self.include_legend_checkbox.isChecked(),
+            'raster_pdf': self.raster_pdf_checkbox.isChecked()
         }
 
 
+class PerformancePanel(QDialog):
+    # Recent tracing spans, newest first, refreshed while the panel is open
+    REFRESH_MS = 1000
+    ROWS = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Performance")
+        self.resize(700, 450)
+        self.shown_count = -1
+
+        layout = QVBoxLayout()
+        self.record_checkbox = QCheckBox("Record timings")
+        self.record_checkbox.setChecked(tracing.is_enabled())
+        self.record_checkbox.toggled.connect(tracing.set_enabled)
+        layout.addWidget(self.record_checkbox)
+
+        # Selections above either count are drawn decimated
+        from backend.plot_operations import lod_thresholds
+        lines, points = lod_thresholds()
+        lod_layout = QHBoxLayout()
+        self.lod_lines_spin = QSpinBox()
+        self.lod_lines_spin.setRange(0, 1_000_000)
+        self.lod_lines_spin.setValue(lines)
+        self.lod_points_spin = QSpinBox()
+        self.lod_points_spin.setRange(0, 1_000_000_000)
+        self.lod_points_spin.setSingleStep(10_000)
+        self.lod_points_spin.setValue(points)
+        lod_layout.addWidget(QLabel("Decimate above"))
+        lod_layout.addWidget(self.lod_lines_spin)
+        lod_layout.addWidget(QLabel("lines or"))
+        lod_layout.addWidget(self.lod_points_spin)
+        lod_layout.addWidget(QLabel("points"))
+        lod_layout.addStretch()
+        self.lod_lines_spin.editingFinished.connect(self.update_lod_thresholds)
+        self.lod_points_spin.editingFinished.connect(self.update_lod_thresholds)
+        layout.addLayout(lod_layout)
+
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Span", "Time (ms)", "Thread", "Details"])
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.clear_button = QPushButton("Clear")
+        self.clear_button.clicked.connect(self.clear)
+        self.save_button = QPushButton("Save Trace...")
+        self.save_button.clicked.connect(self.save_trace)
+        buttons.addWidget(self.clear_button)
+        buttons.addWidget(self.save_button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(self.REFRESH_MS)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        if tracing.recorded_count() == self.shown_count:
+            return
+        self.shown_count = tracing.recorded_count()
+        spans = tracing.recent_spans(self.ROWS)[::-1]
+        self.table.setRowCount(len(spans))
+        for row, entry in enumerate(spans):
+            details = ", ".join(f"{key}={value}" for key, value in entry['args'].items())
+            cells = ["  " * entry['depth'] + entry['name'], f"{entry['duration'] / 1e6:.1f}", entry['thread'], details]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column == 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def update_lod_thresholds(self):
+        from backend.plot_operations import set_lod_thresholds
+        set_lod_thresholds(self.parent(), self.lod_lines_spin.value(), self.lod_points_spin.value())
+
+    def clear(self):
+        tracing.clear()
+        self.table.setRowCount(0)
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "adcp-trace.json", "Trace Files (*.json)")
+        if path:
+            count = tracing.dump_trace(path)
+            print(f"Saved {count} trace events to {path}")
+
+
 class ADCPlotterGUI(QWidget):
-    def __init__(self):
+    @tracing.traced('app.build_window')
+    def __init__(self, deferred=False):
+        # deferred leaves the plot canvas and button actions to a later
+        # finish_startup() call, so the window can be shown first
         super().__init__()
         self.setWindowTitle("ADCP Plotter")
         self.setGeometry(100, 100, 1200, 700)
@@ -99,9 +219,27 @@ class ADCPlotterGUI(QWidget):
             self.setWindowIcon(QIcon(icon_path))
 
         self.file_paths = {}
-        self.parsed_data = {}
+        self.parsed_data = ParsedData(os.path.join(get_base_dir(), 'spill'))
+        self.loader = None
+        self.load_progress = None
+        self.metadata_index = None
+        self.export_job = None
+        self.export_progress = None
+        self.folder_watcher = None
+        self.watch_timer = None
+        self.watch_loader = None
+        self.watch_pending = False
         self.metadata_keys_to_plot = []
         self.active_metadata_tab = 'latlong'
+        self.aggregate_by = None
+        self.metric_spec = None
+        self.metric_axis = None
+        self.duplicates = DuplicateIndex()
+        self.fingerprint_jobs = None
+        self.unique_only = False
+        self.unique_view_pending = False
+        self.hovers = {}
+        self.started = False
 
         self.layout = QHBoxLayout()
         self.splitter = QSplitter(Qt.Horizontal)
@@ -109,24 +247,32 @@ class ADCPlotterGUI(QWidget):
         # Left panel: file controls
         self.left_panel = QVBoxLayout()
         self.load_btn = QPushButton("Load Files")
-        self.load_btn.clicked.connect(lambda: load_files(self))
+        self.watch_checkbox = QCheckBox("Watch Data Folder")
         self.clear_btn = QPushButton("Clear Loaded Files")
-        self.clear_btn.clicked.connect(lambda: clear_selection(self))
+        self.save_session_btn = QPushButton("Save Session")
+        self.open_session_btn = QPushButton("Open Session")
         self.select_all_btn = QPushButton("Select All")
-        self.select_all_btn.clicked.connect(lambda: select_all(self))
         self.select_none_btn = QPushButton("Select None")
-        self.select_none_btn.clicked.connect(lambda: select_none(self))
         self.confirm_button = QPushButton("Confirm Selection")
-        self.confirm_button.clicked.connect(lambda: confirm_selection(self))
 
-        self.file_list = QListWidget()
-        self.file_list.setSelectionMode(QListWidget.MultiSelection)
+        self.file_model = FileListModel(self)
+        self.file_list = QListView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.memory_status = QLabel()
+        self.memory_status.setWordWrap(True)
+        self.parsed_data.on_change = lambda: self.memory_status.setText(self.parsed_data.summary())
+        self.parsed_data.on_change()
 
         self.left_panel.addWidget(self.load_btn)
+        self.left_panel.addWidget(self.watch_checkbox)
         self.left_panel.addWidget(self.clear_btn)
+        self.left_panel.addWidget(self.save_session_btn)
+        self.left_panel.addWidget(self.open_session_btn)
         self.left_panel.addWidget(self.select_all_btn)
         self.left_panel.addWidget(self.select_none_btn)
         self.left_panel.addWidget(self.file_list)
+        self.left_panel.addWidget(self.memory_status)
         self.left_panel.addWidget(self.confirm_button)
 
         left_widget = QWidget()
@@ -134,45 +280,62 @@ class ADCPlotterGUI(QWidget):
 
         # Center panel: collection and plot controls
         self.center_panel = QVBoxLayout()
-        self.collection_list = QListWidget()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("Filter, e.g. timestamp >= 2024-06-01; abort_status == 0")
+        self.query_status = QLabel()
+        # Hides later copies of collections loaded from more than one file
+        self.unique_checkbox = QCheckBox("Show Unique Only")
+        self.collection_model = CollectionListModel(self)
+        self.collection_list = QListView()
+        self.collection_list.setModel(self.collection_model)
         self.collection_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.collection_list.setUniformItemSizes(True)
+        self.aggregate_combo = QComboBox()
+        self.aggregate_combo.addItem("Individual profiles", None)
+        self.aggregate_combo.addItem("Aggregate by file", 'file')
+        self.aggregate_combo.addItem("Aggregate by unit", 'unit_number')
+        self.aggregate_combo.addItem("Aggregate by day", 'day')
         self.plot_button = QPushButton("Plot Selected Data")
-        self.plot_button.clicked.connect(lambda: plot_data(self))
         self.export_button = QPushButton("Export")
-        self.export_button.clicked.connect(self.show_export_dialog)
+        self.performance_panel = None
+        self.performance_button = QPushButton("Performance")
+        self.performance_button.clicked.connect(self.show_performance_panel)
 
+        self.center_panel.addWidget(self.query_edit)
+        self.center_panel.addWidget(self.query_status)
+        self.center_panel.addWidget(self.unique_checkbox)
         self.center_panel.addWidget(self.collection_list)
+        self.center_panel.addWidget(self.aggregate_combo)
         self.center_panel.addWidget(self.plot_button)
         self.center_panel.addWidget(self.export_button)
+        self.center_panel.addWidget(self.performance_button)
 
         center_widget = QWidget()
         center_widget.setLayout(self.center_panel)
 
-        # Right panel: profile plot and metadata tabs
+        # Right panel: profile plot and metadata tabs. The profile canvas is
+        # added by finish_startup; metadata canvases when their tab is first
+        # drawn (see metadata_canvas).
         self.right_panel = QVBoxLayout()
-        self.profile_figure = Figure(constrained_layout=True)
-        self.profile_canvas = FigureCanvas(self.profile_figure)
-        self.profile_canvas.setMinimumHeight(300)
-
         self.metadata_tabs = QTabWidget()
         self.metadata_canvases = {}
-        metadata_fields = ['latlong', 'timestamp', 'abort_status', 'actuator_error', 'temperature']
-
-        for field in metadata_fields:
-            fig = Figure(constrained_layout=True)
-            canvas = FigureCanvas(fig)
-            self.metadata_canvases[field] = canvas
+        for field in PLOT_TABS:
             tab = QWidget()
-            layout = QVBoxLayout()
-            layout.addWidget(canvas)
-            tab.setLayout(layout)
+            tab.setLayout(QVBoxLayout())
             self.metadata_tabs.addTab(tab, field.replace('_', ' ').title())
-
-        self.metadata_tabs.currentChanged.connect(self.update_active_tab)
-
-        self.right_panel.addWidget(self.profile_canvas)
         self.right_panel.addWidget(self.metadata_tabs)
 
+        # Metrics tab: which metric to plot and against what; the choices are
+        # filled in by finish_startup
+        self.metric_combo = QComboBox()
+        self.metric_axis_combo = QComboBox()
+        metric_controls = QHBoxLayout()
+        metric_controls.addWidget(QLabel("Metric:"))
+        metric_controls.addWidget(self.metric_combo, 1)
+        metric_controls.addWidget(QLabel("Against:"))
+        metric_controls.addWidget(self.metric_axis_combo)
+        self.metadata_tabs.widget(PLOT_TABS.index('metrics')).layout().addLayout(metric_controls)
+
         right_widget = QWidget()
         right_widget.setLayout(self.right_panel)
 
@@ -201,9 +364,104 @@ class ADCPlotterGUI(QWidget):
         self.layout.addWidget(self.splitter)
         self.setLayout(self.layout)
 
+        if not deferred:
+            self.finish_startup()
+
+    @tracing.traced('app.finish_startup')
+    def finish_startup(self, timer=None):
+        # Imports matplotlib and the backend, adds the profile canvas and
+        # connects the controls. Input that arrived in the meantime is
+        # handled after this returns, so no click is lost.
+        if self.started:
+            return
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT
+        from matplotlib.figure import Figure
+        if timer is not None:
+            timer.mark("matplotlib")
+        from backend.file_operations import (
+            clear_selection, confirm_selection, load_files, open_session, save_session, select_all, select_matching,
+            select_none, set_unique_only
+        )
+        from backend.folder_watch import toggle_watching
+        from backend.metrics import METRIC_AXES, metric_label, metric_specs
+        from backend.plot_operations import plot_data, reset_plot_state
+        if timer is not None:
+            timer.mark("backend modules")
+
+        reset_plot_state(self)
+        self.profile_figure = Figure(constrained_layout=True)
+        self.profile_canvas = FigureCanvas(self.profile_figure)
+        self.profile_canvas.setMinimumHeight(300)
+        self.profile_toolbar = NavigationToolbar2QT(self.profile_canvas, self)
+        self.right_panel.insertWidget(0, self.profile_toolbar)
+        self.right_panel.insertWidget(1, self.profile_canvas)
+        for spec in metric_specs():
+            self.metric_combo.addItem(metric_label(spec), spec)
+        self.metric_axis_combo.addItem("Collection", None)
+        for field, label in METRIC_AXES.items():
+            self.metric_axis_combo.addItem(label, field)
+        self.metric_spec = self.metric_combo.currentData()
+
+        self.load_btn.clicked.connect(lambda: load_files(self))
+        self.watch_checkbox.toggled.connect(lambda enabled: toggle_watching(self, enabled))
+        self.clear_btn.clicked.connect(lambda: clear_selection(self))
+        self.save_session_btn.clicked.connect(lambda: save_session(self))
+        self.open_session_btn.clicked.connect(lambda: open_session(self))
+        self.select_all_btn.clicked.connect(lambda: select_all(self))
+        self.select_none_btn.clicked.connect(lambda: select_none(self))
+        self.confirm_button.clicked.connect(lambda: confirm_selection(self))
+        self.query_edit.returnPressed.connect(lambda: select_matching(self))
+        self.unique_checkbox.toggled.connect(lambda enabled: set_unique_only(self, enabled))
+        self.aggregate_combo.currentIndexChanged.connect(self.update_aggregate_mode)
+        self.plot_button.clicked.connect(lambda: plot_data(self))
+        self.export_button.clicked.connect(self.show_export_dialog)
+        self.metadata_tabs.currentChanged.connect(self.update_active_tab)
+        self.metric_combo.currentIndexChanged.connect(self.update_metric)
+        self.metric_axis_combo.currentIndexChanged.connect(self.update_metric)
+        self.started = True
+        if timer is not None:
+            timer.mark("plot canvas")
+
+    def metadata_canvas(self, field):
+        # Built the first time the tab is drawn
+        canvas = self.metadata_canvases.get(field)
+        if canvas is None:
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT
+            from matplotlib.figure import Figure
+            canvas = FigureCanvas(Figure(constrained_layout=True))
+            tab = self.metadata_tabs.widget(PLOT_TABS.index(field))
+            if field == 'latlong':
+                # Zooming in swaps binned density for individual points
+                tab.layout().addWidget(NavigationToolbar2QT(canvas, tab))
+            tab.layout().addWidget(canvas)
+            self.metadata_canvases[field] = canvas
+        return canvas
+
     def update_active_tab(self):
-        index = self.metadata_tabs.currentIndex()
-        self.active_metadata_tab = list(self.metadata_canvases.keys())[index]
+        from backend.plot_operations import render_metadata_tab
+        self.active_metadata_tab = PLOT_TABS[self.metadata_tabs.currentIndex()]
+        render_metadata_tab(self, self.active_metadata_tab)
+
+    def show_metadata_tab(self, field):
+        if field in PLOT_TABS:
+            self.metadata_tabs.setCurrentIndex(PLOT_TABS.index(field))
+
+    def update_metric(self):
+        from backend.plot_operations import rerender_metrics
+        self.metric_spec = self.metric_combo.currentData()
+        self.metric_axis = self.metric_axis_combo.currentData()
+        rerender_metrics(self)
+
+    def update_aggregate_mode(self):
+        from backend.plot_operations import plot_data
+        self.aggregate_by = self.aggregate_combo.currentData()
+        plot_data(self)
+
+    def show_performance_panel(self):
+        if self.performance_panel is None:
+            self.performance_panel = PerformancePanel(self)
+        self.performance_panel.show()
+        self.performance_panel.raise_()
 
     def show_export_dialog(self):
         dialog = ExportDialog(self)
@@ -214,17 +472,66 @@ class ADCPlotterGUI(QWidget):
             export_selected(self, options)
 
 
+class StartupTimer:
+    # --startup-timing: times each startup phase, prints them once the
+    # window is ready and quits
+    def __init__(self, started):
+        self.started = self.last = started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        for phase, seconds in self.phases:
+            print(f"{phase:20} {seconds * 1000:8.1f} ms")
+        print(f"{'total':20} {(self.last - self.started) * 1000:8.1f} ms")
+
+
+def finish_startup(gui, timer, session=None):
+    if timer is not None:
+        timer.mark("first paint")
+    try:
+        gui.finish_startup(timer)
+    except Exception as e:
+        print(f"GUI creation failed: {e}")
+        QApplication.instance().exit(1)
+        return
+    if timer is not None:
+        timer.report()
+        QApplication.instance().quit()
+        return
+    if session is not None:
+        from backend.file_operations import restore_session
+        restore_session(gui, session)
+
+
 if __name__ == "__main__":
+    # Needed for the loader's worker processes in frozen builds
+    multiprocessing.freeze_support()
+    timer = StartupTimer(_module_started) if '--startup-timing' in sys.argv else None
+    # A session snapshot given on the command line is opened right away
+    session = next((arg for arg in sys.argv[1:] if arg.endswith('.adcpsession')), None)
+    if timer is not None:
+        timer.mark("imports")
     app = QApplication(sys.argv)
 
     import qdarkstyle
     app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
+    if timer is not None:
+        timer.mark("Qt and style")
 
     try:
-        gui = ADCPlotterGUI()
+        gui = ADCPlotterGUI(deferred=True)
     except Exception as e:
         print(f"GUI creation failed: {e}")
         sys.exit(1)
 
     gui.showMaximized()
+    if timer is not None:
+        timer.mark("window")
+    # Runs once the shown window has been painted
+    QTimer.singleShot(0, lambda: finish_startup(gui, timer, session))
     sys.exit(app.exec_())
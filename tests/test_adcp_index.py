@@ -0,0 +1,99 @@
+# tests/test_adcp_index.py
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.adcp_index import INDEX_SUFFIX, AdcpIndex, get_index
+from backend.collection_store import readable_measurements
+from backend.data_parsing import load_adcp, open_adcp
+
+def test_index_random_access():
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "unit.adcp")
+        shutil.copy("data/ADCP24_test.adcp", filepath)
+
+        eager = load_adcp(filepath)
+        lazy = open_adcp(filepath)
+        assert os.path.exists(filepath + INDEX_SUFFIX)
+        assert len(lazy) == len(eager)
+        assert np.array_equal(lazy.offsets, eager.offsets)
+        for i in (0, 5, len(eager) - 1):
+            assert np.array_equal(lazy.measurements(i)[0], eager.measurements(i)[0])
+            assert np.array_equal(lazy.measurements(i)[1], eager.measurements(i)[1])
+            assert lazy.metadata_dict(i) == eager.metadata_dict(i)
+
+def test_index_invalidated_on_append():
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "unit.adcp")
+        with open("data/ADCP24_test.adcp", 'rb') as source:
+            lines = source.readlines()
+        with open(filepath, 'wb') as file:
+            file.writelines(lines[:121])
+
+        assert len(get_index(filepath)) == 2
+        with open(filepath, 'ab') as file:
+            file.writelines(lines[121:])
+        assert len(get_index(filepath)) == len(load_adcp("data/ADCP24_test.adcp"))
+
+def test_appended_tail_matches_full_parse():
+    with open("data/ADCP24_test.adcp", 'rb') as source:
+        content = source.read()
+    full = AdcpIndex.from_buffer(content)
+    # Cut at collection boundaries, mid-collection and mid-row
+    for cut in (0, 700, content.index(b'999999.', 3000) + 3, len(content) // 2, len(content) - 1):
+        partial = AdcpIndex.from_buffer(content[:cut])
+        assert partial.can_extend(content)
+        grown = partial.extended(content)
+        assert np.array_equal(grown.begin, full.begin)
+        assert np.array_equal(grown.end, full.end)
+        assert np.array_equal(grown.counts, full.counts)
+        assert grown.metadata.tobytes() == full.metadata.tobytes()
+        assert grown.tail == full.tail and grown.size == full.size
+
+    # A rewritten file can't be extended
+    rewritten = content[:1000] + content[1010:] + content[-600:]
+    assert not full.can_extend(rewritten)
+
+def test_unterminated_last_row_taken_out_of_order():
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "unit.adcp")
+        with open("data/ADCP24_test.adcp", 'rb') as source:
+            lines = source.readlines()
+        # A file still being written, cut after a measurement row's last digit
+        with open(filepath, 'wb') as file:
+            file.writelines(lines[:130])
+            file.write(lines[130].rstrip())
+
+        store = open_adcp(filepath)
+        last = len(store) - 1
+        depths, values = store.take([last, 0])
+        count = store.offsets[last + 1] - store.offsets[last]
+        assert np.array_equal(depths[:count], store.measurements(last)[0])
+        assert np.array_equal(values[count:], store.measurements(0)[1])
+
+def test_changed_or_missing_source_is_skipped():
+    with tempfile.TemporaryDirectory() as folder:
+        rewritten, removed = os.path.join(folder, "rewritten.adcp"), os.path.join(folder, "removed.adcp")
+        for filepath in (rewritten, removed):
+            shutil.copy("data/ADCP24_test.adcp", filepath)
+        eager = load_adcp("data/ADCP24_test.adcp")
+        stores = [open_adcp(rewritten), open_adcp(removed), eager]
+        with open(rewritten, 'ab') as file:
+            file.write(b'\n')
+        os.remove(removed)
+
+        measurements, readable = readable_measurements([(store, 1) for store in stores])
+        assert readable == [2]
+        assert np.array_equal(measurements[0][1], eager.measurements(1)[1])
+
+if __name__ == "__main__":
+    test_index_random_access()
+    test_index_invalidated_on_append()
+    test_appended_tail_matches_full_parse()
+    test_changed_or_missing_source_is_skipped()
@@ -28,5 +28,31 @@ def test_load_adcp():
     else:
         print("Failed to load ADCP file.")
 
+def test_load_adcp_matches_line_parse():
+    filepath = "data/ADCP24_test.adcp"
+
+    # Reference: walk the file line by line
+    expected = []
+    with open(filepath, 'r') as file:
+        rows = [line.split() for line in file]
+    for i, row in enumerate(rows):
+        if row[0].startswith('111111'):
+            end = i + 1
+            while not rows[end][0].startswith('999999'):
+                end += 1
+            expected.append((rows[i + 1:end - 10], rows[end - 9]))
+
+    collections = load_adcp(filepath)
+    assert len(collections) == len(expected)
+    for i, (measurements, position) in enumerate(expected):
+        depths, values = collections.measurements(i)
+        assert list(depths) == [float(row[0]) for row in measurements]
+        assert list(values) == [float(row[1]) for row in measurements]
+        assert collections[i]["metadata"]["latitude"] == float(position[0])
+        assert collections[i]["metadata"]["longitude"] == float(position[1])
+
+    assert len(load_adcp(filepath, limit=4)) == 4
+
 if __name__ == "__main__":
     test_load_adcp()
+    test_load_adcp_matches_line_parse()
@@ -0,0 +1,51 @@
+# tests/test_aggregation.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.aggregation import depth_grid, group_profiles, resample_profiles, summarize
+from backend.collection_store import empty_metadata
+from backend.data_parsing import load_json
+
+def test_resample_matches_interp():
+    store = load_json("data/EXAMPLE_adcp_eo.json")
+    grid = depth_grid(store.depths)
+    matrix = resample_profiles(store.depths, store.values, store.offsets, grid)
+    assert matrix.shape == (len(store), len(grid))
+    for i in range(len(store)):
+        depths, values = store.measurements(i)
+        order = np.argsort(depths, kind='stable')
+        expected = np.interp(grid, depths[order], values[order], left=np.nan, right=np.nan)
+        assert np.allclose(matrix[i], expected, equal_nan=True)
+
+def test_unsorted_and_degenerate_profiles():
+    depths = np.array([2.0, 0.0, 1.0, 5.0, np.nan, 3.0])
+    values = np.array([20.0, 0.0, 10.0, 7.0, 1.0, 9.0])
+    offsets = np.array([0, 3, 4, 4, 6])
+    matrix = resample_profiles(depths, values, offsets, np.array([0.0, 0.5, 2.0, 3.0, 5.0]))
+    assert np.allclose(matrix[0], [0, 5, 20, np.nan, np.nan], equal_nan=True)
+    assert np.allclose(matrix[1], [np.nan, np.nan, np.nan, np.nan, 7], equal_nan=True)
+    assert np.isnan(matrix[2]).all()
+    assert np.allclose(matrix[3], [np.nan, np.nan, np.nan, 9, np.nan], equal_nan=True)
+
+def test_group_summaries():
+    metadata = empty_metadata(4)
+    metadata['unit_number'] = [7, 3, 7, np.nan]
+    metadata['timestamp'] = np.array(['2024-06-02T10:00', '2024-06-01T09:00', '2024-06-02T23:00', 'NaT'], dtype='M8[s]')
+    keys = [("b.json", 0), ("a.json", 0), ("b.json", 1), ("a.json", 1)]
+
+    groups, labels = group_profiles(keys, metadata, 'unit_number')
+    assert labels == ["Unit 7", "Unit 3", "Unknown unit"]
+    assert list(groups) == [0, 1, 0, 2]
+    assert group_profiles(keys, metadata, 'day')[1] == ["2024-06-02", "2024-06-01", "Unknown day"]
+    assert group_profiles(keys, metadata, 'file')[1] == ["b.json", "a.json"]
+
+    matrix = np.array([[1.0, 2.0], [3.0, np.nan], [5.0, 6.0], [7.0, 8.0]])
+    summary = summarize(matrix, groups, len(labels))
+    assert summary[0]['count'] == 2
+    assert np.allclose(summary[0]['mean'], [3, 4]) and np.allclose(summary[0]['median'], [3, 4])
+    assert np.allclose(summary[1]['median'], [3, np.nan], equal_nan=True)
@@ -0,0 +1,38 @@
+# tests/test_batch_render.py
+import sys
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.batch_render import collect_files, main
+from backend.metadata_query import MetadataIndex, parse_filter
+from backend.data_parsing import load_json
+
+def test_filters():
+    store = load_json("data/EXAMPLE_adcp_eo.json")
+    filters = [parse_filter("abort_status == 0"), parse_filter("timestamp >= 2000-01-01")]
+    mask = MetadataIndex(store.metadata).mask(filters)
+    expected = (store.metadata['abort_status'] == 0) & ~np.isnat(store.metadata['timestamp'])
+    assert np.array_equal(mask, expected)
+    try:
+        parse_filter("depth ~ 3")
+        assert False
+    except ValueError:
+        pass
+
+def test_renders_reports_without_qt():
+    assert collect_files(["data"]) == sorted(os.path.abspath(os.path.join("data", name))
+                                             for name in ("ADCP24_test.adcp", "EXAMPLE_adcp_eo.json"))
+    with tempfile.TemporaryDirectory() as folder:
+        assert main(["data/*.json", "-o", folder, "-f", "png", "--fields", "latlong", "-j", "1"]) == 0
+        assert sorted(os.listdir(folder)) == [
+            "EXAMPLE_adcp_eo_latlong.png", "EXAMPLE_adcp_eo_legend.png", "EXAMPLE_adcp_eo_profile.png"]
+
+    imported = subprocess.run([sys.executable, "-c", "import sys, backend.batch_render; print('PyQt5' in sys.modules)"],
+                              capture_output=True, text=True, check=True)
+    assert imported.stdout.strip() == "False"
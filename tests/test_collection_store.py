@@ -0,0 +1,62 @@
+# tests/test_collection_store.py
+import sys
+import os
+import json
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.collection_store import CollectionStore, load_store, save_store
+from backend.data_parsing import load_json
+
+def test_store_matches_json():
+    filepath = "data/EXAMPLE_adcp_eo.json"
+
+    with open(filepath, 'r') as file:
+        entries = json.load(file)['data']
+
+    store = load_json(filepath)
+    assert len(store) == len(entries)
+    assert store.offsets[-1] == len(store.depths) == len(store.values)
+
+    for i, entry in enumerate(entries):
+        depths, values = store.measurements(i)
+        assert np.array_equal(depths, [point['depth'] for point in entry['measurements']])
+        assert np.array_equal(values, [point['value'] for point in entry['measurements']])
+        assert store.metadata_dict(i) == {k: v for k, v in entry.items() if k != 'measurements'}
+
+    first = entries[0]
+    expected = np.datetime64(f"{first['year']:04d}-{first['month']:02d}-{first['day']:02d}T"
+                             f"{first['hour']:02d}:{first['minute']:02d}:{first['second']:02d}")
+    assert store.metadata['timestamp'][0] == expected
+
+def test_store_handles_missing_and_unknown_fields():
+    store = CollectionStore.from_collections([
+        {'measurements': [{'depth': 1.0, 'value': 2.0}], 'metadata': {'unit_number': 3, 'note': 'x'}},
+        {'measurements': [], 'metadata': {'latitude': None, 'vwc': 'n/a'}},
+    ])
+    assert len(store) == 2
+    assert store.metadata_dict(0) == {'unit_number': 3.0, 'note': 'x'}
+    assert store.metadata_dict(1) == {'vwc': 'n/a'}
+    assert len(store.measurements(1)[0]) == 0
+    assert np.isnat(store.metadata['timestamp']).all()
+
+def test_store_round_trips_through_mapped_files():
+    store = CollectionStore.from_collections([
+        {'measurements': [{'depth': 1.0, 'value': 2.0}, {'depth': 3.0, 'value': 4.0}], 'metadata': {'year': 2025, 'extra': [1, 2]}},
+    ])
+    with tempfile.TemporaryDirectory() as folder:
+        save_store(store, folder)
+        loaded = load_store(folder)
+        assert isinstance(loaded.depths, np.memmap)
+        assert np.array_equal(loaded.measurements(0)[1], [2.0, 4.0])
+        assert loaded.metadata_dict(0) == store.metadata_dict(0)
+        del loaded
+
+if __name__ == "__main__":
+    test_store_matches_json()
+    test_store_handles_missing_and_unknown_fields()
+    test_store_round_trips_through_mapped_files()
@@ -0,0 +1,53 @@
+# tests/test_decimation.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.decimation import m4_decimate
+
+def test_m4_keeps_column_extremes_per_profile():
+    rng = np.random.default_rng(0)
+    counts = [5000, 1, 3000]
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    x = np.concatenate([np.sort(rng.uniform(0, 20, n)) for n in counts])
+    y = rng.normal(size=len(x))
+
+    kept, kept_offsets = m4_decimate(x, y, offsets, (0, 20), 100)
+    assert len(kept) < len(x) // 5
+    assert kept_offsets[0] == 0 and kept_offsets[-1] == len(kept)
+
+    for profile in range(len(counts)):
+        begin, end = offsets[profile], offsets[profile + 1]
+        subset = kept[kept_offsets[profile]:kept_offsets[profile + 1]]
+        assert np.all((subset >= begin) & (subset < end))
+        # Endpoints and the extremes of every column survive
+        assert subset[0] == begin and subset[-1] == end - 1
+        columns = np.floor(x[begin:end] / 0.2).astype(int)
+        for column in np.unique(columns):
+            members = np.flatnonzero(columns == column) + begin
+            assert members[np.argmax(y[members])] in subset
+            assert members[np.argmin(y[members])] in subset
+
+def test_m4_collapses_points_outside_view():
+    x = np.linspace(0, 100, 10000)
+    y = np.sin(x)
+    kept, _ = m4_decimate(x, y, np.array([0, len(x)]), (40, 50), 50)
+    inside = (x[kept] >= 40) & (x[kept] <= 50)
+    assert (~inside).sum() <= 8
+
+def test_m4_reduces_flat_runs():
+    x = np.linspace(0, 10, 10000)
+    y = np.round(np.sin(x))
+    y[:2000] = 0.0
+    kept, _ = m4_decimate(x, y, np.array([0, len(x)]), (0, 10), 100)
+    assert len(kept) <= 4 * 100
+    # Every column is still drawn between its extremes
+    columns = np.floor(x[kept] * 10).clip(0, 99)
+    for column in range(100):
+        members = np.flatnonzero(np.floor(x * 10).clip(0, 99) == column)
+        assert y[kept][columns == column].min() == y[members].min()
+        assert y[kept][columns == column].max() == y[members].max()
@@ -0,0 +1,90 @@
+# tests/test_dedup.py
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.adcp_index import INDEX_SUFFIX, AdcpIndex
+from backend.collection_store import CollectionStore, empty_metadata
+from backend.data_parsing import open_adcp
+from backend.dedup import DuplicateIndex, SharedStore, fingerprints, share_measurements
+from benchmarks.synthetic_data import generate_collections, write_adcp
+
+def make_store(first, last, seed=0):
+    # Collections first..last-1 of one generated dataset
+    depths, values, offsets, fields = generate_collections(10, 30, seed=seed)
+    metadata = empty_metadata(last - first)
+    for name in ['unit_number', 'year', 'month', 'day', 'hour', 'minute', 'second']:
+        metadata[name] = [fields[index][name] for index in range(first, last)]
+    start, end = offsets[first], offsets[last]
+    return CollectionStore(depths[start:end], values[start:end], offsets[first:last + 1] - start, metadata)
+
+def test_fingerprints_cover_measurements_and_key_metadata():
+    weekly, daily = make_store(0, 10), make_store(4, 7)
+    assert list(fingerprints(daily)) == list(fingerprints(weekly)[4:7])
+    assert len(set(fingerprints(weekly).tolist())) == 10
+
+    changed = make_store(4, 7)
+    changed.metadata['unit_number'][0] += 1
+    changed.values = changed.values.copy()
+    changed.values[-1] += 1
+    assert list(fingerprints(changed) == fingerprints(daily)) == [False, True, False]
+
+def test_duplicate_index():
+    duplicates = DuplicateIndex()
+    duplicates.add('weekly.json', fingerprints(make_store(0, 10)))
+    duplicates.add('daily.json', fingerprints(make_store(4, 7)))
+    duplicates.add('other.json', fingerprints(make_store(0, 2, seed=1)))
+    assert duplicates.covered('daily.json')
+    assert not duplicates.covered('weekly.json') and not duplicates.covered('other.json')
+    assert duplicates.sources('daily.json', 1) == [('weekly.json', 5), ('daily.json', 1)]
+    assert duplicates.sources('daily.json', 50) == [] and duplicates.sources('missing.json', 0) == []
+
+    # The first copy in list order is the one kept
+    mask = duplicates.unique_mask(['daily.json', 'weekly.json'], [3, 10])
+    assert list(np.flatnonzero(~mask)) == [7, 8, 9]
+    assert duplicates.unique_mask(['weekly.json'], [5]).all()
+    # Files not fingerprinted yet count as unique
+    assert list(duplicates.unique_mask(['new.json', 'daily.json'], [2, 3])) == [True] * 5
+
+    # A file added later that overlaps is linked to the first copies; the
+    # earlier files it covers are checked again and stay as they are
+    duplicates.add('merged.json', fingerprints(make_store(2, 10)))
+    links = duplicates.links()
+    assert sorted(links) == ['daily.json', 'merged.json']
+    linked, sources = links['merged.json']
+    assert list(linked) == list(range(8)) and sources[0] == ('weekly.json', 2)
+    assert duplicates.covered('merged.json') and not duplicates.covered('weekly.json')
+
+def test_shared_store_holds_only_its_own_collections():
+    weekly, partial = make_store(0, 6), make_store(3, 10)
+    own_bytes = partial.measurement_nbytes
+    shared = share_measurements(partial, [0, 1, 2], [(weekly, 3), (weekly, 4), (weekly, 5)])
+    assert isinstance(shared, SharedStore)
+    assert shared.measurement_nbytes < own_bytes
+    assert np.shares_memory(shared.measurements(1)[0], weekly.depths)
+    for index in range(len(partial)):
+        for mine, original in zip(shared.measurements(index), partial.measurements(index)):
+            assert np.array_equal(mine, original)
+    assert np.array_equal(shared.values, partial.values) and np.array_equal(shared.take([6, 0])[0], partial.take([6, 0])[0])
+    assert list(fingerprints(shared)) == list(fingerprints(partial))
+
+    # Sharing again with the same links keeps the store
+    assert share_measurements(shared, [0, 1, 2], [(weekly, 3), (weekly, 4), (weekly, 5)]) is shared
+
+def test_lazy_stores_stay_lazy():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'unit.adcp')
+        write_adcp(path, *generate_collections(5, 20, seed=2))
+        store = open_adcp(path)
+        assert len(fingerprints(store)) == 5
+        assert store.measurement_nbytes == 0
+        # Kept in the sidecar index, so the next load decodes nothing for them
+        assert list(AdcpIndex.load(path + INDEX_SUFFIX).fingerprints) == list(fingerprints(store))
+        assert list(open_adcp(path).index.fingerprints) == list(fingerprints(store))
+        # Lazy stores are never copied for sharing
+        assert share_measurements(store, [0], [(make_store(0, 1), 0)]) is store
@@ -0,0 +1,67 @@
+# tests/test_export_engine.py
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.aggregation import depth_grid, resample_profiles, summarize
+from backend.data_parsing import load_json
+from backend.export_engine import build_pages, export_pdf, export_png
+from backend.figures import concat_profiles
+
+def _pages():
+    store = load_json("data/EXAMPLE_adcp_eo.json")
+    entries = [("EXAMPLE_adcp_eo.json", i, store, "#1f77b4") for i in range(len(store))]
+    return build_pages(entries, ['latlong', 'temperature'], True)
+
+def test_build_pages():
+    pages = _pages()
+    assert [page['name'] for page in pages] == ['profile', 'latlong', 'temperature', 'legend']
+    assert pages[0]['offsets'][-1] == len(pages[0]['depths'])
+    assert len(pages[1]['metadata']) == len(pages[1]['labels'])
+
+def test_aggregate_pages():
+    store = load_json("data/EXAMPLE_adcp_eo.json")
+    keys = [("EXAMPLE_adcp_eo.json", i) for i in range(len(store))]
+    depths, values, offsets = concat_profiles([store.measurements(i) for _, i in keys])
+    grid = depth_grid(depths)
+    groups = np.arange(len(keys)) % 2
+    aggregate = {'grid': grid, 'labels': ['Even', 'Odd'], 'group_colors': ['#1f77b4', '#ff7f0e'],
+                 'summary': summarize(resample_profiles(depths, values, offsets, grid), groups, 2)}
+    colors = [aggregate['group_colors'][group] for group in groups]
+    entries = [(file_name, i, store, color) for (file_name, i), color in zip(keys, colors)]
+    pages = build_pages(entries, ['temperature'], True, aggregate)
+    assert [page['kind'] for page in pages] == ['aggregate', 'metadata', 'legend']
+    assert pages[1]['colors'] == colors
+    assert [text for text, _ in list(pages[2]['grouped'].values())[0]] == [
+        f"Even ({(groups == 0).sum()} profiles)", f"Odd ({(groups == 1).sum()} profiles)"]
+    with tempfile.TemporaryDirectory() as folder:
+        assert len(export_png(pages, folder, "groups", parallel=False)) == 3
+
+def test_export_png_and_pdf():
+    pages = _pages()
+    reported = []
+    with tempfile.TemporaryDirectory() as folder:
+        paths = export_png(pages, folder, "unit", progress=lambda done, total, name: reported.append(name))
+        assert [os.path.basename(path) for path in paths] == [
+            "unit_profile.png", "unit_latlong.png", "unit_temperature.png", "unit_legend.png"]
+        for path in paths:
+            with open(path, 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+        assert sorted(reported) == sorted(page['name'] for page in pages)
+
+        pdf_path = os.path.join(folder, "unit.pdf")
+        assert export_pdf(pages, pdf_path) == [pdf_path]
+        with open(pdf_path, 'rb') as f:
+            content = f.read()
+        assert content.count(b'/Type /Page ') == len(pages)
+        # Vector pages unless images are asked for
+        assert b'/Subtype /Image' not in content
+        assert export_pdf(pages, pdf_path, raster=True) == [pdf_path]
+        with open(pdf_path, 'rb') as f:
+            content = f.read()
+        assert content.count(b'/Type /Page ') == len(pages) and content.count(b'/Subtype /Image') == len(pages)
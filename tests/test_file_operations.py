@@ -0,0 +1,80 @@
+# tests/test_file_operations.py
+import sys
+import os
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import file_operations
+from backend.dedup import DuplicateIndex, SharedStore, fingerprints
+from backend.file_operations import add_loaded_file, fingerprints_ready, update_loaded_file
+from backend.list_models import CollectionListModel
+from backend.parse_cache import ParseCache
+from backend.parsed_data import ParsedData
+from test_dedup import make_store
+
+def make_gui(folder):
+    # Just what loading touches; fingerprint jobs are delivered by hand
+    submitted = []
+    gui = SimpleNamespace(
+        parsed_data=ParsedData(os.path.join(folder, 'spill'), budget=1 << 30),
+        duplicates=DuplicateIndex(), collection_model=CollectionListModel(), plotted={},
+        file_paths={}, metadata_index=None, unique_view_pending=True,
+        fingerprint_jobs=SimpleNamespace(submit=lambda name, store: submitted.append((name, store))),
+    )
+    return gui, submitted
+
+def deliver(gui, submitted):
+    while submitted:
+        name, store = submitted.pop(0)
+        fingerprints_ready(gui, name, store, fingerprints(store))
+
+def test_reloaded_file_is_not_linked_through_old_fingerprints():
+    with tempfile.TemporaryDirectory() as folder:
+        gui, submitted = make_gui(folder)
+        for name, store in [('weekly.json', make_store(0, 10)), ('daily.json', make_store(4, 9))]:
+            gui.file_paths[name] = name
+            add_loaded_file(gui, name, store)
+        deliver(gui, submitted)
+        daily = gui.parsed_data['daily.json']
+        expected = [daily.measurements(index)[1].copy() for index in range(len(daily))]
+        assert isinstance(daily, SharedStore)
+
+        # The weekly file shrinks and changes; another file's fingerprints
+        # arrive before its own
+        update_loaded_file(gui, 'weekly.json', make_store(0, 3, seed=1))
+        gui.file_paths['other.json'] = 'other.json'
+        add_loaded_file(gui, 'other.json', make_store(0, 2, seed=2))
+        name, store = submitted.pop()
+        fingerprints_ready(gui, name, store, fingerprints(store))
+
+        assert 'weekly.json' not in gui.duplicates.files
+        assert not isinstance(gui.parsed_data['weekly.json'], SharedStore)
+        daily = gui.parsed_data['daily.json']
+        assert all(np.array_equal(daily.measurements(index)[1], values) for index, values in enumerate(expected))
+
+        deliver(gui, submitted)
+        assert sorted(gui.duplicates.files) == ['daily.json', 'other.json', 'weekly.json']
+        assert all(np.array_equal(daily.measurements(index)[1], values) for index, values in enumerate(expected))
+
+def test_parse_cache_holds_the_shared_store():
+    with tempfile.TemporaryDirectory() as folder:
+        gui, submitted = make_gui(folder)
+        cache = ParseCache(os.path.join(folder, 'cache'), disk_budget=0)
+        previous, file_operations._parse_cache = file_operations._parse_cache, cache
+        try:
+            for name, store in [('weekly.json', make_store(0, 10)), ('daily.json', make_store(4, 9))]:
+                path = os.path.join(folder, name)
+                open(path, 'w').close()
+                gui.file_paths[name] = path
+                cache.put(path, store)
+                add_loaded_file(gui, name, store)
+            deliver(gui, submitted)
+        finally:
+            file_operations._parse_cache = previous
+        assert cache.get(gui.file_paths['daily.json']) is gui.parsed_data['daily.json']
+        assert isinstance(gui.parsed_data['daily.json'], SharedStore)
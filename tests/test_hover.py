@@ -0,0 +1,63 @@
+# tests/test_hover.py
+import sys
+import os
+from types import SimpleNamespace
+
+import numpy as np
+from matplotlib.backend_bases import MouseEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.hover import attach_hover, lookup, point_index, set_hover_points
+
+def make_axes():
+    fig = Figure(figsize=(4, 3), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_xlim(0, 10)
+    ax.set_ylim(0, 10)
+    fig.canvas.draw()
+    return ax
+
+def send(ax, name, x, y, button=None):
+    pixel_x, pixel_y = ax.transData.transform((x, y))
+    event = MouseEvent(name, ax.figure.canvas, pixel_x, pixel_y, button=button)
+    ax.figure.canvas.callbacks.process(name, event)
+
+def test_lookup_uses_a_pixel_radius():
+    ax = make_axes()
+    gui = SimpleNamespace(hovers={})
+    attach_hover(gui, 'profile', ax, lambda owner, x, y: owner, lambda owner: None)
+    points = np.array([[1.0, 1.0], [5.0, 5.0], [5.2, 5.0], [np.nan, 3.0]])
+    set_hover_points(gui, 'profile', lambda: point_index(points, np.array(['a', 'b', 'c', 'd'])))
+
+    assert lookup(gui, 'profile', 1.02, 0.98) == 'a'
+    assert lookup(gui, 'profile', 5.15, 5.0) == 'c'
+    assert lookup(gui, 'profile', 3.0, 3.0) is None
+    assert len(gui.hovers['profile']['index']) == 3
+
+    set_hover_points(gui, 'profile', None)
+    assert lookup(gui, 'profile', 1.0, 1.0) is None
+
+def test_hover_annotates_and_click_picks():
+    ax = make_axes()
+    gui = SimpleNamespace(hovers={})
+    picked = []
+    attach_hover(gui, 'temperature', ax, lambda owner, x, y: f"#{owner} {y:g}", picked.append)
+    set_hover_points(gui, 'temperature', lambda: point_index([[2.0, 7.0], [8.0, 3.0]], np.array([4, 9])))
+    state = gui.hovers['temperature']
+
+    send(ax, 'motion_notify_event', 8.0, 3.05)
+    assert state['annotation'].get_visible()
+    assert state['annotation'].get_text() == "#9 3"
+
+    send(ax, 'button_press_event', 2.0, 7.0, button=1)
+    assert picked == [4]
+    # Motion counts as a drag until the button is released
+    send(ax, 'button_release_event', 2.0, 7.0, button=1)
+
+    send(ax, 'motion_notify_event', 5.0, 5.0)
+    assert not state['annotation'].get_visible()
@@ -12,7 +12,9 @@ import os
 # Add the project root directory to the system path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.data_parsing import load_json
+import json
+
+from backend.data_parsing import iter_json, load_json
 
 def test_load_json():
     # Path to your JSON file in the data folder
@@ -34,6 +36,22 @@ def test_load_json():
     else:
         print("Failed to load JSON file.")
 
+def test_iter_json_matches_full_parse():
+    filepath = "data/EXAMPLE_adcp_eo.json"
+
+    with open(filepath, 'r') as file:
+        entries = json.load(file)['data']
+
+    streamed = list(iter_json(filepath))
+    assert len(streamed) == len(entries)
+    for collection, entry in zip(streamed, entries):
+        assert collection['measurements'] == entry['measurements']
+        assert collection['metadata'] == {k: v for k, v in entry.items() if k != 'measurements'}
+
+    # Stopping early only decodes the requested number of collections
+    assert len(list(iter_json(filepath, limit=3))) == 3
+
 if __name__ == "__main__":
     test_load_json()
+    test_iter_json_matches_full_parse()
 
@@ -0,0 +1,30 @@
+# tests/test_latlong_view.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.latlong_view import hex_bins
+
+def test_hex_bins_assign_the_nearest_hexagon():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-5, 5, size=(2000, 2))
+    width, height = 0.5, 0.8
+    cells, counts = hex_bins(points, width, height)
+    assert counts.sum() == len(points)
+    assert np.all(np.diff(cells[:, 0]) >= 0)
+
+    # Centres of both lattices around the points, in the hexagonal metric
+    steps = np.arange(-24, 25)
+    centres = np.array([(column, row) for column in steps for row in steps if column % 2 == row % 2])
+    scaled = (points[:, None, :] - centres[None] * [width / 2, height / 2]) / [width, height]
+    nearest = centres[np.argmin(scaled[..., 0] ** 2 + 3 * scaled[..., 1] ** 2, axis=1)]
+    expected, expected_counts = np.unique(nearest, axis=0, return_counts=True)
+    assert np.array_equal(cells, expected) and np.array_equal(counts, expected_counts)
+
+def test_hex_bins_of_no_points():
+    cells, counts = hex_bins(np.empty((0, 2)), 1.0, 1.0)
+    assert cells.shape == (0, 2) and len(counts) == 0
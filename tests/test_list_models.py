@@ -0,0 +1,55 @@
+# tests/test_list_models.py
+import sys
+import os
+
+import numpy as np
+from PyQt5.QtCore import Qt
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.list_models import CollectionListModel
+
+def test_rows_map_to_collection_keys():
+    model = CollectionListModel()
+    model.set_count("a.json", 3)
+    model.set_count("b.adcp", 2)
+    assert model.rowCount() == 5
+    assert model.key(3) == ("b.adcp", 0)
+    assert model.keys(np.array([0, 2, 4])) == [("a.json", 0), ("a.json", 2), ("b.adcp", 1)]
+    assert model.data(model.index(1), Qt.DisplayRole) == "a.json - Collection 2"
+
+    # A file that grows or shrinks keeps its rows together
+    model.set_count("a.json", 5)
+    assert model.key(4) == ("a.json", 4)
+    assert model.key(5) == ("b.adcp", 0)
+    assert model.row("b.adcp", 1) == 6
+    model.set_count("a.json", 1)
+    assert model.keys(np.arange(model.rowCount())) == [("a.json", 0), ("b.adcp", 0), ("b.adcp", 1)]
+
+    model.clear()
+    assert model.rowCount() == 0
+
+def test_shown_rows():
+    model = CollectionListModel()
+    model.set_count("a.json", 3)
+    model.set_count("b.adcp", 3)
+    model.set_shown(np.array([0, 2, 4]))
+    assert model.rowCount() == 3
+    assert model.key(2) == ("b.adcp", 1)
+    assert model.keys(np.array([0, 1])) == [("a.json", 0), ("a.json", 2)]
+    assert model.data(model.index(1), Qt.DisplayRole) == "a.json - Collection 3"
+    assert list(model.view_rows(np.array([1, 2, 4, 5]))) == [1, 2]
+
+    # Changing a file's rows shows every row again
+    model.set_count("b.adcp", 4)
+    assert model.shown is None and model.rowCount() == 7
+
+def test_order_files():
+    model = CollectionListModel()
+    for name, count in [("c.json", 1), ("a.json", 2), ("b.adcp", 3)]:
+        model.set_count(name, count)
+    model.set_shown(np.array([0, 1]))
+    model.order_files(["a.json", "missing.json", "b.adcp"])
+    assert model.files == ["a.json", "b.adcp", "c.json"] and model.counts == [2, 3, 1]
+    assert model.shown is None and model.key(5) == ("c.json", 0) and model.row("b.adcp", 0) == 2
@@ -0,0 +1,53 @@
+# tests/test_metadata_query.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.collection_store import empty_metadata
+from backend.metadata_query import MetadataIndex, parse_query
+
+def _random_metadata(count):
+    rng = np.random.default_rng(1)
+    metadata = empty_metadata(count)
+    metadata['latitude'] = rng.uniform(35, 38, count)
+    metadata['longitude'] = rng.uniform(-92, -89, count)
+    metadata['unit_number'] = rng.integers(1, 20, count)
+    metadata['abort_status'] = rng.integers(0, 3, count)
+    metadata['hdop_error'] = rng.uniform(0, 5, count)
+    metadata['vwc'] = rng.uniform(0, 0.5, count)
+    metadata['timestamp'] = np.datetime64('2024-01-01') + rng.integers(0, 365 * 86400, count).astype('m8[s]')
+    metadata['measurement_units'] = rng.choice(['psi', 'kPa'], count)
+    # Missing values never match
+    metadata['hdop_error'][::7] = np.nan
+    metadata['timestamp'][::11] = np.datetime64('NaT')
+    metadata['measurement_units'][::13] = ''
+    return metadata
+
+def test_query_matches_brute_force():
+    metadata = _random_metadata(50000)
+    index = MetadataIndex(metadata)
+    m = metadata
+    cases = {
+        "timestamp >= 2024-03-01; timestamp < 2024-04-01": (m['timestamp'] >= np.datetime64('2024-03-01')) & (m['timestamp'] < np.datetime64('2024-04-01')),
+        "unit_number == 3,7 and abort_status == 0": np.isin(m['unit_number'], [3, 7]) & (m['abort_status'] == 0),
+        "hdop_error <= 1.5": m['hdop_error'] <= 1.5,
+        "latitude > 36; latitude < 36.5; longitude >= -91; longitude <= -90.5":
+            (m['latitude'] > 36) & (m['latitude'] < 36.5) & (m['longitude'] >= -91) & (m['longitude'] <= -90.5),
+        "vwc >= 0.1; vwc <= 0.2; abort_status != 2": (m['vwc'] >= 0.1) & (m['vwc'] <= 0.2) & (m['abort_status'] != 2),
+        "measurement_units == kPa; hdop_error > 4": (m['measurement_units'] == 'kPa') & (m['hdop_error'] > 4),
+        "": np.ones(len(m), dtype=bool),
+    }
+    for text, expected in cases.items():
+        assert np.array_equal(index.query(parse_query(text)), np.flatnonzero(expected)), text
+
+def test_parse_query_rejects_bad_clauses():
+    for text in ("depth < 3", "abort_status ~ 1", "timestamp >= yesterday"):
+        try:
+            parse_query(text)
+            assert False, text
+        except ValueError:
+            pass
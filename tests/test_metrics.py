@@ -0,0 +1,88 @@
+# tests/test_metrics.py
+import sys
+import os
+import csv
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.collection_store import CollectionStore, empty_metadata
+from backend.metrics import collection_metrics, compute_metrics, parse_metric, store_metrics, write_metrics_csv
+
+def make_store(collections, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(0, 40, size=collections)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    depths = np.concatenate([np.sort(rng.random(size) * 30) for size in sizes])
+    values = rng.random(len(depths)) * 500
+    values[rng.random(len(values)) < 0.05] = np.nan
+    return CollectionStore(depths, values, offsets, empty_metadata(collections))
+
+def brute_force(depths, values):
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return [np.nan] * 6
+    peak = np.nanmax(values)
+    crossing = np.flatnonzero(values >= 300)
+    if len(crossing) == 0:
+        depth_at = np.nan
+    elif crossing[0] == 0 or np.isnan(values[crossing[0] - 1]):
+        depth_at = depths[crossing[0]]
+    else:
+        i = crossing[0]
+        depth_at = np.interp(300, values[i - 1:i + 1], depths[i - 1:i + 1])
+    band = valid & (depths >= 6) & (depths < 12)
+    return [peak, depths[np.flatnonzero(values == peak)[0]], depths.max(), depth_at,
+            values[band].mean() if band.any() else np.nan, np.nan]
+
+def test_metrics_match_a_per_collection_loop():
+    store = make_store(300)
+    specs = ['peak_pressure', 'peak_depth', 'max_depth', 'depth_at_psi:300', 'band_mean:6-12']
+    metrics = compute_metrics(store.depths, store.values, store.offsets, specs)
+    for index in range(len(store)):
+        depths, values = store.measurements(index)
+        if not len(depths):
+            assert all(np.isnan(metrics[spec][index]) for spec in specs)
+            continue
+        expected = brute_force(depths, values)
+        for spec, wanted in zip(specs, expected):
+            assert np.isclose(metrics[spec][index], wanted, equal_nan=True), (spec, index)
+
+def test_results_are_cached_per_store():
+    first, second = make_store(50, 1), make_store(50, 2)
+    keys = [('b.json', 3), ('a.json', 0), ('missing.json', 1)]
+    result = collection_metrics({'a.json': first, 'b.json': second}, keys, ['max_depth'])['max_depth']
+    assert result[0] == second.measurements(3)[0].max()
+    assert np.isnan(result[2])
+    assert store_metrics(first, ['max_depth'])['max_depth'] is store_metrics(first, ['max_depth'])['max_depth']
+
+    # A reloaded file is a new store and is computed afresh
+    reloaded = make_store(50, 3)
+    again = collection_metrics({'a.json': reloaded, 'b.json': second}, keys, ['max_depth'])['max_depth']
+    assert again[1] == store_metrics(reloaded, ['max_depth'])['max_depth'][0]
+
+def test_parse_errors():
+    for spec in ['peak', 'band_mean:6', 'depth_at_psi:abc', 'max_depth:3']:
+        try:
+            parse_metric(spec)
+        except ValueError:
+            continue
+        raise AssertionError(spec)
+    assert parse_metric('band_mean:0-6')[0] == "Mean pressure 0-6 in (psi)"
+
+def test_csv_rows():
+    store = make_store(4, 5)
+    metadata = store.metadata[[2, 0]]
+    metadata['vwc'] = [0.25, np.nan]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'metrics.csv')
+        metrics = {'max_depth': np.array([1.5, np.nan])}
+        assert write_metrics_csv(path, [('a.json', 2), ('a.json', 0)], metadata, metrics) == 2
+        with open(path, newline='') as file:
+            rows = list(csv.DictReader(file))
+    assert [row['collection'] for row in rows] == ['3', '1']
+    assert rows[0]['vwc'] == '0.25' and rows[1]['vwc'] == ''
+    assert rows[0]['max_depth'] == '1.5' and rows[1]['max_depth'] == ''
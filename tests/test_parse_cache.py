@@ -0,0 +1,65 @@
+# tests/test_parse_cache.py
+import sys
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.data_parsing import load_json
+from backend.parse_cache import ParseCache
+
+def test_cache_hits_and_invalidation():
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "archive.json")
+        shutil.copy("data/EXAMPLE_adcp_eo.json", filepath)
+        store = load_json(filepath)
+
+        cache = ParseCache(os.path.join(folder, "cache"))
+        assert cache.get(filepath) is None
+        cache.put(filepath, store)
+        assert cache.get(filepath) is store
+
+        # A fresh process only has the disk level
+        reopened = ParseCache(os.path.join(folder, "cache")).get(filepath)
+        assert isinstance(reopened.depths, np.memmap)
+        assert np.array_equal(reopened.depths, store.depths)
+        assert reopened.metadata_dict(3) == store.metadata_dict(3)
+
+        # Touching the source file changes the key
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.get(filepath) is None
+        del reopened
+
+def test_replace_keeps_the_new_store():
+    with tempfile.TemporaryDirectory() as folder:
+        filepath = os.path.join(folder, "archive.json")
+        shutil.copy("data/EXAMPLE_adcp_eo.json", filepath)
+        store = load_json(filepath)
+        cache = ParseCache(os.path.join(folder, "cache"), disk_budget=0)
+        cache.put(filepath, store)
+        replacement = load_json(filepath)
+        cache.replace(store, replacement)
+        assert cache.get(filepath) is replacement
+        assert all(cached is not store for cached in cache.memory.values())
+
+def test_disk_budget_evicts_oldest():
+    with tempfile.TemporaryDirectory() as folder:
+        store = load_json("data/EXAMPLE_adcp_eo.json")
+        cache = ParseCache(os.path.join(folder, "cache"), disk_budget=int(store.nbytes * 1.5))
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(folder, f"file{i}.json"))
+            shutil.copy("data/EXAMPLE_adcp_eo.json", paths[-1])
+            cache.put(paths[-1], store)
+        assert len(os.listdir(os.path.join(folder, "cache"))) == 1
+        assert ParseCache(os.path.join(folder, "cache")).get(paths[-1]) is not None
+
+if __name__ == "__main__":
+    test_cache_hits_and_invalidation()
+    test_replace_keeps_the_new_store()
+    test_disk_budget_evicts_oldest()
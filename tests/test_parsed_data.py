@@ -0,0 +1,68 @@
+# tests/test_parsed_data.py
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.collection_store import CollectionStore, empty_metadata
+from backend.data_parsing import open_adcp
+from backend.parsed_data import ParsedData
+from benchmarks.synthetic_data import generate_collections, write_adcp
+
+def make_store(points, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = np.array([0, points // 2, points])
+    return CollectionStore(rng.random(points), rng.random(points), offsets, empty_metadata(2))
+
+def test_released_store_reads_the_same_measurements():
+    store = make_store(1000)
+    before = [np.array(array) for array in store.measurements(1)]
+    with tempfile.TemporaryDirectory() as folder:
+        assert store.release_measurements(folder) == 16000
+        assert store.measurement_nbytes == 0
+        assert isinstance(store.depths, np.memmap)
+        for expected, actual in zip(before, store.measurements(1)):
+            assert np.array_equal(expected, actual)
+        assert store.release_measurements(folder) == 0
+
+def test_least_recently_used_files_are_released_over_budget():
+    with tempfile.TemporaryDirectory() as folder:
+        changes = []
+        parsed = ParsedData(os.path.join(folder, 'spill'), budget=40000)
+        parsed.on_change = lambda: changes.append(parsed.resident_bytes())
+        parsed['a.json'] = make_store(1000, 1)
+        parsed['b.json'] = make_store(1000, 2)
+        parsed.use(['a.json'])
+        assert parsed.evictions == 0 and parsed.resident_bytes() == 32000
+
+        # b is now the least recently used file; a is in the current plot
+        parsed['c.json'] = make_store(1000, 3)
+        assert parsed['b.json'].measurement_nbytes == 0
+        assert parsed['a.json'].measurement_nbytes == parsed['c.json'].measurement_nbytes == 16000
+        assert parsed.evictions == 1 and parsed.evicted_bytes == 16000
+        assert changes[-1] == 32000
+        assert "1 released" in parsed.summary()
+
+        del parsed['a.json']
+        assert list(parsed) == ['b.json', 'c.json'] and 'a.json' not in parsed
+        parsed.clear()
+        assert len(parsed) == 0 and changes[-1] == 0
+
+def test_adcp_store_drops_decoded_rows():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'unit.adcp')
+        write_adcp(path, *generate_collections(5, 20, seed=4))
+        store = open_adcp(path)
+        expected = [np.array(array) for array in store.measurements(2)]
+        assert store.measurement_nbytes == 0
+        store.depths
+        assert store.measurement_nbytes > 0
+
+        assert store.release_measurements(folder) > 0
+        assert store.measurement_nbytes == 0
+        for wanted, actual in zip(expected, store.measurements(2)):
+            assert np.array_equal(wanted, actual)
@@ -0,0 +1,74 @@
+# tests/test_session_snapshot.py
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.collection_store import CollectionStore, empty_metadata
+from backend.session_snapshot import read_snapshot, write_snapshot
+
+def make_store(collections, seed=0):
+    rng = np.random.default_rng(seed)
+    offsets = np.arange(collections + 1) * 7
+    metadata = empty_metadata(collections)
+    metadata['unit_number'] = seed
+    metadata['measurement_units'] = 'psi'
+    metadata['timestamp'][:1] = np.datetime64('2024-06-01T12:00:00')
+    return CollectionStore(rng.random(offsets[-1]), rng.random(offsets[-1]), offsets, metadata,
+                           [{'note': index} for index in range(collections)])
+
+def test_round_trip_maps_arrays_from_the_snapshot():
+    with tempfile.TemporaryDirectory() as folder:
+        sources = {}
+        for name in ['a.json', 'b.json', 'unloaded.json']:
+            sources[name] = os.path.join(folder, name)
+            with open(sources[name], 'w') as file:
+                file.write(name)
+        stores = {'b.json': make_store(3, 1), 'a.json': make_store(5, 2)}
+        state = {'selected': [['a.json', 1, 4]], 'active_tab': 'temperature'}
+        path = os.path.join(folder, 'monday.adcpsession')
+        write_snapshot(path, sources, stores, state)
+
+        file_paths, restored, stale, restored_state = read_snapshot(path)
+        assert file_paths == sources and restored_state == state and stale == []
+        assert list(restored) == ['b.json', 'a.json']
+        for name, store in stores.items():
+            for array in ['depths', 'values', 'offsets', 'metadata']:
+                # Byte-wise, as the metadata is full of NaN
+                assert getattr(store, array).tobytes() == getattr(restored[name], array).tobytes()
+            assert isinstance(restored[name].depths, np.memmap)
+            assert restored[name].extras == store.extras
+            assert restored[name].measurement_nbytes == 0
+
+def test_changed_sources_are_stale():
+    with tempfile.TemporaryDirectory() as folder:
+        changed, removed = os.path.join(folder, 'changed.json'), os.path.join(folder, 'removed.json')
+        for source in [changed, removed]:
+            with open(source, 'w') as file:
+                file.write('[]')
+        path = os.path.join(folder, 'session.adcpsession')
+        write_snapshot(path, {'changed.json': changed, 'removed.json': removed},
+                       {'changed.json': make_store(2), 'removed.json': make_store(0)}, {})
+        with open(changed, 'w') as file:
+            file.write('[{}]')
+        os.remove(removed)
+
+        _, restored, stale, _ = read_snapshot(path)
+        # A missing source can't be reloaded, so the snapshot's copy is used
+        assert stale == ['changed.json'] and list(restored) == ['removed.json']
+        assert len(restored['removed.json']) == 0
+
+def test_rejects_other_files():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'data.json')
+        with open(path, 'w') as file:
+            file.write('[]')
+        try:
+            read_snapshot(path)
+        except ValueError:
+            return
+        raise AssertionError("read a JSON file as a snapshot")
@@ -0,0 +1,31 @@
+# tests/test_spatial_index.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.spatial_index import GridIndex
+
+def test_box_query_matches_brute_force():
+    rng = np.random.default_rng(3)
+    points = np.column_stack([rng.normal(-70, 2, 20000), rng.normal(40, 1, 20000)])
+    index = GridIndex(points)
+
+    for x0, x1, y0, y1 in [(-71, -69, 39.5, 40.5), (-75, -72.5, 35, 45), (-100, 0, 0, 90), (-60, -50, 0, 10)]:
+        x, y = points[:, 0], points[:, 1]
+        expected = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        assert np.array_equal(index.in_box(x0, x1, y0, y1), expected)
+
+def test_nearest_respects_radius():
+    points = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 10.0], [5.0, 5.0]])
+    index = GridIndex(points, cells_per_side=4)
+    assert index.nearest(0.9, 0.1, 0.5, 0.5) == 1
+    assert index.nearest(0.9, 9.0, 0.5, 2.0) == 2
+    assert index.nearest(3.0, 3.0, 0.5, 0.5) == -1
+
+    empty = GridIndex(np.empty((0, 2)))
+    assert len(empty.in_box(0, 1, 0, 1)) == 0
+    assert empty.nearest(0, 0, 1, 1) == -1
@@ -0,0 +1,29 @@
+# tests/test_synthetic_data.py
+import sys
+import os
+
+import numpy as np
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.data_parsing import load_adcp, load_json
+from benchmarks.synthetic_data import generate_dataset
+
+def test_generated_formats_parse_to_the_same_collections(tmp_path):
+    json_paths, adcp_paths = generate_dataset(str(tmp_path), 2, 50, 40, seed=7)
+    assert len(json_paths) == len(adcp_paths) == 2
+
+    for json_path, adcp_path in zip(json_paths, adcp_paths):
+        from_json, from_adcp = load_json(json_path), load_adcp(adcp_path)
+        assert len(from_json) == len(from_adcp) == 50
+        assert np.array_equal(from_json.offsets, from_adcp.offsets)
+        assert np.allclose(from_json.depths, from_adcp.depths, atol=1e-6)
+        assert np.allclose(from_json.values, from_adcp.values, atol=1e-5)
+        for field in ('latitude', 'unit_number', 'abort_status', 'timestamp'):
+            assert np.array_equal(from_json.metadata[field], from_adcp.metadata[field])
+
+    # Depth profiles rise from the surface and the second file is another unit
+    depths, values = load_json(json_paths[1]).measurements(0)
+    assert depths[0] < 1 and np.all(np.diff(depths) > 0)
+    assert load_json(json_paths[1]).metadata['unit_number'][0] == 2
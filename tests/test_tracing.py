@@ -0,0 +1,63 @@
+# tests/test_tracing.py
+import sys
+import os
+import json
+import threading
+
+# Add the project root directory to the system path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import tracing
+
+@tracing.traced('outer')
+def _outer():
+    tracing.annotate(items=3)
+    with tracing.span('inner', page='profile'):
+        pass
+
+def test_spans_nest_and_dump(tmp_path):
+    was_enabled = tracing.is_enabled()
+    tracing.clear()
+    try:
+        tracing.set_enabled(False)
+        _outer()
+        assert tracing.recent_spans() == []
+
+        tracing.set_enabled(True)
+        _outer()
+        inner, outer = tracing.recent_spans()
+        assert (inner['name'], inner['depth'], inner['args']) == ('inner', 1, {'page': 'profile'})
+        assert (outer['name'], outer['depth'], outer['args']) == ('outer', 0, {'items': 3})
+        assert outer['start'] <= inner['start'] and inner['duration'] <= outer['duration']
+
+        path = str(tmp_path / 'trace.json')
+        tracing.dump_trace(path)
+        with open(path) as file:
+            events = json.load(file)['traceEvents']
+        assert [event['name'] for event in events if event['ph'] == 'X'] == ['inner', 'outer']
+        assert any(event['ph'] == 'M' and event['name'] == 'thread_name' for event in events)
+    finally:
+        tracing.set_enabled(was_enabled)
+        tracing.clear()
+
+def test_threads_record_every_span():
+    was_enabled = tracing.is_enabled()
+    tracing.clear()
+    try:
+        tracing.set_enabled(True)
+        before = tracing.recorded_count()
+
+        def work():
+            for _ in range(2000):
+                with tracing.span('worker'):
+                    pass
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert tracing.recorded_count() - before == 8000
+        assert len(tracing.recent_spans()) == 8000
+    finally:
+        tracing.set_enabled(was_enabled)
+        tracing.clear()